@@ -24,13 +24,17 @@ carregar_estilos_globais()
 from src.views.tela_login import renderizar_login
 from src.views.tela_dashboard import renderizar_dashboard
 from src.views.tela_transacao import renderizar_nova_transacao
-from src.views.sidebar import renderizar_sidebar
+from src.views.sidebar import renderizar_sidebar, renderizar_painel_debug
 from src.views.tela_configuracao import renderizar_configuracoes
 from src.views.tela_cartao_credito import renderizar_tela_cartao
 from src.views.tela_investimento import renderizar_investimentos
 from src.views.tela_reset_senha import renderizar_reset_senha
-from src.services.auth_service import obter_usuario_atual, login_com_token
+from src.services.auth_service import obter_usuario_atual, login_com_token, obter_token_acesso
 from src.services.cookie_service import pegar_token_do_cookie  # <--- IMPORT NOVO
+from src.services.contexto_dados import iniciar_contexto_rerun
+from src.services.realtime_listener import iniciar_escuta_realtime
+from src.services.instrumentacao import definir_pagina
+from src.services.resiliencia import dados_desatualizados
 
 
 # 3. Lógica Principal
@@ -38,6 +42,9 @@ def main():
     if "logado" not in st.session_state: st.session_state.logado = False
     if "user" not in st.session_state: st.session_state.user = None
 
+    # Cada rerun começa com um contexto de dados limpo (uma busca por tabela)
+    iniciar_contexto_rerun()
+
     # --- AUTO-LOGIN (COOKIE) ---
     # Só tenta se não estiver logado
     if not st.session_state.logado:
@@ -70,8 +77,12 @@ def main():
         renderizar_reset_senha()
         return
 
+    # Mudanças feitas em outros dispositivos invalidam o cache desta sessão
+    iniciar_escuta_realtime(st.session_state.user.id, obter_token_acesso(), renovar_token=obter_token_acesso)
+
         # App Normal
     page = renderizar_sidebar()
+    definir_pagina(page)
 
     if page == "Dashboard":
         renderizar_dashboard()
@@ -84,6 +95,12 @@ def main():
     elif page == "Configurações":
         renderizar_configuracoes()
 
+    # Alguma leitura estourou o tempo e a tela usou o último resultado bom
+    if dados_desatualizados():
+        st.toast("Conexão lenta: alguns dados podem estar desatualizados. Atualizando em segundo plano.", icon="⏳")
+
+    renderizar_painel_debug()
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
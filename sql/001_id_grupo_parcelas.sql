@@ -0,0 +1,16 @@
+-- Agrupa os lançamentos gerados juntos (parcelas de cartão e cronograma de empréstimo)
+-- para que possam ser editados ou excluídos como uma unidade.
+
+alter table public.transacoes_cartao_credito
+    add column if not exists id_grupo uuid;
+
+alter table public.transacoes_bancarias
+    add column if not exists id_grupo uuid;
+
+create index if not exists idx_transacoes_cartao_credito_id_grupo
+    on public.transacoes_cartao_credito (id_grupo)
+    where id_grupo is not null;
+
+create index if not exists idx_transacoes_bancarias_id_grupo
+    on public.transacoes_bancarias (id_grupo)
+    where id_grupo is not null;
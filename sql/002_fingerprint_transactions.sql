@@ -0,0 +1,61 @@
+-- Impressão digital estável de cada transação importada da Pluggy.
+-- Permite gravar uma página inteira com um único upsert(on_conflict=...)
+-- em vez de um SELECT de duplicidade por transação.
+--
+-- Com o id da Pluggy (metadata->>'pluggy_id'):
+--     fingerprint = sha256(user_id | 'pluggy' | pluggy_id)
+-- Sem ele (linhas antigas), pelo conteúdo:
+--     fingerprint = sha256(user_id | data | descrição normalizada | valor com 2 casas)
+-- A mesma regra está em src/services/pluggy_sync.py (gerar_fingerprint).
+--
+-- Nenhuma linha é apagada: duas compras iguais no mesmo dia são legítimas.
+
+alter table public.transactions
+    add column if not exists fingerprint text;
+
+-- Backfill pelo id da Pluggy
+update public.transactions
+set fingerprint = encode(sha256(convert_to(
+        coalesce(user_id::text, '') || '|pluggy|' || (metadata->>'pluggy_id'),
+    'UTF8')), 'hex')
+where fingerprint is null
+  and metadata->>'pluggy_id' is not null;
+
+-- Backfill pelo conteúdo, com a mesma normalização do Python. Linhas de mesmo
+-- conteúdo recebem o id no texto a partir da segunda, para caberem no índice único.
+with conteudo as (
+    select id,
+           coalesce(user_id::text, '') || '|' ||
+           left(date::text, 10) || '|' ||
+           lower(regexp_replace(trim(coalesce(description, '')), '\s+', ' ', 'g')) || '|' ||
+           to_char(coalesce(amount, 0)::numeric, 'FM999999999999990.00') as texto,
+           row_number() over (
+               partition by user_id, left(date::text, 10),
+                            lower(regexp_replace(trim(coalesce(description, '')), '\s+', ' ', 'g')),
+                            coalesce(amount, 0)::numeric
+               order by id) as ordem
+    from public.transactions
+    where fingerprint is null
+)
+update public.transactions t
+set fingerprint = encode(sha256(convert_to(
+        c.texto || case when c.ordem > 1 then '|' || t.id::text else '' end,
+    'UTF8')), 'hex')
+from conteudo c
+where t.id = c.id;
+
+create unique index if not exists ux_transactions_user_fingerprint
+    on public.transactions (user_id, fingerprint);
+
+-- Possíveis duplicatas (mesmo dia, descrição e valor), só para conferência manual
+create or replace view public.transactions_possiveis_duplicatas
+with (security_invoker = true) as
+select user_id,
+       left(date::text, 10) as data,
+       description,
+       amount,
+       count(*) as quantidade,
+       array_agg(id order by id) as ids
+from public.transactions
+group by user_id, left(date::text, 10), description, amount
+having count(*) > 1;
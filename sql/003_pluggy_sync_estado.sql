@@ -0,0 +1,23 @@
+-- Cursor de sincronização incremental por item (conexão bancária) da Pluggy.
+-- item_id: o item, ou 'item#escopo' para um caminho que lê só parte das contas.
+-- ultimo_from: data em que começou a última sincronização bem-sucedida; a
+--              próxima pede só a partir dela (com alguns dias de folga).
+--              Não é a data da transação mais recente: parcelas futuras do
+--              cartão empurrariam o cursor para frente.
+-- ultimo_id_transacao: id Pluggy da transação mais recente (até hoje), para diagnóstico.
+
+create table if not exists public.pluggy_sync_estado (
+    item_id             text primary key,
+    user_id             uuid not null,
+    ultimo_from         date,
+    ultimo_id_transacao text,
+    atualizado_em       timestamptz not null default now()
+);
+
+create index if not exists idx_pluggy_sync_estado_user
+    on public.pluggy_sync_estado (user_id);
+
+alter table public.pluggy_sync_estado enable row level security;
+
+create policy "pluggy_sync_estado_dono" on public.pluggy_sync_estado
+    for all using (auth.uid() = user_id) with check (auth.uid() = user_id);
@@ -0,0 +1,133 @@
+-- Agregado por usuário / mês / categoria / tipo, mantido por triggers a cada
+-- INSERT, UPDATE e DELETE em transacoes_bancarias e transacoes_cartao_credito.
+-- O score de 12 meses e o gráfico de gastos por categoria leem daqui
+-- (dezenas de linhas) em vez de varrer todo o extrato.
+--
+-- tipo: 'entrada' | 'saida' (conta corrente) | 'cartao' (cartão de crédito)
+-- id_categoria = 0 representa "sem categoria".
+-- valor passa por valor_numerico(): texto fora do formato soma 0 e gera um
+-- WARNING no log, em vez de abortar a gravação da transação.
+
+create table if not exists public.resumo_mensal_categoria (
+    id_usuario   uuid    not null,
+    mes          date    not null,
+    id_categoria integer not null default 0,
+    tipo         text    not null,
+    total        numeric not null default 0,
+    quantidade   integer not null default 0,
+    primary key (id_usuario, mes, id_categoria, tipo)
+);
+
+alter table public.resumo_mensal_categoria enable row level security;
+
+create policy "resumo_mensal_categoria_dono" on public.resumo_mensal_categoria
+    for select using (auth.uid() = id_usuario);
+
+
+-- Mesma regra do app (decodificador_arrow._reais): número simples ('1500.50')
+-- direto; com vírgula, formato brasileiro ('R$ 1.500,50').
+create or replace function public.valor_numerico(p_valor text) returns numeric
+language plpgsql immutable as $$
+declare
+    v text := replace(replace(trim(coalesce(p_valor, '')), 'R$', ''), ' ', '');
+begin
+    if v = '' then
+        return 0;
+    end if;
+    if position(',' in v) > 0 then
+        v := replace(replace(v, '.', ''), ',', '.');
+    end if;
+    if v !~ '^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$' then
+        raise warning 'valor_numerico: "%" não é um valor, contado como 0', p_valor;
+        return 0;
+    end if;
+    return v::numeric;
+end;
+$$;
+
+
+create or replace function public.acumular_resumo_mensal(
+    p_id_usuario uuid, p_data date, p_id_categoria integer, p_tipo text, p_valor numeric, p_sinal integer
+) returns void
+language plpgsql security definer set search_path = public as $$
+begin
+    if p_id_usuario is null or p_data is null or p_tipo is null then
+        return;
+    end if;
+
+    insert into public.resumo_mensal_categoria as r (id_usuario, mes, id_categoria, tipo, total, quantidade)
+    values (p_id_usuario, date_trunc('month', p_data)::date, coalesce(p_id_categoria, 0), p_tipo,
+            p_sinal * coalesce(p_valor, 0), p_sinal)
+    on conflict (id_usuario, mes, id_categoria, tipo) do update
+        set total = r.total + excluded.total,
+            quantidade = r.quantidade + excluded.quantidade;
+end;
+$$;
+
+-- security definer ignora o RLS: só os triggers abaixo podem chamá-la, nunca o
+-- PostgREST (supabase.rpc), senão qualquer usuário somaria no resumo de outro.
+revoke execute on function public.acumular_resumo_mensal(uuid, date, integer, text, numeric, integer)
+    from public, anon, authenticated;
+
+
+create or replace function public.trg_resumo_mensal_bancarias() returns trigger
+language plpgsql security definer set search_path = public as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') then
+        perform public.acumular_resumo_mensal(old.id_usuario, old.data::date, old.id_categoria, old.tipo,
+                                              public.valor_numerico(old.valor::text), -1);
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') then
+        perform public.acumular_resumo_mensal(new.id_usuario, new.data::date, new.id_categoria, new.tipo,
+                                              public.valor_numerico(new.valor::text), 1);
+    end if;
+    return null;
+end;
+$$;
+
+
+create or replace function public.trg_resumo_mensal_cartao() returns trigger
+language plpgsql security definer set search_path = public as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') then
+        perform public.acumular_resumo_mensal(old.id_usuario, old.data::date, old.id_categoria, 'cartao',
+                                              public.valor_numerico(old.valor::text), -1);
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') then
+        perform public.acumular_resumo_mensal(new.id_usuario, new.data::date, new.id_categoria, 'cartao',
+                                              public.valor_numerico(new.valor::text), 1);
+    end if;
+    return null;
+end;
+$$;
+
+
+drop trigger if exists resumo_mensal_bancarias on public.transacoes_bancarias;
+create trigger resumo_mensal_bancarias
+    after insert or update or delete on public.transacoes_bancarias
+    for each row execute function public.trg_resumo_mensal_bancarias();
+
+drop trigger if exists resumo_mensal_cartao on public.transacoes_cartao_credito;
+create trigger resumo_mensal_cartao
+    after insert or update or delete on public.transacoes_cartao_credito
+    for each row execute function public.trg_resumo_mensal_cartao();
+
+
+-- Backfill com o histórico existente
+insert into public.resumo_mensal_categoria (id_usuario, mes, id_categoria, tipo, total, quantidade)
+select id_usuario, date_trunc('month', data::date)::date, coalesce(id_categoria, 0), tipo,
+       sum(public.valor_numerico(valor::text)), count(*)
+from public.transacoes_bancarias
+where id_usuario is not null and data is not null and tipo is not null
+group by 1, 2, 3, 4
+on conflict (id_usuario, mes, id_categoria, tipo) do update
+    set total = excluded.total, quantidade = excluded.quantidade;
+
+insert into public.resumo_mensal_categoria (id_usuario, mes, id_categoria, tipo, total, quantidade)
+select id_usuario, date_trunc('month', data::date)::date, coalesce(id_categoria, 0), 'cartao',
+       sum(public.valor_numerico(valor::text)), count(*)
+from public.transacoes_cartao_credito
+where id_usuario is not null and data is not null
+group by 1, 2, 3, 4
+on conflict (id_usuario, mes, id_categoria, tipo) do update
+    set total = excluded.total, quantidade = excluded.quantidade;
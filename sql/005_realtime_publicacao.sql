@@ -0,0 +1,15 @@
+-- Publica as mudanças das tabelas do usuário no Supabase Realtime.
+-- O app (src/services/realtime_listener.py) assina INSERT/UPDATE/DELETE
+-- filtrando por id_usuario e invalida só o cache da tabela que mudou.
+-- replica identity full: o DELETE também traz o id_usuario, senão o filtro não casa.
+
+alter publication supabase_realtime add table
+    public.transacoes_bancarias,
+    public.transacoes_cartao_credito,
+    public.investimento,
+    public.config_cartoes;
+
+alter table public.transacoes_bancarias replica identity full;
+alter table public.transacoes_cartao_credito replica identity full;
+alter table public.investimento replica identity full;
+alter table public.config_cartoes replica identity full;
@@ -0,0 +1,41 @@
+-- Marca d'água do espelho local (src/services/espelho_local.py).
+-- atualizado_em muda em todo INSERT/UPDATE: o app pede só as linhas com
+-- atualizado_em >= última marca sincronizada, menos uma janela de
+-- sobreposição (ESPELHO_SOBREPOSICAO_SEG): now() é o início da transação, e
+-- uma transação longa confirma com um atualizado_em anterior a linhas já
+-- sincronizadas. Exclusões não deixam rastro
+-- aqui; o espelho as descobre comparando os ids de tempos em tempos.
+
+create or replace function public.tocar_atualizado_em() returns trigger
+language plpgsql as $$
+begin
+    new.atualizado_em := now();
+    return new;
+end;
+$$;
+
+alter table public.transacoes_bancarias
+    add column if not exists atualizado_em timestamptz not null default now();
+alter table public.transacoes_cartao_credito
+    add column if not exists atualizado_em timestamptz not null default now();
+alter table public.investimento
+    add column if not exists atualizado_em timestamptz not null default now();
+
+drop trigger if exists trg_atualizado_em on public.transacoes_bancarias;
+create trigger trg_atualizado_em before insert or update on public.transacoes_bancarias
+    for each row execute function public.tocar_atualizado_em();
+
+drop trigger if exists trg_atualizado_em on public.transacoes_cartao_credito;
+create trigger trg_atualizado_em before insert or update on public.transacoes_cartao_credito
+    for each row execute function public.tocar_atualizado_em();
+
+drop trigger if exists trg_atualizado_em on public.investimento;
+create trigger trg_atualizado_em before insert or update on public.investimento
+    for each row execute function public.tocar_atualizado_em();
+
+create index if not exists idx_transacoes_bancarias_usuario_atualizado
+    on public.transacoes_bancarias (id_usuario, atualizado_em);
+create index if not exists idx_transacoes_cartao_usuario_atualizado
+    on public.transacoes_cartao_credito (id_usuario, atualizado_em);
+create index if not exists idx_investimento_usuario_atualizado
+    on public.investimento (id_usuario, atualizado_em);
@@ -0,0 +1,6 @@
+-- Publica as mudanças do catálogo de categorias no Supabase Realtime.
+-- A tabela é global (sem id_usuario) e só é editada direto no banco: o
+-- realtime_listener assina sem filtro e chama invalidar_catalogo(), que faz
+-- o processo reler o catálogo em vez de esperar o TTL de 1h.
+
+alter publication supabase_realtime add table public.categorias;
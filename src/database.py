@@ -1,25 +1,9 @@
-import streamlit as st
-from supabase import create_client, Client
-import os
 import pandas as pd  # Importante para os gráficos!
+from src.services.supabase_client import supabase as db
 
-# --- 1. CONFIGURAÇÃO DA CONEXÃO SUPABASE ---
-# Tenta pegar as senhas do arquivo secrets.toml ou do ambiente
-try:
-    url = st.secrets["SUPABASE_URL"]
-    key = st.secrets["SUPABASE_KEY"]
-except:
-    # Fallback para variáveis de ambiente (caso não use secrets)
-    url = os.environ.get("SUPABASE_URL")
-    key = os.environ.get("SUPABASE_KEY")
-
-# Cria a conexão se as chaves existirem
-if url and key:
-    db: Client = create_client(url, key)
-else:
-    # Se não achar as chaves, paramos o app para evitar erros em cascata
-    st.error("ERRO CRÍTICO: Configure o arquivo .streamlit/secrets.toml com as chaves do Supabase!")
-    st.stop()
+# --- 1. CONEXÃO SUPABASE ---
+# O cliente vem da fábrica única em supabase_client (pool compartilhado).
+# `db` é mantido como apelido para não quebrar quem já importa daqui.
 
 
 # --- 2. FUNÇÕES DE BUSCA ---
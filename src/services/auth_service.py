@@ -96,4 +96,12 @@ def obter_usuario_atual():
         if session: return session.user
         return None
     except:
-        return None
\ No newline at end of file
+        return None
+
+def obter_token_acesso():
+    """JWT da sessão atual (usado pelo realtime para respeitar o RLS)."""
+    try:
+        session = supabase.auth.get_session()
+        return session.access_token if session else None
+    except:
+        return None
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+from src.services.cotacoes_service import obter_cotacoes
+
+# Tudo no app é consolidado em reais
+MOEDA_BASE = "BRL"
+
+# Só usados se o par nunca foi cotado com sucesso neste processo
+TAXAS_PADRAO = {"USD": 5.80, "EUR": 6.30}
+
+# Sufixos de moeda dos pares do Yahoo ('BTC-USD', 'ETH-EUR'). Outros hífens são
+# parte do ticker (classes de ação: 'BRK-B', 'BF-B') e não indicam moeda.
+MOEDAS_ISO = frozenset({"USD", "EUR", "BRL", "GBP", "JPY", "CHF", "CAD", "AUD", "CNY", "HKD", "MXN", "ARS"})
+
+
+def simbolo_par(moeda, base=MOEDA_BASE):
+    """Símbolo Yahoo do par: USD -> 'USDBRL=X'."""
+    return f"{moeda.upper()}{base}=X"
+
+
+def moeda_do_simbolo(simbolo):
+    """
+    Moeda em que o Yahoo cota o ativo: '.SA' em reais, 'BTC-USD' em USD,
+    ações americanas (inclusive 'BRK-B') em USD.
+    """
+    s = str(simbolo).upper()
+    if s.endswith(".SA"):
+        return MOEDA_BASE
+    sufixo = s.rsplit("-", 1)[1] if "-" in s else None
+    return sufixo if sufixo in MOEDAS_ISO else "USD"
+
+
+def simbolos_cambio(moedas):
+    """Pares necessários para converter `moedas` (para irem no mesmo lote das cotações)."""
+    return sorted({simbolo_par(m) for m in moedas if m and m.upper() != MOEDA_BASE})
+
+
+def taxas_para_brl(moedas):
+    """
+    {moeda: reais por unidade} numa única consulta ao cache de cotações
+    (validade da classe 'cambio'; se o Yahoo falhar, vale a última taxa boa).
+    """
+    moedas = {str(m).upper() for m in moedas if m}
+    pares = obter_cotacoes(simbolos_cambio(moedas))
+    taxas = {MOEDA_BASE: 1.0}
+    for m in moedas - {MOEDA_BASE}:
+        taxas[m] = pares.get(simbolo_par(m), TAXAS_PADRAO.get(m, np.nan))
+    return taxas
+
+
+def taxa_para_brl(moeda="USD"):
+    return taxas_para_brl([moeda])[moeda.upper()]
+
+
+def converter_para_brl(valores, moedas):
+    """
+    Converte um vetor de valores, cada um na sua moeda, de uma vez só.
+    Moeda sem taxa conhecida resulta em NaN.
+    """
+    moedas = pd.Series(moedas, dtype="object").str.upper()
+    taxas = taxas_para_brl(moedas.dropna().unique())
+    return np.asarray(valores, dtype=float) * moedas.map(taxas).to_numpy(dtype=float)
@@ -0,0 +1,66 @@
+import streamlit as st
+from src.services.supabase_client import supabase
+from src.services.contexto_dados import versao_tabelas, invalidar_tabelas
+from src.services.projecoes import colunas
+
+# A tabela categorias é a mesma para todos os usuários: o catálogo é do processo
+ESCOPO_CATALOGO = "global"
+TTL_CATALOGO_SEG = 3600
+
+
+@st.cache_resource(ttl=TTL_CATALOGO_SEG, show_spinner=False)
+def _carregar_catalogo(versao):
+    """
+    Lê a tabela inteira uma vez e já deixa prontas as listas dos seletores.
+    `versao` só entra na chave do cache (ver invalidar_catalogo).
+    Levanta exceção em caso de erro, para não guardar um catálogo vazio.
+    """
+    resp = supabase.table("categorias").select(colunas("catalogo_categorias")).order("id_categoria").execute()
+    todas = sorted(resp.data or [], key=lambda c: str(c.get('descricao') or ''))
+
+    def do_tipo(*tipos):
+        return [c for c in todas if str(c.get('tipo', '')).strip().lower() in tipos]
+
+    return {
+        'todas': todas,
+        'receita': do_tipo('receita', 'investimento'),
+        'despesa': do_tipo('despesa', 'investimento'),
+        'investimento': do_tipo('investimento'),
+        'por_id': {c['id_categoria']: c for c in todas},
+    }
+
+
+def obter_catalogo():
+    try:
+        return _carregar_catalogo(versao_tabelas(ESCOPO_CATALOGO, ("categorias",)))
+    except Exception as e:
+        print(f"Erro catálogo de categorias: {e}")
+        return {'todas': [], 'receita': [], 'despesa': [], 'investimento': [], 'por_id': {}}
+
+
+def invalidar_catalogo():
+    """Força a releitura na próxima chamada (após editar a tabela categorias)."""
+    invalidar_tabelas("categorias", user_id=ESCOPO_CATALOGO)
+
+
+# ==========================================
+# CONSULTAS
+# ==========================================
+def categorias_do_tipo(tipo_filtro=None):
+    """
+    Lista ordenada por descrição para os seletores.
+    'receita' e 'despesa' incluem as de investimento; sem filtro, todas.
+    """
+    catalogo = obter_catalogo()
+    filtro = str(tipo_filtro).lower().strip() if tipo_filtro else None
+    return list(catalogo.get(filtro, catalogo['todas']))
+
+
+def mapa_categorias():
+    """id_categoria -> registro (icon, descricao, tipo, nome). Somente leitura."""
+    return obter_catalogo()['por_id']
+
+
+def nomes_categorias():
+    """id_categoria -> nome, para os gráficos."""
+    return {i: c.get('nome') for i, c in mapa_categorias().items()}
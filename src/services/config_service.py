@@ -1,19 +1,25 @@
 import pandas as pd
 from src.services.supabase_client import supabase
+from src.services.contexto_dados import memorizar_na_sessao, invalidar_tabelas
+from src.services.projecoes import colunas
 
 # --- CONTAS BANCÁRIAS ---
 def salvar_conta(user_id, banco, saldo):
     try:
         payload = {"id_usuario": user_id, "nome_banco": banco, "saldo_inicial": float(saldo)}
         supabase.table("contas_bancarias").insert(payload).execute()
+        invalidar_tabelas("contas_bancarias", user_id=user_id)
         return True, "Conta salva com sucesso."
     except Exception as e:
         return False, str(e)
 
 def listar_contas(user_id):
     try:
-        resp = supabase.table("contas_bancarias").select("*").eq("id_usuario", user_id).execute()
-        return pd.DataFrame(resp.data)
+        dados = memorizar_na_sessao(
+            ("contas", str(user_id)), user_id, ("contas_bancarias",),
+            lambda: supabase.table("contas_bancarias").select(colunas("contas")).eq("id_usuario", user_id).execute().data
+        )
+        return pd.DataFrame(dados)
     except:
         return pd.DataFrame()
 
@@ -25,14 +31,18 @@ def salvar_cartao_config(user_id, nome, limite, dia_fech, dia_venc):
             "limite": float(limite), "dia_fechamento": int(dia_fech), "dia_vencimento": int(dia_venc)
         }
         supabase.table("config_cartoes").insert(payload).execute()
+        invalidar_tabelas("config_cartoes", user_id=user_id)
         return True, "Cartão configurado com sucesso."
     except Exception as e:
         return False, str(e)
 
 def listar_cartoes_config(user_id):
     try:
-        resp = supabase.table("config_cartoes").select("*").eq("id_usuario", user_id).execute()
-        return pd.DataFrame(resp.data)
+        dados = memorizar_na_sessao(
+            ("cartoes", str(user_id)), user_id, ("config_cartoes",),
+            lambda: supabase.table("config_cartoes").select(colunas("cartoes")).eq("id_usuario", user_id).execute().data
+        )
+        return pd.DataFrame(dados)
     except:
         return pd.DataFrame()
 
@@ -40,6 +50,7 @@ def listar_cartoes_config(user_id):
 def excluir_config(tabela, id_item):
     try:
         supabase.table(tabela).delete().eq("id", id_item).execute()
+        invalidar_tabelas(tabela)
         return True
     except:
         return False
\ No newline at end of file
@@ -0,0 +1,123 @@
+import streamlit as st
+import threading
+import time
+from src.services.supabase_client import supabase
+from src.services.decodificador_arrow import decodificar
+from src.services.instrumentacao import iniciar_medicao_rerun
+from src.services.resiliencia import ler_com_fallback, limpar_marcas_desatualizadas, dados_desatualizados
+
+# Chave do st.session_state onde vive o contexto do rerun atual
+CHAVE_CONTEXTO = "_contexto_rerun"
+
+# Chave do st.session_state com o cache de leituras da sessão (sobrevive aos reruns)
+CHAVE_CACHE_SESSAO = "_cache_sessao"
+
+# Rede de segurança para mudanças feitas fora deste processo (outro dispositivo, Pluggy...)
+TTL_CACHE_SESSAO_SEG = 300
+
+# Versão de cada tabela de cada usuário, compartilhada pelo processo inteiro.
+# Toda gravação incrementa a versão das tabelas que tocou; qualquer leitura
+# em cache feita com a versão antiga deixa de valer, em todas as sessões.
+_versoes = {}
+_lock_versoes = threading.Lock()
+
+
+# ==========================================
+# 1. CICLO DE VIDA DO CONTEXTO
+# ==========================================
+def iniciar_contexto_rerun():
+    """
+    Descarta os dados do rerun anterior.
+    Deve ser chamado UMA VEZ no início de cada execução do main().
+    """
+    st.session_state[CHAVE_CONTEXTO] = {}
+    iniciar_medicao_rerun()
+    limpar_marcas_desatualizadas()
+
+
+def _contexto():
+    if CHAVE_CONTEXTO not in st.session_state:
+        st.session_state[CHAVE_CONTEXTO] = {}
+    return st.session_state[CHAVE_CONTEXTO]
+
+
+def memorizar_no_rerun(chave, carregar):
+    """
+    Executa carregar() apenas na primeira vez que a chave é pedida neste rerun.
+    As chamadas seguintes recebem o mesmo resultado, sem ir ao banco de novo.
+    """
+    ctx = _contexto()
+    if chave not in ctx:
+        ctx[chave] = carregar()
+    return ctx[chave]
+
+
+# ==========================================
+# 2. VERSÕES E INVALIDAÇÃO POR GRAVAÇÃO
+# ==========================================
+def _usuario_da_sessao():
+    user = st.session_state.get("user")
+    return str(user.id) if user else None
+
+
+def versao_tabelas(user_id, tabelas):
+    """Tupla com a versão atual de cada tabela do usuário (serve de chave de cache)."""
+    uid = str(user_id)
+    return tuple(_versoes.get((uid, t), 0) for t in tabelas)
+
+
+def invalidar_tabelas(*tabelas, user_id=None):
+    """
+    Chamado por toda função de escrita (salvar_*, excluir_*, confirmar_pagamento).
+    Sem user_id, usa o usuário logado na sessão.
+    """
+    uid = str(user_id) if user_id else _usuario_da_sessao()
+    if not uid: return
+    with _lock_versoes:
+        for tabela in tabelas:
+            _versoes[(uid, tabela)] = _versoes.get((uid, tabela), 0) + 1
+
+
+def memorizar_na_sessao(chave, user_id, tabelas, carregar, ttl=TTL_CACHE_SESSAO_SEG):
+    """
+    Cache de leitura da sessão: carregar() só roda de novo quando alguma das
+    `tabelas` mudou de versão (gravação) ou o TTL venceu.
+    carregar() deve LEVANTAR exceção em caso de erro, para não guardar vazio no cache.
+    Se o Supabase estiver lento, devolve o último resultado bom (sem guardá-lo
+    aqui, para que o próximo rerun tente de novo) — ver resiliencia.py.
+    """
+    cache = st.session_state.setdefault(CHAVE_CACHE_SESSAO, {})
+    versoes = versao_tabelas(user_id, tabelas)
+    entrada = cache.get(chave)
+    if entrada and entrada['versoes'] == versoes and time.time() - entrada['em'] < ttl:
+        return entrada['valor']
+
+    valor = ler_com_fallback(chave, carregar, versao=versoes)
+    if chave not in dados_desatualizados():
+        cache[chave] = {'versoes': versoes, 'em': time.time(), 'valor': valor}
+    return valor
+
+
+# ==========================================
+# 3. TABELAS DO USUÁRIO
+# ==========================================
+def buscar_tabela_usuario(tabela, user_id, colunas="*"):
+    """
+    Retorna todas as linhas de `tabela` do usuário como DataFrame.
+    Consumidores que pedem a mesma projeção compartilham a mesma busca, que fica
+    em cache na sessão até a próxima gravação na tabela. Com o espelho local
+    ligado, a busca é feita no SQLite.
+    As colunas já vêm tipadas (datas e dinheiro) pelo decodificador Arrow.
+    Cada serviço recebe uma cópia, então pode alterar colunas à vontade.
+    """
+    # Import tardio: o espelho usa versao_tabelas deste módulo
+    from src.services.espelho_local import ler_linhas
+    uid = str(user_id)
+
+    def carregar():
+        linhas = ler_linhas(uid, tabela, colunas)
+        if linhas is None:
+            linhas = supabase.table(tabela).select(colunas).eq("id_usuario", uid).execute().data
+        return decodificar(tabela, linhas)
+
+    return memorizar_na_sessao(("tabela", tabela, uid, colunas), uid, (tabela,), carregar).copy()
@@ -0,0 +1,217 @@
+import time
+import threading
+from datetime import date
+import pandas as pd
+import yfinance as yf
+from src.services.instrumentacao import medir
+from src.utils.configuracao import ler_config
+
+# ==========================================
+# CONFIGURAÇÃO
+# ==========================================
+# Validade da cotação por classe de ativo (segundos)
+TTL_POR_CLASSE = {
+    "cripto": float(ler_config("COTACAO_TTL_CRIPTO_SEG", 60)),
+    "b3": float(ler_config("COTACAO_TTL_B3_SEG", 300)),
+    "exterior": float(ler_config("COTACAO_TTL_EXTERIOR_SEG", 300)),
+    "cambio": float(ler_config("COTACAO_TTL_CAMBIO_SEG", 600)),
+}
+# Quanto o primeiro pedido espera por pedidos de outras sessões antes de baixar
+JANELA_LOTE_SEG = float(ler_config("COTACAO_JANELA_LOTE_SEG", 0.05))
+# Limite de espera por um lote baixado por outra sessão
+ESPERA_MAX_LOTE_SEG = 20
+
+# Cache do processo inteiro: símbolo Yahoo -> (preço, quando)
+_cotacoes = {}
+_lote_aberto = None     # lote ainda aceitando símbolos
+_em_download = {}       # símbolo -> lote que já está baixando
+_lock = threading.Lock()
+
+
+class _Lote:
+    def __init__(self):
+        self.simbolos = set()
+        self.pronto = threading.Event()
+
+
+def classe_do_simbolo(simbolo):
+    s = str(simbolo).upper()
+    if s.endswith("=X"): return "cambio"
+    if s.endswith("-USD") or s.endswith("-BRL"): return "cripto"
+    if s.endswith(".SA"): return "b3"
+    return "exterior"
+
+
+def _fresca(simbolo, agora):
+    cotacao = _cotacoes.get(simbolo)
+    return cotacao is not None and agora - cotacao[1] < TTL_POR_CLASSE[classe_do_simbolo(simbolo)]
+
+
+# ==========================================
+# DOWNLOAD EM LOTE
+# ==========================================
+def _baixar(simbolos):
+    """Um único yf.download para todos os símbolos; guarda o último fechamento de cada um."""
+    simbolos = sorted(simbolos)
+    try:
+        with medir("yahoo"):
+            dados = yf.download(simbolos, period="1d", progress=False)['Close']
+    except Exception as e:
+        print(f"Erro Yahoo Batch: {e}")
+        return
+
+    if isinstance(dados, pd.Series):
+        dados = dados.to_frame(simbolos[0])
+    agora = time.time()
+    for s in simbolos:
+        if s not in dados.columns: continue
+        serie = dados[s].dropna()
+        if not serie.empty and float(serie.iloc[-1]) > 0:
+            _cotacoes[s] = (float(serie.iloc[-1]), agora)
+
+
+def _executar_lote(lote):
+    global _lote_aberto
+    # Dá tempo para outras sessões entrarem no mesmo lote
+    time.sleep(JANELA_LOTE_SEG)
+    with _lock:
+        if _lote_aberto is lote:
+            _lote_aberto = None
+        for s in lote.simbolos:
+            _em_download[s] = lote
+    try:
+        _baixar(lote.simbolos)
+    finally:
+        with _lock:
+            for s in lote.simbolos:
+                if _em_download.get(s) is lote:
+                    del _em_download[s]
+        lote.pronto.set()
+
+
+def obter_cotacoes(simbolos):
+    """
+    {símbolo Yahoo: último preço} para os símbolos pedidos, na moeda de cotação.
+    Cotação dentro da validade sai do cache; as que faltam, de todas as sessões
+    ao mesmo tempo, viram um único yf.download. Se o Yahoo falhar, devolve o
+    último preço conhecido; símbolo sem preço nenhum fica de fora.
+    """
+    global _lote_aberto
+    simbolos = set(simbolos)
+    agora = time.time()
+    faltando = {s for s in simbolos if not _fresca(s, agora)}
+
+    if faltando:
+        esperar, liderar = set(), None
+        with _lock:
+            novos = set()
+            for s in faltando:
+                lote = _em_download.get(s)
+                if lote is not None:
+                    esperar.add(lote)
+                else:
+                    novos.add(s)
+            if novos:
+                if _lote_aberto is None:
+                    _lote_aberto = liderar = _Lote()
+                _lote_aberto.simbolos.update(novos)
+                esperar.add(_lote_aberto)
+
+        if liderar is not None:
+            _executar_lote(liderar)
+        for lote in esperar:
+            lote.pronto.wait(ESPERA_MAX_LOTE_SEG)
+
+    return {s: _cotacoes[s][0] for s in simbolos if s in _cotacoes}
+
+
+# ==========================================
+# HISTÓRICO DE FECHAMENTOS
+# ==========================================
+# Cache do processo inteiro: símbolo -> {'serie', 'desde', 'verificado_em'}
+_historicos = {}
+_historicos_em_download = {}  # símbolo -> Event de quem está baixando
+_lock_historico = threading.Lock()
+
+
+def _baixar_historico(pedidos):
+    """Um único yf.download a partir do início mais antigo pedido. None se o Yahoo falhar."""
+    simbolos = sorted(pedidos)
+    try:
+        with medir("yahoo"):
+            dados = yf.download(simbolos, start=min(pedidos.values()).isoformat(),
+                                progress=False, auto_adjust=False)['Close']
+    except Exception as e:
+        print(f"Erro Yahoo Histórico: {e}")
+        return None
+
+    if isinstance(dados, pd.Series):
+        dados = dados.to_frame(simbolos[0])
+    indice = pd.to_datetime(dados.index)
+    if indice.tz is not None:
+        indice = indice.tz_convert(None)
+    dados.index = indice.normalize()
+    return dados
+
+
+def _juntar_historico(pedidos, dados, hoje):
+    """Junta cada símbolo ao que já havia (chamar com _lock_historico)."""
+    for s in pedidos:
+        atual = _historicos.get(s)
+        novo = dados[s].dropna() if s in dados.columns else pd.Series(dtype=float)
+        if atual is not None and atual['desde'] <= pedidos[s]:
+            # O pregão novo (e o último guardado, que pode ter sido parcial) vencem o antigo
+            novo = novo.combine_first(atual['serie'])
+        _historicos[s] = {'serie': novo.sort_index(), 'verificado_em': hoje,
+                          'desde': min(pedidos[s], atual['desde']) if atual else pedidos[s]}
+
+
+def obter_historico(simbolos, inicio):
+    """
+    DataFrame de fechamentos diários (linhas = pregões, colunas = símbolos), na
+    moeda de cotação, desde `inicio`. Cada símbolo baixa o histórico uma vez
+    por processo; nos dias seguintes só os pregões novos, todos os símbolos
+    num único yf.download. Se o Yahoo falhar, fica o que já estava guardado.
+    O download corre fora do lock: quem pede um símbolo que outra sessão já
+    está baixando espera só por ele.
+    """
+    inicio = pd.Timestamp(inicio).date()
+    hoje = date.today()
+    esperar = set()
+    with _lock_historico:
+        pedidos = {}
+        for s in set(simbolos):
+            atual = _historicos.get(s)
+            if atual is None or atual['desde'] > inicio:
+                pedidos[s] = inicio
+            elif atual['verificado_em'] != hoje:
+                ultimo = atual['serie'].index[-1].date() if not atual['serie'].empty else atual['desde']
+                pedidos[s] = max(ultimo, inicio)
+        for s in list(pedidos):
+            if s in _historicos_em_download:
+                esperar.add(_historicos_em_download[s])
+                del pedidos[s]
+        pronto = threading.Event()
+        for s in pedidos:
+            _historicos_em_download[s] = pronto
+
+    if pedidos:
+        try:
+            dados = _baixar_historico(pedidos)
+            if dados is not None:
+                with _lock_historico:
+                    _juntar_historico(pedidos, dados, hoje)
+        finally:
+            with _lock_historico:
+                for s in pedidos:
+                    if _historicos_em_download.get(s) is pronto:
+                        del _historicos_em_download[s]
+            pronto.set()
+    for evento in esperar:
+        evento.wait(ESPERA_MAX_LOTE_SEG)
+
+    with _lock_historico:
+        series = {s: _historicos[s]['serie'] for s in simbolos if s in _historicos}
+    if not series:
+        return pd.DataFrame()
+    return pd.DataFrame(series).loc[pd.Timestamp(inicio):]
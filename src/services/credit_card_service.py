@@ -1,7 +1,12 @@
 import pandas as pd
 from datetime import date, timedelta
 import calendar
+import uuid
 from src.services.supabase_client import supabase
+from src.services.contexto_dados import memorizar_na_sessao, invalidar_tabelas
+from src.services.projecoes import colunas
+from src.services.espelho_local import ler_linhas
+from src.services.decodificador_arrow import decodificar
 
 
 # --- HELPERS ---
@@ -23,8 +28,11 @@ def safe_date(year, month, day):
 # --- LEITURA E CONFIGURAÇÃO ---
 def listar_cartoes(user_id):
     try:
-        resp = supabase.table("config_cartoes").select("*").eq("id_usuario", user_id).execute()
-        return resp.data if resp.data else []
+        dados = memorizar_na_sessao(
+            ("cartoes", str(user_id)), user_id, ("config_cartoes",),
+            lambda: supabase.table("config_cartoes").select(colunas("cartoes")).eq("id_usuario", user_id).execute().data
+        )
+        return dados if dados else []
     except:
         return []
 
@@ -47,53 +55,64 @@ def calcular_datas_fatura(mes_ref, ano_ref, dia_fechamento, dia_vencimento):
 
 def buscar_fatura_detalhada(user_id, card_id, mes_ref, ano_ref):
     try:
-        card_resp = supabase.table("config_cartoes").select("dia_fechamento, dia_vencimento, limite").eq("id",
-                                                                                                         card_id).single().execute()
-        if not card_resp.data: return None
+        return memorizar_na_sessao(
+            ("fatura", str(user_id), str(card_id), int(mes_ref), int(ano_ref)), user_id,
+            ("config_cartoes", "transacoes_cartao_credito"),
+            lambda: _calcular_fatura_detalhada(user_id, card_id, mes_ref, ano_ref)
+        )
+    except Exception as e:
+        return None
+
 
-        card = card_resp.data
-        dia_fech = card.get('dia_fechamento', 1)
-        dia_venc = card.get('dia_vencimento', 10)
-        limite = float(card.get('limite', 0))
+def _calcular_fatura_detalhada(user_id, card_id, mes_ref, ano_ref):
+    card_resp = supabase.table("config_cartoes").select("dia_fechamento, dia_vencimento, limite").eq("id",
+                                                                                                     card_id).single().execute()
+    if not card_resp.data: return None
 
-        dt_ini, dt_fim, dt_venc = calcular_datas_fatura(mes_ref, ano_ref, dia_fech, dia_venc)
+    card = card_resp.data
+    dia_fech = card.get('dia_fechamento', 1)
+    dia_venc = card.get('dia_vencimento', 10)
+    limite = float(card.get('limite', 0))
 
-        resp_trans = supabase.table("transacoes_cartao_credito") \
-            .select("*") \
+    dt_ini, dt_fim, dt_venc = calcular_datas_fatura(mes_ref, ano_ref, dia_fech, dia_venc)
+
+    itens_fatura = ler_linhas(user_id, "transacoes_cartao_credito", colunas("fatura_itens"), dt_ini, dt_fim,
+                              filtros={"id_cartao": card_id})
+    if itens_fatura is None:
+        itens_fatura = supabase.table("transacoes_cartao_credito") \
+            .select(colunas("fatura_itens")) \
             .eq("id_usuario", user_id) \
             .eq("id_cartao", card_id) \
             .gte("data", str(dt_ini)) \
             .lte("data", str(dt_fim)) \
             .order("data", desc=True) \
-            .execute()
-
-        df = pd.DataFrame(resp_trans.data)
-
-        valor_fatura = 0.0
-        itens = []
-
-        if not df.empty:
-            df['data'] = pd.to_datetime(df['data']).dt.date
-            valor_fatura = df['valor'].sum()
-            itens = df.to_dict('records')
-
-        hoje = date.today()
-        status = "Aberta"
-        if hoje > dt_fim: status = "Fechada"
-        if hoje > dt_venc and valor_fatura > 0: status = "Atrasada"
-
-        return {
-            "fatura_total": valor_fatura,
-            "limite_total": limite,
-            "limite_disponivel": limite - valor_fatura,
-            "status": status,
-            "vencimento": dt_venc,
-            "fechamento": dt_fim,
-            "itens": itens,
-            "periodo": f"{dt_ini.strftime('%d/%m')} a {dt_fim.strftime('%d/%m')}"
-        }
-    except Exception as e:
-        return None
+            .execute().data
+
+    df = decodificar("transacoes_cartao_credito", itens_fatura)
+
+    valor_fatura = 0.0
+    itens = []
+
+    if not df.empty:
+        df['data'] = pd.to_datetime(df['data']).dt.date
+        valor_fatura = df['valor'].sum()
+        itens = df.to_dict('records')
+
+    hoje = date.today()
+    status = "Aberta"
+    if hoje > dt_fim: status = "Fechada"
+    if hoje > dt_venc and valor_fatura > 0: status = "Atrasada"
+
+    return {
+        "fatura_total": valor_fatura,
+        "limite_total": limite,
+        "limite_disponivel": limite - valor_fatura,
+        "status": status,
+        "vencimento": dt_venc,
+        "fechamento": dt_fim,
+        "itens": itens,
+        "periodo": f"{dt_ini.strftime('%d/%m')} a {dt_fim.strftime('%d/%m')}"
+    }
 
 
 # --- GRAVAÇÃO (MOVIDO DE TRANSACTION_SERVICE) ---
@@ -103,11 +122,15 @@ def salvar_compra_cartao(user_id, id_cartao, id_categoria, data_compra, descrica
         if qtd_parcelas < 1: qtd_parcelas = 1
 
         valor_parcela = float(valor_total) / qtd_parcelas
+        id_grupo = str(uuid.uuid4())
 
+        # Todas as parcelas vão num único INSERT (uma requisição, uma transação):
+        # ou o cronograma inteiro é gravado, ou nada é.
+        payloads = []
         for i in range(qtd_parcelas):
             data_lancamento = add_months(data_compra, i)
 
-            payload = {
+            payloads.append({
                 "id_usuario": user_id,
                 "id_cartao": id_cartao,
                 "id_categoria": id_categoria,
@@ -117,9 +140,12 @@ def salvar_compra_cartao(user_id, id_cartao, id_categoria, data_compra, descrica
                 "valor_total": float(valor_total),
                 "parcelas": qtd_parcelas,
                 "parcela_atual": i + 1,
-                "devedor": devedor
-            }
-            supabase.table("transacoes_cartao_credito").insert(payload).execute()
+                "devedor": devedor,
+                "id_grupo": id_grupo
+            })
+
+        supabase.table("transacoes_cartao_credito").insert(payloads).execute()
+        invalidar_tabelas("transacoes_cartao_credito", user_id=user_id)
 
         return True, f"Compra registrada em {qtd_parcelas}x com sucesso!"
     except Exception as e:
@@ -1,26 +1,19 @@
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import date, datetime
 from src.services.supabase_client import supabase
+from src.services.contexto_dados import buscar_tabela_usuario, memorizar_na_sessao
+from src.services.projecoes import colunas
+from src.services.catalogo_categorias import nomes_categorias
 from src.services.investment_service import buscar_dados_resumidos_dashboard
 
 # IDs de categorias que consideramos "Investimento" (Aportes não são gastos!)
 CAT_IDS_INVESTIMENTO = [1, 2, 3]
 
 
-# --- FUNÇÃO AUXILIAR DE LIMPEZA ---
-def limpar_valor_moeda(valor):
-    """Converte qualquer formato (float, int, str 'R$ 1.000,00') para float python"""
-    if valor is None:
-        return 0.0
-    if isinstance(valor, (int, float)):
-        return float(valor)
-    try:
-        # É string? Limpa caracteres de moeda
-        v_str = str(valor).strip()
-        v_str = v_str.replace('R$', '').replace(' ', '').replace('.', '').replace(',', '.')
-        return float(v_str)
-    except:
-        return 0.0
+def _primeiro_dia_mes_anterior(data_ref, meses):
+    """Primeiro dia do mês que fica `meses` meses antes de data_ref."""
+    total = data_ref.year * 12 + (data_ref.month - 1) - meses
+    return date(total // 12, total % 12 + 1, 1)
 
 
 # ==============================================================================
@@ -28,9 +21,12 @@ def limpar_valor_moeda(valor):
 # ==============================================================================
 def buscar_perfil_usuario(user_id):
     try:
-        res = supabase.table("usuarios").select("nome, saldo_inicial").eq("id_usuario",
-                                                                          str(user_id)).maybe_single().execute()
-        return res.data if res.data else {"nome": "Usuário", "saldo_inicial": 0}
+        dados = memorizar_na_sessao(
+            ("perfil", str(user_id)), user_id, ("usuarios",),
+            lambda: supabase.table("usuarios").select("nome, saldo_inicial").eq("id_usuario", str(user_id))
+            .maybe_single().execute().data
+        )
+        return dados if dados else {"nome": "Usuário", "saldo_inicial": 0}
     except:
         return {"nome": "Usuário", "saldo_inicial": 0}
 
@@ -38,6 +34,23 @@ def buscar_perfil_usuario(user_id):
 # ==============================================================================
 # 2. RESUMO FINANCEIRO E SCORE (MOTOR PRINCIPAL)
 # ==============================================================================
+def buscar_resumo_mensal(user_id, mes_inicio=None):
+    """
+    Linhas do agregado mensal (id_usuario, mes, id_categoria, tipo, total).
+    São poucas dezenas por ano, independentemente do tamanho do extrato.
+    """
+    def carregar():
+        query = supabase.table("resumo_mensal_categoria").select("mes, id_categoria, tipo, total") \
+            .eq("id_usuario", str(user_id))
+        if mes_inicio: query = query.gte("mes", str(mes_inicio))
+        resp = query.execute()
+        return resp.data if resp.data else []
+
+    # O agregado é mantido por trigger nas tabelas de lançamentos
+    return memorizar_na_sessao(("resumo_mensal", str(user_id), str(mes_inicio)), user_id,
+                               ("transacoes_bancarias", "transacoes_cartao_credito"), carregar)
+
+
 def buscar_resumo_financeiro(user_id):
     uid_str = str(user_id)
 
@@ -58,18 +71,25 @@ def buscar_resumo_financeiro(user_id):
         # --- A. BUSCA DADOS ATUAIS (SNAPSHOT) ---
 
         # 1. KPIs Básicos (View)
-        res_kpi = supabase.table("view_dashboard_kpis").select("*").eq("id_usuario", uid_str).maybe_single().execute()
-        if res_kpi.data:
-            r = res_kpi.data
+        kpi = memorizar_na_sessao(
+            ("view_dashboard_kpis", uid_str), uid_str, ("transacoes_bancarias", "transacoes_cartao_credito", "contas_bancarias"),
+            lambda: supabase.table("view_dashboard_kpis").select("*").eq("id_usuario", uid_str).maybe_single()
+            .execute().data
+        )
+        if kpi:
+            r = kpi
             resumo["saldo_final"] = float(r.get("saldo_final") or 0)
             resumo["a_pagar"] = float(r.get("a_pagar") or 0)
             resumo["entradas"] = float(r.get("entradas") or 0)  # Entradas do mês atual
             resumo["saidas"] = float(r.get("saidas") or 0)  # Saídas do mês atual
 
         # 2. Fatura Atual
-        res_ciclos = supabase.table("view_faturas_por_ciclo").select("*").eq("id_usuario", uid_str).execute()
-        if res_ciclos.data:
-            df = pd.DataFrame(res_ciclos.data)
+        ciclos = memorizar_na_sessao(
+            ("view_faturas_por_ciclo", uid_str), uid_str, ("transacoes_cartao_credito", "config_cartoes"),
+            lambda: supabase.table("view_faturas_por_ciclo").select("*").eq("id_usuario", uid_str).execute().data
+        )
+        if ciclos:
+            df = pd.DataFrame(ciclos)
             if 'data_inicio' in df.columns:
                 df['data_inicio'] = pd.to_datetime(df['data_inicio']).dt.tz_localize(None)
                 df['data_fim'] = pd.to_datetime(df['data_fim']).dt.tz_localize(None)
@@ -84,11 +104,14 @@ def buscar_resumo_financeiro(user_id):
                     resumo["cartao_fim"] = str(row['data_fim'].date())
 
         # 3. Contas Bancárias
-        res_c = supabase.table("contas_bancarias").select("nome_banco, saldo_inicial").eq("id_usuario",
-                                                                                          uid_str).execute()
-        if res_c.data:
+        contas = memorizar_na_sessao(
+            ("saldos_contas", uid_str), uid_str, ("contas_bancarias",),
+            lambda: supabase.table("contas_bancarias").select("nome_banco, saldo_inicial").eq("id_usuario", uid_str)
+            .execute().data
+        )
+        if contas:
             resumo["detalhe_contas"] = [{"banco": c.get("nome_banco"), "saldo": float(c.get("saldo_inicial", 0))} for c
-                                        in res_c.data]
+                                        in contas]
 
         # 4. Investimentos (Service Externo)
         try:
@@ -107,41 +130,27 @@ def buscar_resumo_financeiro(user_id):
 
         # --- B. CÁLCULO DE SCORE DE LONGO PRAZO (12 MESES) ---
 
-        # Define janela de tempo (Últimos 365 dias)
-        data_limite = (datetime.now() - timedelta(days=365)).strftime('%Y-%m-%d')
+        # Janela: os 12 meses mais recentes (mês atual incluso), lidos do agregado
+        # mensal mantido por trigger (sql/004_resumo_mensal_categoria.sql)
+        hoje = datetime.now().date()
+        mes_inicio = _primeiro_dia_mes_anterior(hoje, 11)
 
         # Variáveis acumuladoras 12m
         ganhos_12m = 0.0
         gastos_brutos_12m = 0.0
         aportes_12m = 0.0
 
-        # Busca Transações Bancárias (Últimos 12 meses)
-        res_b_12m = supabase.table("transacoes_bancarias").select("valor, tipo, id_categoria") \
-            .eq("id_usuario", uid_str).gte("data", data_limite).execute()
-
-        if res_b_12m.data:
-            for t in res_b_12m.data:
-                val = limpar_valor_moeda(t.get('valor'))
-                tipo = t.get('tipo')
-                cat = t.get('id_categoria')
-
-                if tipo == 'entrada':
-                    ganhos_12m += val
-                elif tipo == 'saida':
-                    gastos_brutos_12m += val
-                    # Se for saída para investimento, somamos aos aportes
-                    if cat in CAT_IDS_INVESTIMENTO:
-                        aportes_12m += val
-
-        # Busca Transações Cartão (Últimos 12 meses) - Consideramos tudo gasto, exceto se categ. for invest
-        res_c_12m = supabase.table("transacoes_cartao_credito").select("valor, id_categoria") \
-            .eq("id_usuario", uid_str).gte("data", data_limite).execute()
-
-        if res_c_12m.data:
-            for t in res_c_12m.data:
-                val = limpar_valor_moeda(t.get('valor'))
-                cat = t.get('id_categoria')
+        # Conta: 'entrada' / 'saida'. Cartão: 'cartao' (tudo gasto, exceto se categ. for invest)
+        for t in buscar_resumo_mensal(uid_str, mes_inicio):
+            val = float(t.get('total') or 0)
+            tipo = t.get('tipo')
+            cat = t.get('id_categoria')
+
+            if tipo == 'entrada':
+                ganhos_12m += val
+            elif tipo in ('saida', 'cartao'):
                 gastos_brutos_12m += val
+                # Se for saída para investimento, somamos aos aportes
                 if cat in CAT_IDS_INVESTIMENTO:
                     aportes_12m += val
 
@@ -217,18 +226,20 @@ def buscar_resumo_financeiro(user_id):
 # 3. GRÁFICOS (FLUXO DE CAIXA E COMPOSIÇÃO)
 # ==============================================================================
 def buscar_transacoes_graficos(user_id):
+    """
+    Fluxo de caixa da conta corrente (gráfico de evolução).
+    A composição de gastos, que inclui o cartão, vem de buscar_gastos_por_categoria.
+    """
     try:
         uid = str(user_id)
         frames = []
 
         # 1. BANCÁRIAS
-        res_b = supabase.table("transacoes_bancarias").select("*").eq("id_usuario", uid).execute()
+        df_b = buscar_tabela_usuario("transacoes_bancarias", uid, colunas("dashboard_bancarias"))
 
-        if res_b.data:
-            df_b = pd.DataFrame(res_b.data)
-            if 'valor' in df_b.columns:
-                df_b['valor'] = df_b['valor'].apply(limpar_valor_moeda)
-            else:
+        if not df_b.empty:
+            # 'valor' já chega como float64 (decodificador Arrow)
+            if 'valor' not in df_b.columns:
                 df_b['valor'] = 0.0
 
             if 'tipo' not in df_b.columns: df_b['tipo'] = 'saida'
@@ -237,22 +248,6 @@ def buscar_transacoes_graficos(user_id):
             cols = [c for c in ['data', 'valor_grafico', 'tipo', 'id_categoria', 'valor'] if c in df_b.columns]
             frames.append(df_b[cols])
 
-        # 2. CARTÃO
-        res_c = supabase.table("transacoes_cartao_credito").select("*").eq("id_usuario", uid).execute()
-
-        if res_c.data:
-            df_c = pd.DataFrame(res_c.data)
-            if 'valor' in df_c.columns:
-                df_c['valor'] = df_c['valor'].apply(limpar_valor_moeda)
-            else:
-                df_c['valor'] = 0.0
-
-            df_c['valor_grafico'] = -df_c['valor']  # Saída
-            df_c['tipo'] = 'cartao'
-
-            cols = [c for c in ['data', 'valor_grafico', 'tipo', 'id_categoria', 'valor'] if c in df_c.columns]
-            frames.append(df_c[cols])
-
         if not frames:
             return pd.DataFrame()
 
@@ -265,18 +260,7 @@ def buscar_transacoes_graficos(user_id):
 
         # Categorias
         if 'id_categoria' in df_final.columns:
-            ids = df_final['id_categoria'].dropna().unique().tolist()
-            if ids:
-                try:
-                    ids = [int(i) for i in ids]
-                    res_cat = supabase.table("categorias").select("id_categoria, nome").in_("id_categoria",
-                                                                                            ids).execute()
-                    if res_cat.data:
-                        df_cat = pd.DataFrame(res_cat.data)
-                        df_final = df_final.merge(df_cat, on='id_categoria', how='left')
-                        df_final.rename(columns={'nome': 'categoria'}, inplace=True)
-                except:
-                    pass
+            df_final['categoria'] = df_final['id_categoria'].map(nomes_categorias())
 
         if 'categoria' not in df_final.columns:
             df_final['categoria'] = 'Geral'
@@ -287,4 +271,30 @@ def buscar_transacoes_graficos(user_id):
 
     except Exception as e:
         print(f"Erro Gráficos: {e}")
-        return pd.DataFrame()
\ No newline at end of file
+        return pd.DataFrame()
+
+
+def buscar_gastos_por_categoria(user_id):
+    """
+    Gastos (conta + cartão) por categoria, somados a partir do agregado mensal.
+    Retorna DataFrame com 'categoria' e 'valor'.
+    """
+    try:
+        df = pd.DataFrame(buscar_resumo_mensal(user_id))
+        if df.empty:
+            return pd.DataFrame(columns=['categoria', 'valor'])
+
+        df = df[df['tipo'].isin(['saida', 'cartao'])].copy()
+        df['total'] = pd.to_numeric(df['total'], errors='coerce').fillna(0)
+        df = df.groupby('id_categoria', as_index=False)['total'].sum()
+        df = df[df['total'] != 0]
+        if df.empty:
+            return pd.DataFrame(columns=['categoria', 'valor'])
+
+        df['categoria'] = df['id_categoria'].map(nomes_categorias()).fillna('Geral')
+        df = df.groupby('categoria', as_index=False)['total'].sum().rename(columns={'total': 'valor'})
+        return df
+
+    except Exception as e:
+        print(f"Erro Gastos por Categoria: {e}")
+        return pd.DataFrame(columns=['categoria', 'valor'])
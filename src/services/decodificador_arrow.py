@@ -0,0 +1,120 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from src.utils.formatters import limpar_valor_moeda
+
+# ==========================================
+# ESQUEMAS POR TABELA
+# ==========================================
+# Tipos lógicos além dos do Arrow:
+#   DATA     -> date32 (aceita 'AAAA-MM-DD' e timestamps ISO, que são truncados no dia)
+#   DINHEIRO -> int64 em centavos no Arrow; chega ao pandas como float64 em reais
+# Colunas fora do esquema passam com o tipo inferido pelo Arrow.
+DATA = "data"
+DINHEIRO = "dinheiro"
+
+ESQUEMAS = {
+    "transacoes_bancarias": {
+        "id_trans_bank": pa.int64(), "data": DATA, "valor": DINHEIRO, "tipo": pa.string(),
+        "id_categoria": pa.int64(), "concluido": pa.bool_(), "descricao": pa.string(), "id_grupo": pa.string(),
+    },
+    "transacoes_cartao_credito": {
+        "id_trans_cartao": pa.int64(), "data": DATA, "valor": DINHEIRO, "valor_total": DINHEIRO,
+        "parcelas": pa.int64(), "parcela_atual": pa.int64(), "id_categoria": pa.int64(), "descricao": pa.string(),
+        "id_grupo": pa.string(),
+    },
+    "investimento": {
+        "id_invest": pa.int64(), "data": DATA, "descricao": pa.string(), "id_categoria": pa.int64(),
+        "quantidade": pa.float64(), "valor_investido": DINHEIRO, "taxa": pa.float64(), "indexador": pa.string(),
+    },
+}
+
+
+# ==========================================
+# CONVERSÃO POR COLUNA
+# ==========================================
+def _coluna_data(valores):
+    texto = pa.array([None if v is None else str(v) for v in valores], pa.string())
+    dia = pc.utf8_slice_codeunits(texto, 0, 10)
+    return pc.cast(pc.strptime(dia, format="%Y-%m-%d", unit="s", error_is_null=True), pa.date32())
+
+
+def _reais(valor):
+    """
+    Um valor em texto: '1500.50' é número comum; só com vírgula é o formato
+    brasileiro ('R$ 1.234,56'), em que o ponto separa milhar.
+    """
+    if valor is None or isinstance(valor, (int, float)):
+        return valor
+    texto = str(valor).replace('R$', '').strip()
+    if ',' in texto:
+        return limpar_valor_moeda(texto)
+    try:
+        return float(texto.replace(' ', ''))
+    except ValueError:
+        return None
+
+
+def _coluna_dinheiro(valores):
+    try:
+        reais = pa.array(valores, pa.float64())
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Texto (dados antigos): só então cai para o Python
+        reais = pa.array([_reais(v) for v in valores], pa.float64())
+    centavos = pc.cast(pc.round(pc.multiply(reais, 100)), pa.int64())
+    return pc.fill_null(centavos, 0)
+
+
+def _coluna_numerica(tipo, valores):
+    """Números em texto ('2', '1,5') valor a valor; o que não for número vira nulo."""
+    numeros = [_reais(v) for v in valores]
+    if pa.types.is_integer(tipo):
+        numeros = [int(n) if n is not None and float(n).is_integer() else None for n in numeros]
+    return pa.array(numeros, tipo)
+
+
+def _coluna(tipo, valores):
+    if tipo == DATA:
+        return _coluna_data(valores)
+    if tipo == DINHEIRO:
+        return _coluna_dinheiro(valores)
+    if tipo is not None:
+        try:
+            return pa.array(valores, tipo)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Coluna numérica nunca cai para o tipo inferido: texto viraria object
+            if pa.types.is_integer(tipo) or pa.types.is_floating(tipo):
+                return _coluna_numerica(tipo, valores)
+    return pa.array(valores)
+
+
+def para_arrow(tabela, linhas):
+    """Lista de dicts do PostgREST -> pa.Table tipada pelo esquema da tabela."""
+    esquema = ESQUEMAS.get(tabela, {})
+    nomes = list(linhas[0].keys())
+    return pa.table({nome: _coluna(esquema.get(nome), [r.get(nome) for r in linhas]) for nome in nomes})
+
+
+def decodificar(tabela, linhas):
+    """
+    Substitui pd.DataFrame(resp.data) + pd.to_datetime/pd.to_numeric coluna a coluna.
+    Datas chegam como datetime64 e dinheiro como float64 (reais, arredondado ao centavo).
+    Se algo fugir do esquema, devolve o DataFrame comum, como antes.
+    """
+    if not linhas:
+        return pd.DataFrame()
+    if tabela not in ESQUEMAS:
+        return pd.DataFrame(linhas)
+    try:
+        tabela_arrow = para_arrow(tabela, linhas)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+        print(f"Decodificador Arrow ({tabela}): {e}")
+        return pd.DataFrame(linhas)
+
+    dinheiro = [n for n, t in ESQUEMAS[tabela].items() if t == DINHEIRO and n in tabela_arrow.column_names]
+    for nome in dinheiro:
+        i = tabela_arrow.column_names.index(nome)
+        reais = pc.divide(pc.cast(tabela_arrow.column(i), pa.float64()), 100.0)
+        tabela_arrow = tabela_arrow.set_column(i, nome, reais)
+
+    return tabela_arrow.to_pandas(date_as_object=False)
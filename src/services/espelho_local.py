@@ -0,0 +1,234 @@
+import os
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from src.services.supabase_client import supabase
+from src.services.contexto_dados import versao_tabelas
+from src.utils.configuracao import ler_config, ler_config_bool
+
+# ==========================================
+# CONFIGURAÇÃO
+# ==========================================
+# Desligado por padrão: sem ESPELHO_LOCAL, todas as leituras vão direto ao Supabase
+ESPELHO_ATIVO = ler_config_bool("ESPELHO_LOCAL", False)
+PASTA_ESPELHO = ler_config("ESPELHO_LOCAL_PASTA", os.path.join(".cache", "espelho"))
+
+# Sem gravação local, no máximo a cada N segundos pergunta ao Supabase o que mudou
+INTERVALO_SYNC_SEG = float(ler_config("ESPELHO_INTERVALO_SEG", 30))
+# Comparação completa de ids (descobre exclusões feitas em outro lugar)
+INTERVALO_RECONCILIACAO_SEG = float(ler_config("ESPELHO_RECONCILIACAO_SEG", 600))
+TAMANHO_LOTE_SYNC = 1000
+# atualizado_em é o now() do início da transação: uma transação longa pode
+# confirmar depois de o espelho já ter avançado a marca além dela. O delta
+# relê esta janela antes da marca para não perder essas linhas.
+SOBREPOSICAO_SYNC_SEG = float(ler_config("ESPELHO_SOBREPOSICAO_SEG", 300))
+
+# tabela -> coluna de id (chave primária no Supabase e no espelho)
+TABELAS_ESPELHO = {
+    "transacoes_bancarias": "id_trans_bank",
+    "transacoes_cartao_credito": "id_trans_cartao",
+    "investimento": "id_invest",
+}
+
+# (uid, tabela) -> {'em', 'versao', 'reconciliado_em'}: só em memória, a marca fica no SQLite
+_estado_sync = {}
+_locks_usuario = {}
+_lock_global = threading.Lock()
+
+
+def _lock_do_usuario(uid):
+    with _lock_global:
+        return _locks_usuario.setdefault(uid, threading.Lock())
+
+
+# ==========================================
+# 1. ARQUIVO SQLITE DO USUÁRIO
+# ==========================================
+def _conectar(uid):
+    """Uma conexão por chamada: o Streamlit atende cada sessão numa thread diferente."""
+    os.makedirs(PASTA_ESPELHO, exist_ok=True)
+    con = sqlite3.connect(os.path.join(PASTA_ESPELHO, f"{uid}.sqlite3"), timeout=10)
+    con.execute("pragma journal_mode=wal")
+    for tabela in TABELAS_ESPELHO:
+        con.execute(f"""
+            create table if not exists {tabela} (
+                pk            integer primary key,
+                id_usuario    text not null,
+                data          text,
+                atualizado_em text,
+                registro      text not null
+            )""")
+        con.execute(f"create index if not exists idx_{tabela}_usuario_data on {tabela} (id_usuario, data)")
+    con.execute("""
+        create table if not exists sync_estado (
+            tabela text primary key,
+            marca  text
+        )""")
+    return con
+
+
+def _ler_marca(con, tabela):
+    linha = con.execute("select marca from sync_estado where tabela = ?", (tabela,)).fetchone()
+    return linha[0] if linha else None
+
+
+def _gravar_linhas(con, tabela, linhas):
+    col_id = TABELAS_ESPELHO[tabela]
+    con.executemany(
+        f"insert or replace into {tabela} (pk, id_usuario, data, atualizado_em, registro) values (?, ?, ?, ?, ?)",
+        [(int(r[col_id]), str(r.get('id_usuario')), str(r.get('data') or ''), r.get('atualizado_em'),
+          json.dumps(r, default=str)) for r in linhas]
+    )
+
+
+# ==========================================
+# 2. SINCRONIZAÇÃO (DELTA + RECONCILIAÇÃO)
+# ==========================================
+def _inicio_delta(marca):
+    """Marca menos a janela de sobreposição (a própria marca se não der para interpretá-la)."""
+    try:
+        return (datetime.fromisoformat(marca) - timedelta(seconds=SOBREPOSICAO_SYNC_SEG)).isoformat()
+    except (TypeError, ValueError):
+        return marca
+
+
+def _buscar_delta(uid, tabela, marca):
+    """
+    Linhas com atualizado_em >= marca - SOBREPOSICAO_SYNC_SEG (>= porque um
+    INSERT em lote grava o mesmo instante). Reler a janela é inofensivo: a
+    gravação no espelho é por chave primária.
+    """
+    col_id = TABELAS_ESPELHO[tabela]
+    desde = _inicio_delta(marca) if marca else None
+    linhas, inicio = [], 0
+    while True:
+        query = supabase.table(tabela).select("*").eq("id_usuario", uid)
+        if desde: query = query.gte("atualizado_em", desde)
+        lote = query.order("atualizado_em").order(col_id) \
+            .range(inicio, inicio + TAMANHO_LOTE_SYNC - 1).execute().data or []
+        linhas.extend(lote)
+        if len(lote) < TAMANHO_LOTE_SYNC:
+            return linhas
+        inicio += TAMANHO_LOTE_SYNC
+
+
+def _reconciliar(con, uid, tabela):
+    """Compara só os ids: apaga o que sumiu no Supabase e busca o que faltar aqui."""
+    col_id = TABELAS_ESPELHO[tabela]
+    remotos, inicio = set(), 0
+    while True:
+        lote = supabase.table(tabela).select(col_id).eq("id_usuario", uid).order(col_id) \
+            .range(inicio, inicio + TAMANHO_LOTE_SYNC - 1).execute().data or []
+        remotos.update(int(r[col_id]) for r in lote)
+        if len(lote) < TAMANHO_LOTE_SYNC: break
+        inicio += TAMANHO_LOTE_SYNC
+
+    locais = {pk for (pk,) in con.execute(f"select pk from {tabela} where id_usuario = ?", (uid,))}
+    sumidos = locais - remotos
+    if sumidos:
+        con.executemany(f"delete from {tabela} where pk = ?", [(pk,) for pk in sumidos])
+    faltando = sorted(remotos - locais)
+    for i in range(0, len(faltando), 200):
+        lote = supabase.table(tabela).select("*").in_(col_id, faltando[i:i + 200]).execute().data or []
+        _gravar_linhas(con, tabela, lote)
+
+
+def _sincronizar(con, uid, tabela, reconciliar):
+    marca = _ler_marca(con, tabela)
+    linhas = _buscar_delta(uid, tabela, marca)
+    if linhas:
+        _gravar_linhas(con, tabela, linhas)
+        # A marca nunca recua: a janela relida pode trazer só linhas antigas
+        nova_marca = max([str(r.get('atualizado_em') or '') for r in linhas] + [marca or '']) or marca
+        con.execute("insert or replace into sync_estado (tabela, marca) values (?, ?)", (tabela, nova_marca))
+    # Na primeira carga o delta já trouxe tudo
+    if reconciliar and marca is not None:
+        _reconciliar(con, uid, tabela)
+    con.commit()
+
+
+def _garantir_atualizado(con, uid, tabela):
+    """
+    Sincroniza se houve gravação nesta instância (versão mudou; aí também
+    reconcilia os ids, para refletir exclusões) ou se o intervalo venceu. Se o Supabase falhar, segue com o que já está no espelho.
+    Retorna False só quando o espelho nunca foi preenchido.
+    """
+    agora = time.time()
+    versao = versao_tabelas(uid, (tabela,))
+    chave = (uid, tabela)
+    estado = _estado_sync.get(chave)
+    if estado and estado['versao'] == versao and agora - estado['em'] < INTERVALO_SYNC_SEG:
+        return True
+
+    with _lock_do_usuario(uid):
+        estado = _estado_sync.get(chave)
+        if estado and estado['versao'] == versao and agora - estado['em'] < INTERVALO_SYNC_SEG:
+            return True
+        # Gravação neste processo (versão mudou) pode ter sido uma exclusão, que o
+        # delta por atualizado_em não enxerga: compara os ids na hora
+        reconciliar = (not estado or estado['versao'] != versao
+                       or agora - estado['reconciliado_em'] >= INTERVALO_RECONCILIACAO_SEG)
+        try:
+            _sincronizar(con, uid, tabela, reconciliar)
+            _estado_sync[chave] = {
+                'em': agora, 'versao': versao,
+                'reconciliado_em': agora if reconciliar else estado['reconciliado_em'],
+            }
+        except Exception as e:
+            con.rollback()
+            print(f"Espelho local: falha ao sincronizar {tabela}: {e}")
+            return _ler_marca(con, tabela) is not None
+    return True
+
+
+# ==========================================
+# 3. LEITURA
+# ==========================================
+def ler_linhas(user_id, tabela, colunas="*", data_inicio=None, data_fim=None, filtros=None,
+               cursor=None, limite=None):
+    """
+    Linhas da tabela do usuário a partir do espelho, ordenadas por (data, id) decrescente.
+    `filtros` = {coluna: valor} (igualdade); `cursor` = (data, id) da última linha já lida.
+    Retorna None quando o espelho está desligado ou indisponível: o chamador
+    deve então consultar o Supabase normalmente.
+    """
+    if not ESPELHO_ATIVO or tabela not in TABELAS_ESPELHO:
+        return None
+    uid = str(user_id)
+    try:
+        con = _conectar(uid)
+    except Exception as e:
+        print(f"Espelho local indisponível: {e}")
+        return None
+
+    try:
+        if not _garantir_atualizado(con, uid, tabela):
+            return None
+
+        sql = f"select registro from {tabela} where id_usuario = ?"
+        params = [uid]
+        if data_inicio:
+            sql += " and data >= ?"; params.append(str(data_inicio))
+        if data_fim:
+            # '~' ordena depois de 'T': datas com hora também entram no último dia
+            sql += " and data <= ?"; params.append(f"{data_fim}~")
+        if cursor:
+            sql += " and (data < ? or (data = ? and pk < ?))"
+            params += [str(cursor[0]), str(cursor[0]), int(cursor[1])]
+        sql += " order by data desc, pk desc"
+
+        filtros = filtros or {}
+        cols = None if colunas == "*" else [c.strip() for c in colunas.split(",")]
+        linhas = []
+        for (registro,) in con.execute(sql, params):
+            r = json.loads(registro)
+            if any(str(r.get(k)) != str(v) for k, v in filtros.items()):
+                continue
+            linhas.append(r if cols is None else {c: r.get(c) for c in cols})
+            if limite and len(linhas) >= limite:
+                break
+        return linhas
+    finally:
+        con.close()
@@ -0,0 +1,239 @@
+import time
+import bisect
+from collections import OrderedDict
+import difflib
+import threading
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturoTimeout
+from src.services.instrumentacao import sessao_http
+from src.utils.configuracao import ler_config
+
+# ==========================================
+# CONFIGURAÇÃO
+# ==========================================
+# Validade de uma busca no Yahoo já feita (segundos) e quantas ficam guardadas
+TTL_BUSCA_YAHOO_SEG = float(ler_config("BUSCA_YAHOO_TTL_SEG", 86400))
+MAX_BUSCAS_YAHOO = int(ler_config("BUSCA_YAHOO_MAX", 2000))
+# Só quando o índice local não acha nada a tela espera o Yahoo (o antigo timeout)
+ESPERA_YAHOO_SEG = float(ler_config("BUSCA_YAHOO_ESPERA_SEG", 2))
+# Com menos resultados locais que isso, o Yahoo é consultado em segundo plano
+MINIMO_LOCAL = 3
+LIMITE_SUGESTOES = 8
+
+# Símbolos Yahoo conhecidos de antemão: (símbolo, nome)
+TICKERS_B3 = (
+    ("PETR4.SA", "Petrobras PN"), ("PETR3.SA", "Petrobras ON"), ("VALE3.SA", "Vale ON"),
+    ("ITUB4.SA", "Itaú Unibanco PN"), ("BBDC4.SA", "Bradesco PN"), ("BBDC3.SA", "Bradesco ON"),
+    ("BBAS3.SA", "Banco do Brasil ON"), ("SANB11.SA", "Santander Brasil Unit"), ("BPAC11.SA", "BTG Pactual Unit"),
+    ("ITSA4.SA", "Itaúsa PN"), ("B3SA3.SA", "B3 ON"), ("ABEV3.SA", "Ambev ON"), ("WEGE3.SA", "WEG ON"),
+    ("RENT3.SA", "Localiza ON"), ("SUZB3.SA", "Suzano ON"), ("GGBR4.SA", "Gerdau PN"), ("CSNA3.SA", "CSN ON"),
+    ("USIM5.SA", "Usiminas PNA"), ("PRIO3.SA", "PRIO ON"), ("RRRP3.SA", "3R Petroleum ON"), ("UGPA3.SA", "Ultrapar ON"),
+    ("VBBR3.SA", "Vibra Energia ON"), ("ELET3.SA", "Eletrobras ON"), ("ELET6.SA", "Eletrobras PNB"),
+    ("EGIE3.SA", "Engie Brasil ON"), ("TAEE11.SA", "Taesa Unit"), ("CMIG4.SA", "Cemig PN"), ("CPLE6.SA", "Copel PNB"),
+    ("SBSP3.SA", "Sabesp ON"), ("EQTL3.SA", "Equatorial ON"), ("TRPL4.SA", "ISA CTEEP PN"), ("CPFE3.SA", "CPFL Energia ON"),
+    ("RADL3.SA", "Raia Drogasil ON"), ("HAPV3.SA", "Hapvida ON"), ("RDOR3.SA", "Rede D'Or ON"), ("FLRY3.SA", "Fleury ON"),
+    ("LREN3.SA", "Lojas Renner ON"), ("MGLU3.SA", "Magazine Luiza ON"), ("ASAI3.SA", "Assaí ON"), ("CRFB3.SA", "Carrefour Brasil ON"),
+    ("NTCO3.SA", "Natura ON"), ("JBSS3.SA", "JBS ON"), ("BRFS3.SA", "BRF ON"), ("MRFG3.SA", "Marfrig ON"),
+    ("BEEF3.SA", "Minerva ON"), ("SLCE3.SA", "SLC Agrícola ON"), ("RAIL3.SA", "Rumo ON"), ("CCRO3.SA", "CCR ON"),
+    ("EMBR3.SA", "Embraer ON"), ("AZUL4.SA", "Azul PN"), ("TOTS3.SA", "Totvs ON"), ("VIVT3.SA", "Telefônica Brasil ON"),
+    ("TIMS3.SA", "TIM ON"), ("KLBN11.SA", "Klabin Unit"), ("CYRE3.SA", "Cyrela ON"), ("MRVE3.SA", "MRV ON"),
+    ("BBSE3.SA", "BB Seguridade ON"), ("CXSE3.SA", "Caixa Seguridade ON"), ("PSSA3.SA", "Porto Seguro ON"),
+    ("HGLG11.SA", "CSHG Logística FII"), ("KNRI11.SA", "Kinea Renda Imobiliária FII"), ("MXRF11.SA", "Maxi Renda FII"),
+    ("XPML11.SA", "XP Malls FII"), ("VISC11.SA", "Vinci Shopping Centers FII"), ("HGRU11.SA", "CSHG Renda Urbana FII"),
+    ("KNCR11.SA", "Kinea Rendimentos Imobiliários FII"), ("BTLG11.SA", "BTG Pactual Logística FII"),
+    ("XPLG11.SA", "XP Log FII"), ("CPTS11.SA", "Capitânia Securities FII"), ("IRDM11.SA", "Iridium Recebíveis FII"),
+    ("VGHF11.SA", "Valora Hedge Fund FII"), ("ALZR11.SA", "Alianza Trust Renda Imobiliária FII"),
+    ("BOVA11.SA", "iShares Ibovespa ETF"), ("IVVB11.SA", "iShares S&P 500 ETF"), ("SMAL11.SA", "iShares Small Cap ETF"),
+    ("HASH11.SA", "Hashdex Nasdaq Crypto ETF"), ("GOLD11.SA", "Trend Ouro ETF"), ("DIVO11.SA", "It Now IDIV ETF"),
+)
+
+TICKERS_EXTERIOR = (
+    ("AAPL", "Apple"), ("MSFT", "Microsoft"), ("AMZN", "Amazon"), ("GOOGL", "Alphabet A"), ("GOOG", "Alphabet C"),
+    ("META", "Meta Platforms"), ("NVDA", "NVIDIA"), ("TSLA", "Tesla"), ("BRK-B", "Berkshire Hathaway B"),
+    ("JPM", "JPMorgan Chase"), ("V", "Visa"), ("MA", "Mastercard"), ("KO", "Coca-Cola"), ("PEP", "PepsiCo"),
+    ("DIS", "Walt Disney"), ("NFLX", "Netflix"), ("AMD", "Advanced Micro Devices"), ("INTC", "Intel"),
+    ("AVGO", "Broadcom"), ("ORCL", "Oracle"), ("CRM", "Salesforce"), ("ADBE", "Adobe"), ("WMT", "Walmart"),
+    ("JNJ", "Johnson & Johnson"), ("PG", "Procter & Gamble"), ("XOM", "Exxon Mobil"), ("MCD", "McDonald's"),
+    ("NKE", "Nike"), ("O", "Realty Income"), ("SPY", "SPDR S&P 500 ETF"), ("VOO", "Vanguard S&P 500 ETF"),
+    ("IVV", "iShares Core S&P 500 ETF"), ("QQQ", "Invesco QQQ ETF"), ("VTI", "Vanguard Total Stock Market ETF"),
+    ("VT", "Vanguard Total World Stock ETF"), ("SCHD", "Schwab US Dividend Equity ETF"), ("TLT", "iShares 20+ Year Treasury ETF"),
+)
+
+TICKERS_CRIPTO = (
+    ("BTC-USD", "Bitcoin"), ("ETH-USD", "Ethereum"), ("SOL-USD", "Solana"), ("USDT-USD", "Tether"),
+    ("USDC-USD", "USD Coin"), ("BNB-USD", "BNB"), ("XRP-USD", "XRP"), ("ADA-USD", "Cardano"), ("DOGE-USD", "Dogecoin"),
+    ("DOT-USD", "Polkadot"), ("AVAX-USD", "Avalanche"), ("LINK-USD", "Chainlink"), ("LTC-USD", "Litecoin"),
+    ("TRX-USD", "TRON"), ("TON11419-USD", "Toncoin"), ("ATOM-USD", "Cosmos"), ("UNI7083-USD", "Uniswap"),
+)
+
+
+def _normalizar(texto):
+    """Maiúsculas e sem acento: 'itaú' -> 'ITAU'."""
+    texto = unicodedata.normalize("NFKD", str(texto))
+    return "".join(c for c in texto if not unicodedata.combining(c)).upper().strip()
+
+
+def _base(simbolo):
+    """Símbolo sem o sufixo do Yahoo: 'PETR4.SA' -> 'PETR4', 'BTC-USD' -> 'BTC'."""
+    return simbolo.split(".")[0].split("-")[0]
+
+
+# ==========================================
+# 1. ÍNDICE EM MEMÓRIA
+# ==========================================
+class IndiceTickers:
+    """
+    Busca por prefixo (do símbolo e de cada palavra do nome) em listas ordenadas,
+    com bisect, e por semelhança (difflib) quando o prefixo não acha nada.
+    """
+
+    def __init__(self, entradas=()):
+        self.nomes = {}        # símbolo -> nome
+        self._chaves = []      # (chave, símbolo) ordenado
+        self._distintas = None  # chaves sem repetição, para o difflib (refeita após adicionar)
+        self._lock = threading.Lock()
+        for simbolo, nome in entradas:
+            self.adicionar(simbolo, nome)
+
+    def adicionar(self, simbolo, nome=None):
+        simbolo = _normalizar(simbolo)
+        if not simbolo:
+            return
+        with self._lock:
+            if simbolo in self.nomes:
+                if nome and self.nomes[simbolo] == simbolo:
+                    self.nomes[simbolo] = nome
+                return
+            self.nomes[simbolo] = nome or simbolo
+            # Nome inteiro (para termos com espaço) e cada palavra dele
+            nome_normalizado = _normalizar(nome or "")
+            chaves = {simbolo, _base(simbolo), nome_normalizado} | set(nome_normalizado.split())
+            chaves.discard("")
+            for chave in chaves:
+                bisect.insort(self._chaves, (chave, simbolo))
+            self._distintas = None
+
+    def _por_prefixo(self, termo):
+        i = bisect.bisect_left(self._chaves, (termo, ""))
+        while i < len(self._chaves) and self._chaves[i][0].startswith(termo):
+            yield self._chaves[i]
+            i += 1
+
+    def buscar(self, termo, limite=LIMITE_SUGESTOES):
+        """Símbolos ordenados: símbolo exato, prefixo do símbolo, prefixo do nome, parecidos."""
+        pontos = self.pontuar(termo, limite)
+        return sorted(pontos, key=lambda s: (pontos[s], len(s), s))[:limite]
+
+    def pontuar(self, termo, limite=LIMITE_SUGESTOES):
+        """{símbolo: nota} (0 = símbolo exato ... 3 = parecido), para juntar resultados de índices diferentes."""
+        termo = _normalizar(termo)
+        if not termo:
+            return {}
+        with self._lock:
+            pontos = {}
+            for chave, simbolo in self._por_prefixo(termo):
+                if chave in (simbolo, _base(simbolo)):
+                    nota = 0 if chave == termo else 1
+                else:
+                    nota = 2
+                pontos[simbolo] = min(nota, pontos.get(simbolo, nota))
+
+            if len(pontos) < limite:
+                if self._distintas is None:
+                    self._distintas = sorted({chave for chave, _ in self._chaves})
+                for parecida in difflib.get_close_matches(termo, self._distintas, n=limite, cutoff=0.75):
+                    for chave, simbolo in self._por_prefixo(parecida):
+                        if chave == parecida:
+                            pontos.setdefault(simbolo, 3)
+        return pontos
+
+    def rotulo(self, simbolo):
+        return f"{simbolo} | {self.nomes.get(simbolo, simbolo)}"
+
+
+_indice = IndiceTickers(TICKERS_B3 + TICKERS_EXTERIOR + TICKERS_CRIPTO)
+
+
+# ==========================================
+# 2. YAHOO EM SEGUNDO PLANO
+# ==========================================
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="busca_yahoo")
+_buscas_yahoo = OrderedDict()  # termo -> (Future, quando), da mais antiga à mais recente
+_lock_yahoo = threading.Lock()
+
+
+def pesquisar_ticker_yahoo(query):
+    """[(símbolo, nome)] da busca do Yahoo. Levanta se o Yahoo falhar (a busca não fica em cache)."""
+    url = "https://query2.finance.yahoo.com/v1/finance/search"
+    headers = {'User-Agent': 'Mozilla/5.0'}
+    params = {'q': query, 'quotesCount': 6}
+    data = sessao_http.get(url, params=params, headers=headers, timeout=5).json()
+    resultado = []
+    for q in data.get('quotes', []):
+        if q.get('quoteType') in ['EQUITY', 'ETF', 'CRYPTOCURRENCY', 'MUTUALFUND']:
+            s = q.get('symbol')
+            resultado.append((s, q.get('shortname', s)))
+    # O que o Yahoo devolve passa a ser achado localmente nas próximas buscas
+    for simbolo, nome in resultado:
+        _indice.adicionar(simbolo, nome)
+    return resultado
+
+
+def _busca_yahoo(termo):
+    """Future da busca do termo: reaproveita uma em andamento ou feita há menos de TTL_BUSCA_YAHOO_SEG."""
+    agora = time.time()
+    with _lock_yahoo:
+        busca = _buscas_yahoo.get(termo)
+        if busca is not None:
+            futuro, quando = busca
+            falhou = futuro.done() and futuro.exception() is not None
+            if not falhou and agora - quando < TTL_BUSCA_YAHOO_SEG:
+                return futuro
+        futuro = _executor.submit(pesquisar_ticker_yahoo, termo)
+        _buscas_yahoo[termo] = (futuro, agora)
+        _buscas_yahoo.move_to_end(termo)
+        # Uma entrada por tecla digitada: vencidas e excedentes saem pela ponta antiga
+        while _buscas_yahoo:
+            _, (mais_antigo, quando) = next(iter(_buscas_yahoo.items()))
+            vencida = agora - quando >= TTL_BUSCA_YAHOO_SEG and mais_antigo.done()
+            if not vencida and len(_buscas_yahoo) <= MAX_BUSCAS_YAHOO:
+                break
+            _buscas_yahoo.popitem(last=False)
+        return futuro
+
+
+# ==========================================
+# 3. API PARA AS TELAS
+# ==========================================
+def buscar_sugestoes(termo, simbolos_usuario=(), limite=LIMITE_SUGESTOES):
+    """
+    Sugestões 'SÍMBOLO | Nome' para o autocomplete, direto do índice em memória.
+    `simbolos_usuario` (os ativos já lançados por quem busca) entram só nesta
+    busca, num índice à parte: o índice do processo é compartilhado por todas
+    as sessões e só guarda símbolos públicos.
+    Com poucos resultados locais a busca no Yahoo corre em segundo plano e o que
+    ela achar aparece no próximo rerun; só sem nenhum resultado local a tela
+    espera por ela (até ESPERA_YAHOO_SEG).
+    """
+    if not termo or len(termo.strip()) < 2:
+        return []
+    termo = _normalizar(termo)
+    do_usuario = IndiceTickers((simbolo, None) for simbolo in simbolos_usuario)
+    pontos = _indice.pontuar(termo, limite)
+    for simbolo, nota in do_usuario.pontuar(termo, limite).items():
+        pontos[simbolo] = min(nota, pontos.get(simbolo, nota))
+    simbolos = sorted(pontos, key=lambda s: (pontos[s], len(s), s))[:limite]
+
+    if len(simbolos) < MINIMO_LOCAL:
+        futuro = _busca_yahoo(termo)
+        try:
+            # Já pronta (de um rerun anterior) não espera nada
+            espera = ESPERA_YAHOO_SEG if not simbolos else 0
+            achados = [_normalizar(s) for s, _ in futuro.result(timeout=espera)]
+            simbolos = list(dict.fromkeys(simbolos + achados))[:limite]
+        except FuturoTimeout:
+            pass
+        except Exception as e:
+            print(f"Erro busca Yahoo: {e}")
+
+    return [_indice.rotulo(s) if s in _indice.nomes else do_usuario.rotulo(s) for s in simbolos]
@@ -0,0 +1,157 @@
+import os
+import sys
+import time
+import logging
+import threading
+from http.cookiejar import DefaultCookiePolicy
+from contextlib import contextmanager
+from urllib.parse import urlparse
+import requests
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from src.utils.configuracao import ler_config, ler_config_bool
+
+logger = logging.getLogger(__name__)
+
+# Chave do st.session_state com as medições do rerun atual
+CHAVE_MEDICOES = "_medicoes_rerun"
+
+# Acima de N chamadas externas num rerun, registra um aviso no log (0 desliga)
+ORCAMENTO_CHAMADAS_RERUN = int(ler_config("ORCAMENTO_CHAMADAS_RERUN", 40))
+# Mostra o painel de chamadas na sidebar
+PAINEL_DEBUG = ler_config_bool("DEBUG_INSTRUMENTACAO", False)
+
+# Host -> serviço, para agrupar as chamadas
+SERVICOS_POR_HOST = (
+    ("supabase", "supabase"),
+    ("bcb.gov.br", "bcb"),
+    ("pluggy.ai", "pluggy"),
+    ("yahoo", "yahoo"),
+)
+
+# Pasta src/ do app: a pilha é percorrida até o primeiro arquivo daqui
+_RAIZ_SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep
+_ARQUIVOS_IGNORADOS = ("instrumentacao.py", "supabase_client.py")
+
+# Chave em request.extensions com o início da requisição httpx. Fica no próprio
+# request: se a requisição falhar (timeout, conexão) não sobra nada para limpar.
+CHAVE_INICIO_HTTPX = "clario_inicio"
+_lock = threading.Lock()
+
+
+# ==========================================
+# 1. CICLO DO RERUN
+# ==========================================
+def iniciar_medicao_rerun():
+    st.session_state[CHAVE_MEDICOES] = {'pagina': None, 'locais': {}, 'total': 0, 'alertado': False}
+
+
+def definir_pagina(pagina):
+    medicao = _medicao_atual()
+    if medicao is not None:
+        medicao['pagina'] = pagina
+
+
+def medicoes_do_rerun():
+    return _medicao_atual()
+
+
+def _medicao_atual():
+    # Threads sem contexto do Streamlit (realtime, jobs) não pertencem a nenhum rerun
+    if get_script_run_ctx(suppress_warning=True) is None:
+        return None
+    return st.session_state.get(CHAVE_MEDICOES)
+
+
+def propagar_contexto():
+    """
+    initializer= para ThreadPoolExecutor: as threads do pool passam a contar
+    as chamadas no rerun de quem as criou.
+    """
+    ctx = get_script_run_ctx(suppress_warning=True)
+
+    def inicializar():
+        if ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+    return inicializar
+
+
+# ==========================================
+# 2. REGISTRO
+# ==========================================
+def _servico_da_url(url):
+    host = urlparse(str(url)).netloc
+    for trecho, servico in SERVICOS_POR_HOST:
+        if trecho in host:
+            return servico
+    return host or "?"
+
+
+def _local_da_chamada():
+    """Primeira função do app (src/...) na pilha: 'modulo.funcao'."""
+    frame = sys._getframe(2)
+    while frame:
+        arquivo = frame.f_code.co_filename
+        if arquivo.startswith(_RAIZ_SRC) and not arquivo.endswith(_ARQUIVOS_IGNORADOS):
+            return f"{os.path.splitext(os.path.basename(arquivo))[0]}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return "?"
+
+
+def registrar_chamada(servico, local, n_bytes, segundos):
+    medicao = _medicao_atual()
+    if medicao is None:
+        return
+    with _lock:
+        item = medicao['locais'].setdefault((servico, local), {'chamadas': 0, 'bytes': 0, 'segundos': 0.0})
+        item['chamadas'] += 1
+        item['bytes'] += int(n_bytes or 0)
+        item['segundos'] += segundos
+        medicao['total'] += 1
+        estourou = 0 < ORCAMENTO_CHAMADAS_RERUN < medicao['total'] and not medicao['alertado']
+        if estourou:
+            medicao['alertado'] = True
+    if estourou:
+        logger.warning("Página %s passou de %d chamadas externas num rerun (última: %s em %s)",
+                       medicao['pagina'], ORCAMENTO_CHAMADAS_RERUN, servico, local)
+
+
+@contextmanager
+def medir(servico, local=None):
+    """Para clientes que não passam por httpx/requests (ex.: yfinance)."""
+    local = local or _local_da_chamada()
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registrar_chamada(servico, local, 0, time.perf_counter() - inicio)
+
+
+# ==========================================
+# 3. GANCHOS DOS CLIENTES HTTP
+# ==========================================
+def _httpx_ao_enviar(request):
+    request.extensions[CHAVE_INICIO_HTTPX] = time.perf_counter()
+
+
+def _httpx_ao_receber(response):
+    inicio = response.request.extensions.get(CHAVE_INICIO_HTTPX)
+    response.read()
+    segundos = time.perf_counter() - inicio if inicio else 0.0
+    registrar_chamada(_servico_da_url(response.request.url), _local_da_chamada(), len(response.content), segundos)
+
+
+# event_hooks= do httpx.Client do Supabase
+GANCHOS_HTTPX = {"request": [_httpx_ao_enviar], "response": [_httpx_ao_receber]}
+
+
+def _requests_ao_receber(resposta, *args, **kwargs):
+    registrar_chamada(_servico_da_url(resposta.url), _local_da_chamada(), len(resposta.content),
+                      resposta.elapsed.total_seconds())
+
+
+# Sessão compartilhada para BCB, Yahoo e Pluggy (reaproveita conexões e é medida).
+# Atende todos os usuários do processo: não guarda cookies de uma resposta para a próxima.
+sessao_http = requests.Session()
+sessao_http.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+sessao_http.hooks["response"].append(_requests_ao_receber)
@@ -1,11 +1,13 @@
-import streamlit as st
-import yfinance as yf
 import pandas as pd
-from datetime import date, datetime
-import requests
-import numpy as np
 from src.services.supabase_client import supabase
-from src.services.market_data_service import buscar_historico_cdi_diario, buscar_indicadores_economicos
+from src.services.contexto_dados import buscar_tabela_usuario, memorizar_no_rerun, invalidar_tabelas, versao_tabelas
+from src.services.projecoes import colunas
+from src.services.cotacoes_service import obter_cotacoes
+from src.services.cambio_service import moeda_do_simbolo, simbolos_cambio, converter_para_brl
+from src.services.market_data_service import buscar_indicadores_economicos
+from src.services.renda_fixa import obter_curva_cdi, obter_indice_ipca, valorar_renda_fixa
+from src.services.patrimonio_historico import evolucao_patrimonio
+from src.services.indice_tickers import buscar_sugestoes
 
 # ==========================================
 # 0. MAPAS E AJUSTES MANUAIS
@@ -55,16 +57,6 @@ def resolver_ticker_yahoo(ticker, categoria_id=None):
     return f"{t}-USD"
 
 
-def buscar_cotacao_dolar():
-    try:
-        usd = yf.Ticker("USDBRL=X").history(period="1d")
-        if not usd.empty:
-            return float(usd['Close'].iloc[-1])
-    except:
-        pass
-    return 5.80  # Fallback seguro
-
-
 # ==========================================
 # 2. FUNÇÕES DE ESCRITA (SALVAR)
 # ==========================================
@@ -92,6 +84,7 @@ def salvar_investimento(user_id, data_op, ativo, cat_id, preco_un, qtd, taxa=Non
         }
 
         supabase.table("investimento").insert(dados).execute()
+        invalidar_tabelas("investimento", user_id=user_id)
         return True, "Sucesso"
     except Exception as e:
         return False, str(e)
@@ -100,77 +93,34 @@ def salvar_investimento(user_id, data_op, ativo, cat_id, preco_un, qtd, taxa=Non
 # ==========================================
 # 3. MOTOR DE CÁLCULO RENDA FIXA
 # ==========================================
-def calcular_valor_presente_inteligente(row, df_cdi_historico, indicadores_atuais):
-    try:
-        if row['id_categoria'] != 3: return 0.0
-
-        # Converte para data segura
-        data_str = str(row['data'])
-        if 'T' in data_str:
-            data_aporte = datetime.strptime(data_str.split('T')[0], '%Y-%m-%d').date()
-        else:
-            data_aporte = datetime.strptime(data_str, '%Y-%m-%d').date()
-
-        hoje = date.today()
-        if data_aporte >= hoje: return float(row['valor_investido'])
-
-        val_investido = float(row['valor_investido'])
-        taxa_pct = float(row['taxa']) if pd.notnull(row['taxa']) else 100.0
-        indexador = row['indexador'] if pd.notnull(row['indexador']) else 'CDI'
-
-        if indexador in ['CDI', 'SELIC']:
-            if df_cdi_historico.empty:
-                dias_uteis = int((hoje - data_aporte).days * 0.69)
-                taxa_aa = indicadores_atuais.get('CDI', 0.1115) * (taxa_pct / 100.0)
-                return val_investido * ((1 + taxa_aa) ** (dias_uteis / 252.0))
-
-            mask = (df_cdi_historico['data'] >= data_aporte) & (df_cdi_historico['data'] < hoje)
-            df_periodo = df_cdi_historico.loc[mask].copy()
-            if df_periodo.empty: return val_investido
-
-            fator_usuario = taxa_pct / 100.0
-            df_periodo['fator_ajustado'] = 1 + (df_periodo['valor'] * fator_usuario)
-            return val_investido * df_periodo['fator_ajustado'].prod()
-
-        elif indexador == 'PREFIXADO':
-            dias_corridos = (hoje - data_aporte).days
-            dias_uteis_est = int(dias_corridos * 0.6849)
-            taxa_aa = taxa_pct / 100.0
-            return val_investido * ((1 + taxa_aa) ** (dias_uteis_est / 252.0))
-
-        elif indexador == 'IPCA':
-            dias_corridos = (hoje - data_aporte).days
-            ipca_aa = indicadores_atuais.get('IPCA', 0.045)
-            taxa_fixa_aa = taxa_pct / 100.0
-            taxa_combinada = ((1 + ipca_aa) * (1 + taxa_fixa_aa)) - 1
-            return val_investido * ((1 + taxa_combinada) ** (dias_corridos / 365.0))
-
-        return val_investido
-    except:
-        return float(row['valor_investido'])
+# Vetorizado em src/services/renda_fixa.py (valorar_renda_fixa)
 
 
 # ==========================================
 # 4. BUSCA DE PORTFOLIO (MOTOR PRINCIPAL)
 # ==========================================
 def buscar_portfolio_real(user_id):
+    """
+    Dashboard e tela de Investimentos chamam esta função no mesmo rerun.
+    O resultado (inclusive as cotações do Yahoo) é calculado uma vez só.
+    """
+    portfolio = memorizar_no_rerun(("portfolio", str(user_id)), lambda: _calcular_portfolio_real(user_id))
+    return portfolio.copy()
+
+
+def _calcular_portfolio_real(user_id):
     try:
         # 1. Busca Dados no Banco
-        res = supabase.table("investimento").select("*").eq("id_usuario", user_id).execute()
-        if not res.data: return pd.DataFrame()
-        df = pd.DataFrame(res.data)
+        df = buscar_tabela_usuario("investimento", user_id, colunas("portfolio"))
+        if df.empty: return pd.DataFrame()
 
-        # Garante tipos numéricos
-        df['quantidade'] = pd.to_numeric(df['quantidade'], errors='coerce').fillna(0)
-        df['valor_investido'] = pd.to_numeric(df['valor_investido'], errors='coerce').fillna(0)
+        # Tipos já vêm do decodificador Arrow; só falta zerar quantidades nulas
+        df['quantidade'] = df['quantidade'].fillna(0)
 
         # 2. Processa Renda Fixa (Cat 3)
-        df_cdi_hist = buscar_historico_cdi_diario()
-        indicadores_atuais = buscar_indicadores_economicos()
-
-        df['valor_projetado_fixa'] = df.apply(
-            lambda r: calcular_valor_presente_inteligente(r, df_cdi_hist, indicadores_atuais), axis=1
-        )
+        # Toda a carteira de uma vez, com os fatores acumulados do CDI
+        df['valor_projetado_fixa'] = valorar_renda_fixa(
+            df, obter_curva_cdi(), buscar_indicadores_economicos(), obter_indice_ipca())
 
         # 3. Agrupamento Inicial
         portfolio = df.groupby(['descricao', 'id_categoria']).agg({
@@ -185,7 +135,6 @@ def buscar_portfolio_real(user_id):
         df_var = portfolio[portfolio['id_categoria'].isin([1, 2])].copy()
 
         cotacoes_finais = {}
-        usd_rate = buscar_cotacao_dolar()
 
         tickers_para_buscar = []
         mapa_ticker_yahoo_para_nome_banco = {}
@@ -201,32 +150,18 @@ def buscar_portfolio_real(user_id):
             tickers_para_buscar.append(ticker_y)
             mapa_ticker_yahoo_para_nome_banco[ticker_y] = nome_banco
 
-        tickers_unicos = list(set(tickers_para_buscar))
-        if tickers_unicos:
-            try:
-                dados = yf.download(tickers_unicos, period="1d", progress=False)['Close']
-
-                for t in tickers_unicos:
-                    preco = 0.0
-                    try:
-                        if len(tickers_unicos) == 1:
-                            preco = float(dados.iloc[-1])
-                        else:
-                            preco = float(dados[t].iloc[-1])
-                    except:
-                        pass
-
-                    if preco > 0:
-                        if "-USD" in t:
-                            preco_brl = preco * usd_rate
-                        else:
-                            preco_brl = preco
-
-                        nome_original = mapa_ticker_yahoo_para_nome_banco.get(t)
-                        if nome_original:
-                            cotacoes_finais[nome_original] = preco_brl
-            except Exception as e:
-                print(f"Erro Yahoo Batch: {e}")
+        # Cache de cotações do processo: só os símbolos vencidos vão ao Yahoo, num lote único
+        # que já leva os pares de câmbio; a conversão para BRL é vetorizada
+        if tickers_para_buscar:
+            moedas = {t: moeda_do_simbolo(t) for t in tickers_para_buscar}
+            precos = obter_cotacoes(list(moedas) + simbolos_cambio(moedas.values()))
+            cotados = [t for t in moedas if t in precos]
+            precos_brl = converter_para_brl([precos[t] for t in cotados], [moedas[t] for t in cotados])
+
+            for t, preco_brl in zip(cotados, precos_brl):
+                nome_original = mapa_ticker_yahoo_para_nome_banco.get(t)
+                if nome_original and preco_brl > 0:
+                    cotacoes_finais[nome_original] = float(preco_brl)
 
         # 5. Consolidação Final
         def calcular_total_atual(row):
@@ -304,41 +239,38 @@ def buscar_dados_resumidos_dashboard(user_id):
 # ==========================================
 # 6. AUXILIARES E SUGESTÕES
 # ==========================================
-def pesquisar_ticker_yahoo(query):
-    if not query or len(query) < 2: return []
-    try:
-        url = "https://query2.finance.yahoo.com/v1/finance/search"
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        params = {'q': query, 'quotesCount': 6}
-        r = requests.get(url, params=params, headers=headers, timeout=2)
-        data = r.json()
-        sugestoes = []
-        if 'quotes' in data:
-            for q in data['quotes']:
-                if q.get('quoteType') in ['EQUITY', 'ETF', 'CRYPTOCURRENCY', 'MUTUALFUND']:
-                    s = q.get('symbol')
-                    n = q.get('shortname', s)
-                    sugestoes.append(f"{s} | {n}")
-        return sugestoes
-    except:
-        return []
-
-
-def buscar_sugestoes_yahoo(termo):
-    return pesquisar_ticker_yahoo(termo)
-
-
-@st.cache_data(ttl=3600)
-def buscar_evolucao_patrimonio(user_id):
+def buscar_sugestoes_ativos(termo, user_id=None):
+    """
+    Autocomplete do aporte: índice local (B3, exterior, cripto e os ativos já
+    lançados pelo usuário); o Yahoo só entra em segundo plano.
+    """
+    simbolos_usuario = []
+    if user_id is not None:
+        try:
+            df = buscar_tabela_usuario("investimento", user_id, colunas("portfolio"))
+            variavel = df[df['id_categoria'].isin([1, 2])].drop_duplicates(['descricao', 'id_categoria'])
+            simbolos_usuario = [resolver_ticker_yahoo(row['descricao'], row['id_categoria'])
+                                for _, row in variavel.iterrows()]
+        except Exception as e:
+            print(f"Erro ativos do usuário: {e}")
+    return buscar_sugestoes(termo, simbolos_usuario)
+
+
+def buscar_evolucao_patrimonio(user_id, versao=None):
+    """
+    Patrimônio a mercado dia a dia (não o custo acumulado): quantidades x
+    fechamentos históricos na renda variável, fatores do CDI/IPCA na renda fixa.
+    """
     try:
-        res = supabase.table("investimento").select("data, valor_investido").eq("id_usuario", user_id).order(
-            "data").execute()
-        if not res.data: return pd.DataFrame()
-        df = pd.DataFrame(res.data)
-        df['data'] = pd.to_datetime(df['data'])
-        df_evo = df.groupby('data')['valor_investido'].sum().reset_index()
-        df_evo['Patrimônio'] = df_evo['valor_investido'].cumsum()
-        df_evo.rename(columns={'data': 'Data'}, inplace=True)
-        return df_evo[['Data', 'Patrimônio']]
-    except:
-        return pd.DataFrame()
\ No newline at end of file
+        df = buscar_tabela_usuario("investimento", user_id, colunas("portfolio"))
+        if df.empty: return pd.DataFrame()
+        if versao is None:
+            versao = versao_tabelas(str(user_id), ("investimento",))
+
+        variavel = df[df['id_categoria'].isin([1, 2])].drop_duplicates(['descricao', 'id_categoria'])
+        simbolos = {row['descricao']: resolver_ticker_yahoo(row['descricao'], row['id_categoria'])
+                    for _, row in variavel.iterrows()}
+        return evolucao_patrimonio(user_id, df, versao, simbolos, PRECOS_MANUAIS)
+    except Exception as e:
+        print(f"Erro Evolução Patrimônio: {e}")
+        return pd.DataFrame()
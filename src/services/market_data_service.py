@@ -1,62 +1,52 @@
-import requests
-import streamlit as st
 import pandas as pd
 from datetime import date, timedelta
+from src.services.series_bcb import serie_bcb, ultimo_valor, SERIE_CDI, SERIE_SELIC_META, SERIE_IPCA_MENSAL, SERIE_IPCA_12M
 
 
-@st.cache_data(ttl=86400)  # Cache de 24h (Dados históricos não mudam toda hora)
 def buscar_historico_cdi_diario():
     """
-    Busca o histórico diário do CDI (Série 12 do BCB) dos últimos 5 anos.
+    Histórico diário do CDI (Série 12 do BCB) dos últimos 5 anos.
     Retorna um DataFrame com Data e Fator Diário.
+    Vem do armazenamento local das séries (series_bcb): só os dias novos são baixados.
     """
-    try:
-        # Data de 5 anos atrás até hoje
-        data_ini = (date.today() - timedelta(days=365 * 5)).strftime("%d/%m/%Y")
-        data_fim = date.today().strftime("%d/%m/%Y")
+    df = serie_bcb(SERIE_CDI)
+    if df.empty:
+        return pd.DataFrame()
 
-        # Série 12: Taxa de juros - CDI acumulada no mês % a.d.
-        url = f"https://api.bcb.gov.br/dados/serie/bcdata.sgs.12/dados?formato=json&dataInicial={data_ini}&dataFinal={data_fim}"
+    df = df[df['data'] >= date.today() - timedelta(days=365 * 5)].reset_index(drop=True)
+    # O valor vem em % a.d. ("0,0425"): dividir por 100
+    df['valor'] = df['valor'] / 100
+    return df
 
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        r = requests.get(url, headers=headers, timeout=10)
 
-        if r.status_code == 200:
-            df = pd.DataFrame(r.json())
-            df['data'] = pd.to_datetime(df['data'], format='%d/%m/%Y').dt.date
-            # O valor vem em string "0,0425". Converter para float e dividir por 100
-            df['valor'] = df['valor'].str.replace(',', '.').astype(float) / 100
-            return df
-
-    except Exception as e:
-        print(f"Erro ao buscar histórico CDI: {e}")
-
-    return pd.DataFrame()  # Retorna vazio se falhar
+def buscar_historico_ipca_mensal():
+    """
+    Variação mensal do IPCA (Série 433 do BCB), do armazenamento local.
+    `data` é o primeiro dia do mês de referência; `valor` em fração (0.0044 = 0,44%).
+    """
+    df = serie_bcb(SERIE_IPCA_MENSAL)
+    if df.empty:
+        return pd.DataFrame()
+    df['valor'] = df['valor'] / 100
+    return df
 
 
-@st.cache_data(ttl=3600)
 def buscar_indicadores_economicos():
     """
     Mantém a busca de indicadores atuais para referência visual.
+    Último valor de cada série guardada localmente (sem ida ao BCB fora da atualização diária).
     """
     indicadores = {"SELIC": 0.1125, "CDI": 0.1115, "IPCA": 0.0450}
-    try:
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        # Selic Meta (432)
-        r_selic = requests.get("https://api.bcb.gov.br/dados/serie/bcdata.sgs.432/dados/ultimos/1?formato=json",
-                               headers=headers, timeout=5)
-        if r_selic.status_code == 200:
-            val = float(r_selic.json()[0]['valor'].replace(',', '.')) / 100
-            indicadores["SELIC"] = val
-            indicadores["CDI"] = val - 0.0010
-
-        # IPCA (13522)
-        r_ipca = requests.get("https://api.bcb.gov.br/dados/serie/bcdata.sgs.13522/dados/ultimos/1?formato=json",
-                              headers=headers, timeout=5)
-        if r_ipca.status_code == 200:
-            val = float(r_ipca.json()[0]['valor'].replace(',', '.')) / 100
-            indicadores["IPCA"] = val
-    except:
-        pass
-
-    return indicadores
\ No newline at end of file
+
+    # Selic Meta (432)
+    selic = ultimo_valor(SERIE_SELIC_META)
+    if selic is not None:
+        indicadores["SELIC"] = selic / 100
+        indicadores["CDI"] = selic / 100 - 0.0010
+
+    # IPCA 12 meses (13522)
+    ipca = ultimo_valor(SERIE_IPCA_12M)
+    if ipca is not None:
+        indicadores["IPCA"] = ipca / 100
+
+    return indicadores
@@ -0,0 +1,154 @@
+import threading
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+from src.services.cotacoes_service import obter_historico
+from src.services.cambio_service import MOEDA_BASE, TAXAS_PADRAO, moeda_do_simbolo, simbolo_par
+from src.services.market_data_service import buscar_indicadores_economicos
+from src.services.renda_fixa import obter_curva_cdi, obter_indice_ipca, valorar_renda_fixa_em_datas
+
+# Folga para achar o último pregão antes do primeiro dia pedido (fins de semana, feriados)
+FOLGA_PREGAO_DIAS = 10
+
+# Série já calculada por usuário, no processo: user_id -> {'versao', 'serie'}
+# Só dias fechados (antes de hoje) e completos (cotação real e série do BCB
+# publicada) ficam guardados; hoje e dias estimados são sempre recalculados.
+_series = {}
+_lock = threading.Lock()
+
+
+# ==========================================
+# 1. PREÇOS HISTÓRICOS EM REAIS
+# ==========================================
+def _precos_brl(simbolos, datas):
+    """
+    Matriz (símbolo x dia) de fechamentos convertidos para reais pelo câmbio
+    do mesmo dia. Dia sem pregão repete o último fechamento; NaN antes do primeiro.
+    """
+    moedas = {s: moeda_do_simbolo(s) for s in simbolos}
+    pares = sorted({simbolo_par(m) for m in moedas.values() if m != MOEDA_BASE})
+    historico = obter_historico(list(simbolos) + pares, datas[0] - np.timedelta64(FOLGA_PREGAO_DIAS, "D"))
+
+    precos = np.full((len(simbolos), len(datas)), np.nan)
+    if historico.empty:
+        return precos
+    dias = pd.DatetimeIndex(datas)
+    historico = historico.reindex(historico.index.union(dias)).ffill().reindex(dias)
+
+    for k, s in enumerate(simbolos):
+        if s not in historico:
+            continue
+        preco = historico[s].to_numpy(dtype=float)
+        if moedas[s] != MOEDA_BASE:
+            par = simbolo_par(moedas[s])
+            taxa = historico[par].to_numpy(dtype=float) if par in historico else TAXAS_PADRAO.get(moedas[s], np.nan)
+            preco = preco * taxa
+        precos[k] = preco
+    return precos
+
+
+# ==========================================
+# 2. PATRIMÔNIO DIA A DIA
+# ==========================================
+def valorar_carteira_em_datas(df, datas, simbolos, precos_manuais):
+    """
+    Patrimônio em reais em cada data de `datas`, numa passada só:
+      renda variável: quantidade acumulada (ativo x dia) vezes o fechamento do dia;
+      renda fixa: valorar_renda_fixa_em_datas (curva do CDI, índice do IPCA).
+    `simbolos` mapeia descricao -> símbolo Yahoo. Sem cotação no dia, o ativo
+    vale o custo médio (o mesmo fallback do portfolio).
+    Retorna (total, completo): `completo` marca os dias sem nenhuma estimativa
+    (custo médio no lugar da cotação, taxa atual no lugar da série do BCB).
+    """
+    datas = np.asarray(datas, dtype="datetime64[D]")
+    total = np.zeros(len(datas))
+    completo = np.ones(len(datas), dtype=bool)
+
+    aporte = pd.to_datetime(df['data'], errors='coerce').to_numpy(dtype="datetime64[D]")
+    # NaT compara como falso: linha sem data nunca entra na carteira
+    possui = aporte[:, None] <= datas[None, :]
+
+    variavel = df['id_categoria'].isin([1, 2]).to_numpy()
+    if variavel.any():
+        nomes, ativo = np.unique(df.loc[variavel, 'descricao'].astype(str).to_numpy(), return_inverse=True)
+        qtd = pd.to_numeric(df.loc[variavel, 'quantidade'], errors='coerce').fillna(0).to_numpy(dtype=float)
+        custo = pd.to_numeric(df.loc[variavel, 'valor_investido'], errors='coerce').fillna(0).to_numpy(dtype=float)
+
+        quantidades = np.zeros((len(nomes), len(datas)))
+        custos = np.zeros((len(nomes), len(datas)))
+        np.add.at(quantidades, ativo, possui[variavel] * qtd[:, None])
+        np.add.at(custos, ativo, possui[variavel] * custo[:, None])
+
+        cotados = sorted({simbolos[n] for n in nomes if n not in precos_manuais and simbolos.get(n)})
+        precos_cotados = _precos_brl(cotados, datas) if cotados else None
+        precos = np.full((len(nomes), len(datas)), np.nan)
+        for k, nome in enumerate(nomes):
+            if nome in precos_manuais:
+                precos[k] = precos_manuais[nome]
+            elif simbolos.get(nome) in cotados:
+                precos[k] = precos_cotados[cotados.index(simbolos[nome])]
+
+        com_preco = np.isfinite(precos) & (precos > 0)
+        em_carteira = np.abs(quantidades) > 0.000001
+        completo &= ~(em_carteira & ~com_preco).any(axis=0)
+
+        preco_medio = np.divide(custos, quantidades, out=np.zeros_like(custos), where=em_carteira)
+        precos = np.where(com_preco, precos, preco_medio)
+        total += (quantidades * precos).sum(axis=0)
+
+    fixa = (df['id_categoria'] == 3).to_numpy()
+    if fixa.any():
+        curva, indice_ipca = obter_curva_cdi(), obter_indice_ipca()
+        total += valorar_renda_fixa_em_datas(df[fixa], datas, curva,
+                                             buscar_indicadores_economicos(), indice_ipca).sum(axis=0)
+
+        indexador = df.loc[fixa, 'indexador'].fillna('CDI').astype(str).to_numpy()
+        possui_fixa = possui[fixa]
+        # Dia com posição cujo índice o BCB ainda não publicou foi valorado pela taxa atual
+        cdi = possui_fixa[np.isin(indexador, ['CDI', 'SELIC'])].any(axis=0)
+        if curva is None or not len(curva):
+            completo &= ~cdi
+        else:
+            completo &= ~cdi | (datas <= curva.ultima_data + np.timedelta64(1, "D"))
+        ipca = possui_fixa[indexador == 'IPCA'].any(axis=0)
+        if indice_ipca is None or not len(indice_ipca):
+            completo &= ~ipca
+        else:
+            completo &= ~ipca | (datas <= indice_ipca.fim_publicado)
+    return total, completo
+
+
+def evolucao_patrimonio(user_id, df, versao, simbolos, precos_manuais):
+    """
+    DataFrame (Data, Patrimônio) do primeiro aporte até hoje, a mercado.
+    Os dias fechados e completos ficam guardados por usuário enquanto `versao`
+    não muda; nas cargas seguintes só os dias novos, os estimados (Yahoo ou BCB
+    indisponíveis na hora) e hoje são calculados. Uma gravação
+    em investimento muda a versão e a série é refeita (o aporte pode ser retroativo).
+    """
+    aportes = pd.to_datetime(df['data'], errors='coerce').dropna()
+    if aportes.empty:
+        return pd.DataFrame()
+    hoje = date.today()
+    uid = str(user_id)
+
+    with _lock:
+        guardado = _series.get(uid)
+    serie = guardado['serie'] if guardado and guardado['versao'] == versao else pd.Series(dtype=float)
+
+    desde = serie.index[-1].date() + timedelta(days=1) if not serie.empty else aportes.min().date()
+    datas = np.arange(np.datetime64(desde, "D"), np.datetime64(hoje, "D") + 1)
+    if len(datas) == 0:
+        return pd.DataFrame()
+    valores, completo = valorar_carteira_em_datas(df, datas, simbolos, precos_manuais)
+
+    novos = pd.Series(valores, index=pd.DatetimeIndex(datas))
+    # Guarda só até o primeiro dia estimado (a série guardada não pode ter buracos)
+    fechados = len(datas) - 1
+    estimados = np.flatnonzero(~completo[:fechados])
+    guardar = estimados[0] if len(estimados) else fechados
+    with _lock:
+        _series[uid] = {'versao': versao, 'serie': pd.concat([serie, novos.iloc[:guardar]])}
+
+    completa = pd.concat([serie, novos])
+    return pd.DataFrame({'Data': completa.index, 'Patrimônio': completa.to_numpy()})
@@ -1,6 +1,10 @@
 import streamlit as st
-from supabase import create_client, Client
-from pluggy_sdk import PluggyClient
+from datetime import date
+from src.services.supabase_client import supabase
+from src.services.pluggy_sync import (
+    fingerprint_pluggy, descartar_ja_gravadas_sem_id, get_api_token, buscar_paginas_transacoes,
+    carregar_estado_sync, registrar_transacoes_vistas, salvar_estado_sync
+)
 
 # ... (Configurações de API Key iguais ao anterior) ...
 
@@ -8,6 +12,7 @@ from pluggy_sdk import PluggyClient
 NUBANK_ITEM_ID = st.secrets["pluggy"]["item_id_nubank"]
 CONTA_CORRENTE_ID = "4703b762-fd42-4537-8df5-c7c32d9b41b7"
 CARTAO_CREDITO_ID = "5674612b-ff61-4362-9b2f-414cd23c17b5"
+ESCOPO_SYNC = "nubank_conta_cartao"
 
 
 def sync_nubank_transactions():
@@ -16,55 +21,72 @@ def sync_nubank_transactions():
     """
     st.info(f"Conectando ao Nubank (Item: {NUBANK_ITEM_ID[:8]}...)...")
 
-    # Busca transações de TODAS as contas desse Item
+    # Busca transações das contas desse Item, só o delta desde o último cursor
     try:
-        # Nota: Na prática, você pode precisar iterar pelas contas (accounts)
-        # transactions = pluggy.fetch_transactions(account_id=CONTA_CORRENTE_ID)
-        # Mas muitas vezes buscar pelo Item traz tudo. Vamos assumir busca por conta para precisão:
+        api_key = get_api_token()
+        if not api_key:
+            st.error("Erro: Verifique CLIENT_ID e SECRET no secrets.toml")
+            return
 
-        all_transactions = []
-
-        # 1. Busca Conta Corrente
-        tr_conta = pluggy.fetch_transactions(CONTA_CORRENTE_ID)
-        all_transactions.extend(tr_conta.results)
+        headers = {"X-API-KEY": api_key}
+        # Cursor próprio: este caminho só lê 2 contas do item, então não pode avançar
+        # o cursor do item inteiro usado por sincronizar_conta_usuario
+        inicio_execucao = date.today()
+        desde = carregar_estado_sync([NUBANK_ITEM_ID], escopo=ESCOPO_SYNC)
+        vistos = {}
+        itens_com_falha = set()
 
-        # 2. Busca Cartão de Crédito
-        tr_cartao = pluggy.fetch_transactions(CARTAO_CREDITO_ID)
-        all_transactions.extend(tr_cartao.results)
+        all_transactions = []
+        for item_id, account_id, transactions in buscar_paginas_transacoes(headers, [NUBANK_ITEM_ID], desde,
+                                                                          itens_com_falha):
+            # Apenas Conta Corrente e Cartão de Crédito
+            if account_id in (CONTA_CORRENTE_ID, CARTAO_CREDITO_ID):
+                all_transactions.extend(transactions)
+                registrar_transacoes_vistas(vistos, item_id, transactions)
 
-        transactions_to_insert = []
+        user_id = st.session_state.user.id
+        transactions_to_insert = {}
 
         for tr in all_transactions:
             # Lógica de Sinais e Tipos
-            valor = tr.amount * -1 if tr.type == 'DEBIT' else tr.amount
+            valor = tr.get("amount") * -1 if tr.get("type") == 'DEBIT' else tr.get("amount")
 
             # Define o tipo baseado na conta de origem
             tipo = 'pix'  # Default genérico
-            if tr.account_id == CARTAO_CREDITO_ID:
+            if tr.get("accountId") == CARTAO_CREDITO_ID:
                 tipo = 'credit_card'
-            elif tr.category and 'Invest' in tr.category:
+            elif tr.get("category") and 'Invest' in tr.get("category"):
                 tipo = 'investment'
 
-            transactions_to_insert.append({
-                "description": tr.description,
+            # Mesmo fingerprint de sincronizar_conta_usuario (id Pluggy; sem id, o amount cru)
+            fingerprint = fingerprint_pluggy(user_id, tr)
+            transactions_to_insert[fingerprint] = (tr, {
+                "user_id": user_id,
+                "fingerprint": fingerprint,
+                "description": tr.get("description"),
                 "amount": valor,
-                "date": tr.date[:10],
+                "date": tr.get("date")[:10],
                 "transaction_type": tipo,
                 "status": "completed",
                 "metadata": {
-                    "pluggy_id": tr.id,
-                    "account_id": tr.account_id,  # Para saber se veio da conta ou cartão
-                    "original_category": tr.category
+                    "pluggy_id": tr.get("id"),
+                    "account_id": tr.get("accountId"),  # Para saber se veio da conta ou cartão
+                    "original_category": tr.get("category")
                 }
             })
 
         # Insere no Supabase
-        if transactions_to_insert:
+        linhas = descartar_ja_gravadas_sem_id(user_id, list(transactions_to_insert.values())) \
+            if transactions_to_insert else []
+        if linhas:
             data = supabase.table("transactions").upsert(
-                transactions_to_insert,
-                on_conflict="metadata->>pluggy_id"
+                linhas,
+                on_conflict="user_id,fingerprint"
             ).execute()
-            st.success(f"{len(transactions_to_insert)} transações do Nubank sincronizadas!")
+            st.success(f"{len(linhas)} transações do Nubank sincronizadas!")
+
+        salvar_estado_sync(user_id, [NUBANK_ITEM_ID], itens_com_falha, inicio_execucao, vistos,
+                           escopo=ESCOPO_SYNC)
 
     except Exception as e:
         st.error(f"Erro na sincronização: {e}")
\ No newline at end of file
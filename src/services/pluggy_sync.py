@@ -1,11 +1,27 @@
-import requests
+import hashlib
+import threading
+import jwt
 import streamlit as st
-from src.database import db
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
+from src.services.supabase_client import supabase
+from src.utils.configuracao import ler_config
+from src.services.instrumentacao import sessao_http, propagar_contexto
 import time
+from datetime import date, datetime, timedelta
 
 # --- CONFIGURAÇÃO ---
 BASE_URL = "https://api.pluggy.ai"
 
+# Máximo de requisições à Pluggy em voo ao mesmo tempo (por sincronização)
+MAX_REQUISICOES_SIMULTANEAS = int(ler_config("PLUGGY_MAX_REQUISICOES", 4))
+TAMANHO_PAGINA_PLUGGY = 500
+# Hashes por consulta .in_() (vão na URL do GET: 100 x 64 caracteres ~ 6,5 KB)
+TAMANHO_LOTE_FINGERPRINTS = 100
+
+# Folga ao retomar do cursor: transações que "caem" com atraso na Pluggy.
+# O upsert por fingerprint torna a sobreposição inofensiva.
+DIAS_SOBREPOSICAO_SYNC = 3
+
 # Tenta pegar as credenciais
 try:
     CLIENT_ID = "093721db-5e48-4df7-a14a-37d93533f003"
@@ -15,53 +31,318 @@ except:
     CLIENT_SECRET = ""
 
 
+def gerar_fingerprint(user_id, data, descricao, valor, pluggy_id=None):
+    """
+    Impressão digital estável de uma transação (coluna `fingerprint` de transactions).
+    Com o id da Pluggy, é ele que identifica a transação: duas compras iguais no
+    mesmo dia continuam sendo duas. Sem id, vale o conteúdo (data, descrição, valor).
+    Mesma regra do backfill em sql/002_fingerprint_transactions.sql.
+    """
+    if pluggy_id:
+        texto = f"{user_id or ''}|pluggy|{pluggy_id}"
+    else:
+        descricao_norm = " ".join(str(descricao or "").split()).lower()
+        texto = f"{user_id or ''}|{str(data)[:10]}|{descricao_norm}|{float(valor or 0):.2f}"
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+def fingerprint_pluggy(user_id, tr, com_id=True):
+    """
+    Fingerprint de uma transação crua da Pluggy. Os dois caminhos de sincronização
+    usam esta função: o valor do hash de conteúdo é sempre o `amount` como a Pluggy
+    mandou, sem a troca de sinal que cada caminho aplica ao gravar.
+    """
+    return gerar_fingerprint(user_id, (tr.get("date") or "")[:10], tr.get("description"), tr.get("amount"),
+                             tr.get("id") if com_id else None)
+
+
+def descartar_ja_gravadas_sem_id(user_id, linhas_por_transacao):
+    """
+    Linhas gravadas antes do fingerprint por id não têm pluggy_id: casam pela regra
+    de conteúdo. Uma consulta a cada TAMANHO_LOTE_FINGERPRINTS hashes; cada linha
+    antiga cobre uma transação só.
+    linhas_por_transacao: [(transação Pluggy, linha a gravar)]. Devolve as linhas que faltam.
+    """
+    por_conteudo = {}
+    for tr, linha in linhas_por_transacao:
+        por_conteudo.setdefault(fingerprint_pluggy(user_id, tr, com_id=False), []).append(linha)
+    fingerprints = list(por_conteudo)
+    for i in range(0, len(fingerprints), TAMANHO_LOTE_FINGERPRINTS):
+        resp = supabase.table("transactions").select("fingerprint").eq("user_id", user_id) \
+            .in_("fingerprint", fingerprints[i:i + TAMANHO_LOTE_FINGERPRINTS]).execute()
+        for linha_antiga in (resp.data or []):
+            linhas = por_conteudo.get(linha_antiga["fingerprint"])
+            if linhas:
+                linhas.pop(0)
+    return [linha for linhas in por_conteudo.values() for linha in linhas]
+
+
+# --- BROKER DE TOKENS (compartilhado pelo processo inteiro) ---
+# A API Key da Pluggy vale ~2h. Ela é guardada em memória e renovada um pouco
+# antes de expirar, sob um lock: se várias sessões sincronizam ao mesmo tempo,
+# apenas UMA faz o POST /auth e as demais reaproveitam o resultado.
+VALIDADE_PADRAO_API_KEY_SEG = 2 * 60 * 60
+VALIDADE_CONNECT_TOKEN_SEG = 30 * 60
+MARGEM_RENOVACAO_SEG = 5 * 60
+
+_lock_tokens = threading.Lock()
+_api_key_cache = {"token": None, "expira_em": 0.0}
+_connect_tokens_cache = {}  # user_id -> {"token", "expira_em"}
+
+
+def _expiracao_do_token(token, validade_padrao):
+    """Lê o 'exp' do JWT (sem validar assinatura); na falta dele usa a validade padrão."""
+    try:
+        exp = jwt.decode(token, options={"verify_signature": False}).get("exp")
+        if exp: return float(exp)
+    except Exception:
+        pass
+    return time.time() + validade_padrao
+
+
+def _autenticar_pluggy():
+    payload = {"clientId": CLIENT_ID, "clientSecret": CLIENT_SECRET}
+    response = sessao_http.post(f"{BASE_URL}/auth", json=payload, timeout=15)
+
+    if response.status_code == 200:
+        return response.json().get("apiKey")
+    print(f"Erro Auth Pluggy: {response.text}")
+    return None
+
+
 def get_api_token():
     """
-    Autentica na Pluggy e pega a 'API Key' temporária.
+    Retorna a 'API Key' temporária da Pluggy, do cache quando ainda válida.
     """
     if not CLIENT_ID or not CLIENT_SECRET:
         return None
 
-    try:
-        payload = {"clientId": CLIENT_ID, "clientSecret": CLIENT_SECRET}
-        response = requests.post(f"{BASE_URL}/auth", json=payload)
+    if _api_key_cache["token"] and time.time() < _api_key_cache["expira_em"]:
+        return _api_key_cache["token"]
 
-        if response.status_code == 200:
-            return response.json().get("apiKey")
-        else:
-            print(f"Erro Auth Pluggy: {response.text}")
+    with _lock_tokens:
+        # Outra thread pode ter renovado enquanto esperávamos o lock
+        if _api_key_cache["token"] and time.time() < _api_key_cache["expira_em"]:
+            return _api_key_cache["token"]
+
+        try:
+            api_key = _autenticar_pluggy()
+        except Exception as e:
+            print(f"Erro conexão: {e}")
             return None
-    except Exception as e:
-        print(f"Erro conexão: {e}")
-        return None
+
+        if api_key:
+            expira = _expiracao_do_token(api_key, VALIDADE_PADRAO_API_KEY_SEG)
+            _api_key_cache["token"] = api_key
+            _api_key_cache["expira_em"] = expira - MARGEM_RENOVACAO_SEG
+        return api_key
+
+
+def invalidar_api_token():
+    """Descarta a API Key em cache (ex.: a Pluggy respondeu 401 antes do previsto)."""
+    with _lock_tokens:
+        _api_key_cache["token"] = None
+        _api_key_cache["expira_em"] = 0.0
 
 
 def gerar_token_widget(user_id):
     """
     Gera o token para abrir o Widget (Connect Token).
+    O mesmo token é reaproveitado para o usuário enquanto for válido.
     """
-    api_key = get_api_token()
-    if not api_key: return None
+    em_cache = _connect_tokens_cache.get(user_id)
+    if em_cache and time.time() < em_cache["expira_em"]:
+        return em_cache["token"]
 
-    headers = {"X-API-KEY": api_key}
     # clientUserId liga essa conexão ao ID do usuário no Supabase
     payload = {"clientUserId": user_id}
 
     try:
-        resp = requests.post(f"{BASE_URL}/connect_token", json=payload, headers=headers)
-        if resp.status_code == 200:
-            return resp.json().get("accessToken")
+        for tentativa in range(2):
+            api_key = get_api_token()
+            if not api_key: return None
+
+            headers = {"X-API-KEY": api_key}
+            resp = sessao_http.post(f"{BASE_URL}/connect_token", json=payload, headers=headers, timeout=15)
+
+            if resp.status_code == 401 and tentativa == 0:
+                # API Key expirou antes do previsto: renova uma vez e tenta de novo
+                invalidar_api_token()
+                continue
+
+            if resp.status_code == 200:
+                token = resp.json().get("accessToken")
+                if token:
+                    expira = _expiracao_do_token(token, VALIDADE_CONNECT_TOKEN_SEG)
+                    with _lock_tokens:
+                        _connect_tokens_cache[user_id] = {"token": token,
+                                                          "expira_em": expira - MARGEM_RENOVACAO_SEG}
+                return token
+            break
     except Exception as e:
         print(f"Erro widget: {e}")
 
     return None
 
 
+def _get_json(sessao, url, headers, params=None):
+    resp = sessao.get(url, headers=headers, params=params, timeout=30)
+    resp.raise_for_status()
+    return resp.json()
+
+
+def _buscar_pagina_transacoes(sessao, headers, item_id, account_id, pagina, desde=None):
+    params = {"accountId": account_id, "page": pagina, "pageSize": TAMANHO_PAGINA_PLUGGY}
+    if desde: params["from"] = desde
+    dados = _get_json(sessao, f"{BASE_URL}/transactions", headers, params)
+    return item_id, account_id, pagina, dados
+
+
+def buscar_paginas_transacoes(headers, item_ids, desde=None, itens_com_falha=None):
+    """
+    Percorre TODAS as contas de TODOS os itens em paralelo, seguindo a paginação
+    da Pluggy, com no máximo MAX_REQUISICOES_SIMULTANEAS requisições em voo.
+    Gera (item_id, account_id, transações) assim que cada página chega,
+    para que a gravação comece antes do download terminar.
+
+    desde: {item_id: 'YYYY-MM-DD'} para pedir só o delta de cada item.
+    itens_com_falha: set preenchido com os itens que tiveram alguma página perdida.
+    """
+    desde = desde or {}
+    if itens_com_falha is None: itens_com_falha = set()
+    sessao = sessao_http
+    with ThreadPoolExecutor(max_workers=MAX_REQUISICOES_SIMULTANEAS, initializer=propagar_contexto()) as pool:
+        # 1. Contas de cada item
+        futuros_contas = {
+            pool.submit(_get_json, sessao, f"{BASE_URL}/accounts", headers, {"itemId": item_id}): item_id
+            for item_id in item_ids
+        }
+        pendentes = set()
+        origem_futuro = {}
+        for futuro in as_completed(futuros_contas):
+            item_id = futuros_contas[futuro]
+            try:
+                contas = futuro.result().get("results", [])
+            except Exception as e:
+                print(f"Erro ao buscar contas do item {item_id}: {e}")
+                itens_com_falha.add(item_id)
+                continue
+            for conta in contas:
+                futuro_pagina = pool.submit(_buscar_pagina_transacoes, sessao, headers, item_id, conta.get("id"), 1,
+                                            desde.get(item_id))
+                origem_futuro[futuro_pagina] = item_id
+                pendentes.add(futuro_pagina)
+
+        # 2. Páginas de transações (a primeira revela quantas faltam)
+        while pendentes:
+            prontos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+            for futuro in prontos:
+                try:
+                    item_id, account_id, pagina, dados = futuro.result()
+                except Exception as e:
+                    print(f"Erro ao buscar página de transações: {e}")
+                    itens_com_falha.add(origem_futuro.get(futuro))
+                    continue
+
+                if pagina == 1:
+                    for prox in range(2, int(dados.get("totalPages") or 1) + 1):
+                        futuro_pagina = pool.submit(_buscar_pagina_transacoes, sessao, headers, item_id, account_id,
+                                                    prox, desde.get(item_id))
+                        origem_futuro[futuro_pagina] = item_id
+                        pendentes.add(futuro_pagina)
+
+                yield item_id, account_id, dados.get("results", [])
+
+
+# --- CURSOR DE SINCRONIZAÇÃO (tabela pluggy_sync_estado) ---
+def _chave_estado(item_id, escopo=None):
+    """Linha do cursor: o item inteiro, ou um escopo próprio (ex.: só algumas contas do item)."""
+    return f"{item_id}#{escopo}" if escopo else item_id
+
+
+def carregar_estado_sync(item_ids, escopo=None):
+    """Retorna {item_id: 'YYYY-MM-DD'} com a data a partir da qual cada item deve ser buscado."""
+    if not item_ids: return {}
+    chaves = {_chave_estado(item_id, escopo): item_id for item_id in item_ids}
+    resp = supabase.table("pluggy_sync_estado").select("item_id, ultimo_from") \
+        .in_("item_id", list(chaves)).execute()
+
+    desde = {}
+    for estado in (resp.data or []):
+        if estado.get("ultimo_from"):
+            ultimo = date.fromisoformat(str(estado["ultimo_from"])[:10])
+            desde[chaves[estado["item_id"]]] = (ultimo - timedelta(days=DIAS_SOBREPOSICAO_SYNC)).isoformat()
+    return desde
+
+
+def registrar_transacoes_vistas(vistos, item_id, transactions):
+    """
+    Acumula em `vistos` a transação mais recente (data, id) de cada item, só para
+    diagnóstico. Parcelas futuras do cartão não contam: têm data à frente de hoje.
+    """
+    hoje = date.today().isoformat()
+    for tr in transactions:
+        data_tr = (tr.get("date") or "")[:10]
+        if not data_tr or data_tr > hoje: continue
+        if item_id not in vistos or data_tr > vistos[item_id][0]:
+            vistos[item_id] = (data_tr, tr.get("id"))
+
+
+def salvar_estado_sync(user_id, item_ids, itens_com_falha, inicio_execucao, vistos=None, escopo=None):
+    """
+    Grava como `ultimo_from` a data em que esta execução começou, apenas para os
+    itens cujas páginas vieram TODAS sem erro. Um item com falha é buscado de novo
+    a partir do cursor antigo.
+    """
+    agora = datetime.now().isoformat()
+    vistos = vistos or {}
+    linhas = [
+        {"item_id": _chave_estado(item_id, escopo), "user_id": user_id,
+         "ultimo_from": inicio_execucao.isoformat(),
+         "ultimo_id_transacao": vistos.get(item_id, (None, None))[1], "atualizado_em": agora}
+        for item_id in item_ids if item_id not in itens_com_falha
+    ]
+    if linhas:
+        supabase.table("pluggy_sync_estado").upsert(linhas, on_conflict="item_id").execute()
+
+
+def _gravar_pagina(user_id, transactions):
+    """
+    Prepara a página inteira e grava com UM upsert.
+    O índice único (user_id, fingerprint) descarta o que já existe.
+    Retorna quantas linhas novas entraram.
+    """
+    dados = {}
+    for tr in transactions:
+        data_tr = tr.get("date")[:10]  # Formato YYYY-MM-DD
+        fingerprint = fingerprint_pluggy(user_id, tr)
+        dados[fingerprint] = (tr, {
+            "user_id": user_id,
+            "description": tr.get("description"),
+            "amount": tr.get("amount"),
+            "date": data_tr,
+            "category": tr.get("category", "Geral"),
+            "type": "CREDIT" if (tr.get("amount") or 0) > 0 else "DEBIT",
+            "fingerprint": fingerprint,
+            "metadata": {"pluggy_id": tr.get("id"), "account_id": tr.get("accountId")}
+        })
+
+    linhas = descartar_ja_gravadas_sem_id(user_id, list(dados.values())) if dados else []
+    if not linhas:
+        return 0
+
+    resp_upsert = supabase.table("transactions").upsert(
+        linhas, on_conflict="user_id,fingerprint", ignore_duplicates=True
+    ).execute()
+    # Com ignore_duplicates o PostgREST devolve só as linhas realmente inseridas
+    return len(resp_upsert.data or [])
+
+
 def sincronizar_conta_usuario(user_id):
     """
     1. Busca contas (items)
-    2. Baixa transações
-    3. Salva no Supabase
+    2. Baixa todas as páginas de transações de todas as contas, em paralelo
+    3. Salva no Supabase conforme as páginas chegam
     """
     api_key = get_api_token()
     if not api_key: return "Erro: Verifique CLIENT_ID e SECRET no secrets.toml"
@@ -72,7 +353,14 @@ def sincronizar_conta_usuario(user_id):
         # 1. Buscar Itens (Conexões Bancárias)
         # Nota: A Pluggy não filtra items por clientUserId na API direta facilmente,
         # então pegamos todos e filtramos na memória (para MVP ok).
-        resp_items = requests.get(f"{BASE_URL}/items", headers=headers)
+        resp_items = sessao_http.get(f"{BASE_URL}/items", headers=headers)
+        if resp_items.status_code == 401:
+            # API Key em cache expirou antes do previsto: renova uma vez
+            invalidar_api_token()
+            api_key = get_api_token()
+            if not api_key: return "Erro: Verifique CLIENT_ID e SECRET no secrets.toml"
+            headers = {"X-API-KEY": api_key}
+            resp_items = sessao_http.get(f"{BASE_URL}/items", headers=headers)
         if resp_items.status_code != 200:
             return f"Erro ao buscar itens: {resp_items.text}"
 
@@ -86,39 +374,23 @@ def sincronizar_conta_usuario(user_id):
 
         total_salvo = 0
 
-        # 2. Para cada banco conectado...
-        for item in user_items:
-            item_id = item.get("id")
-
-            # Busca transações (últimos 30 dias é o padrão se não passar data)
-            resp_trans = requests.get(f"{BASE_URL}/transactions?itemId={item_id}", headers=headers)
-
-            if resp_trans.status_code == 200:
-                transactions = resp_trans.json().get("results", [])
-
-                for tr in transactions:
-                    # Verifica duplicidade no banco
-                    existe = db.table("transactions").select("id").eq("description", tr.get("description")).eq("date",
-                                                                                                               tr.get(
-                                                                                                                   "date")[
-                                                                                                                   :10]).eq(
-                        "amount", tr.get("amount")).execute()
-
-                    if not existe.data:
-                        # Prepara dados
-                        dados = {
-                            "user_id": user_id,
-                            "description": tr.get("description"),
-                            "amount": tr.get("amount"),
-                            "date": tr.get("date")[:10],  # Formato YYYY-MM-DD
-                            "category": tr.get("category", "Geral"),
-                            "type": "CREDIT" if (tr.get("amount") or 0) > 0 else "DEBIT"
-                        }
-                        # Salva
-                        db.table("transactions").insert(dados).execute()
-                        total_salvo += 1
+        # 2. Páginas de todos os bancos conectados (só o delta desde o último cursor),
+        #    gravadas à medida que chegam
+        item_ids = [item.get("id") for item in user_items]
+        inicio_execucao = date.today()
+        desde = carregar_estado_sync(item_ids)
+        vistos = {}
+        itens_com_falha = set()
+
+        for item_id, account_id, transactions in buscar_paginas_transacoes(headers, item_ids, desde,
+                                                                          itens_com_falha):
+            total_salvo += _gravar_pagina(user_id, transactions)
+            registrar_transacoes_vistas(vistos, item_id, transactions)
+
+        # 3. Avança o cursor dos itens sincronizados com sucesso
+        salvar_estado_sync(user_id, item_ids, itens_com_falha, inicio_execucao, vistos)
 
         return f"Sincronização concluída! {total_salvo} novas transações importadas."
 
     except Exception as e:
-        return f"Erro crítico na sincronização: {e}"
\ No newline at end of file
+        return f"Erro crítico na sincronização: {e}"
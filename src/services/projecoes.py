@@ -0,0 +1,33 @@
+# ==========================================
+# PROJEÇÕES POR CONSUMIDOR
+# ==========================================
+# Colunas que cada tela/serviço realmente usa. As queries pedem só isso ao
+# PostgREST em vez de select("*"). Ao passar a ler uma coluna nova numa
+# tela, acrescente-a aqui também.
+
+PROJECOES = {
+    # Dashboard: gráfico de evolução (score e categorias vêm do agregado mensal)
+    "dashboard_bancarias": ("data", "valor", "tipo", "id_categoria"),
+
+    # Investimentos: portfolio, motor de renda fixa e evolução do patrimônio
+    "portfolio": ("descricao", "id_categoria", "data", "quantidade", "valor_investido", "taxa", "indexador"),
+
+    # Extrato (listar_transacoes_unificadas)
+    "extrato_bancarias": ("id_trans_bank", "data", "descricao", "valor", "tipo", "concluido", "id_categoria",
+                          "id_grupo"),
+    "extrato_cartao": ("id_trans_cartao", "data", "descricao", "valor_total", "parcelas", "id_categoria"),
+    "extrato_investimento": ("id_invest", "data", "descricao", "valor_investido", "id_categoria"),
+
+    # Fatura do cartão (buscar_fatura_detalhada / render_lista_compras)
+    "fatura_itens": ("id_trans_cartao", "data", "descricao", "valor", "parcelas", "parcela_atual", "id_grupo"),
+
+    # Seletores e configurações
+    "catalogo_categorias": ("id_categoria", "descricao", "tipo", "icon", "nome"),
+    "cartoes": ("id", "nome_cartao", "limite", "dia_fechamento", "dia_vencimento"),
+    "contas": ("id", "nome_banco", "saldo_inicial"),
+}
+
+
+def colunas(consumidor):
+    """Texto pronto para o .select() do PostgREST: 'a, b, c'."""
+    return ", ".join(PROJECOES[consumidor])
@@ -0,0 +1,223 @@
+import time
+import asyncio
+import threading
+import jwt
+from src.services.contexto_dados import invalidar_tabelas
+from src.services.catalogo_categorias import invalidar_catalogo
+from src.utils.configuracao import ler_config, ler_config_bool
+
+# Tabelas cujas mudanças (de qualquer dispositivo) invalidam o cache das sessões
+TABELAS_REALTIME = ("transacoes_bancarias", "transacoes_cartao_credito", "investimento", "config_cartoes")
+# Catálogo do processo (sem id_usuario): editado direto no banco, renova o cache de todos
+TABELA_CATALOGO = "categorias"
+
+# Renova o JWT do canal este tanto antes de ele expirar (o RLS para de entregar com token vencido)
+MARGEM_RENOVACAO_TOKEN_SEG = 5 * 60
+# Sem 'exp' legível no token, tenta renovar nesse intervalo
+INTERVALO_RENOVACAO_PADRAO_SEG = 30 * 60
+
+# Um canal por usuário no processo inteiro: várias abas do mesmo usuário compartilham a escuta
+_canais = {}
+_lock_canais = threading.Lock()
+
+
+# ==========================================
+# 1. CANAL FALSO (TESTES OFFLINE)
+# ==========================================
+class CanalFalso:
+    """
+    Imita o canal do realtime sem rede: guarda os callbacks registrados e
+    `emitir()` entrega uma mudança como se tivesse vindo do Postgres.
+    """
+
+    def __init__(self):
+        self.callbacks = []
+        self.inscrito = False
+
+    def on_postgres_changes(self, event, schema="public", table=None, filter=None, callback=None):
+        self.callbacks.append((table, filter, callback))
+        return self
+
+    def subscribe(self, callback=None):
+        self.inscrito = True
+        return self
+
+    def unsubscribe(self):
+        self.inscrito = False
+
+    def emitir(self, tabela, tipo="INSERT", registro=None):
+        payload = {"data": {"table": tabela, "type": tipo, "record": registro or {}}}
+        for tabela_cb, _, callback in self.callbacks:
+            if self.inscrito and tabela_cb == tabela:
+                callback(payload)
+
+
+# ==========================================
+# 2. TRATAMENTO DAS MUDANÇAS
+# ==========================================
+def _tabela_do_payload(payload):
+    dados = payload.get("data", payload) if isinstance(payload, dict) else {}
+    return dados.get("table")
+
+
+def _ao_mudar(user_id):
+    """Callback do canal: invalida só a tabela que mudou, para todas as sessões do usuário."""
+    def callback(payload):
+        tabela = _tabela_do_payload(payload)
+        if tabela in TABELAS_REALTIME:
+            invalidar_tabelas(tabela, user_id=user_id)
+    return callback
+
+
+def _ao_mudar_catalogo(payload):
+    if _tabela_do_payload(payload) == TABELA_CATALOGO:
+        invalidar_catalogo()
+
+
+def _registrar(canal, user_id):
+    callback = _ao_mudar(user_id)
+    for tabela in TABELAS_REALTIME:
+        canal.on_postgres_changes("*", schema="public", table=tabela,
+                                  filter=f"id_usuario=eq.{user_id}", callback=callback)
+    canal.on_postgres_changes("*", schema="public", table=TABELA_CATALOGO, callback=_ao_mudar_catalogo)
+    return canal
+
+
+# ==========================================
+# 3. CANAL REAL (WEBSOCKET EM THREAD PRÓPRIA)
+# ==========================================
+def _ler_jwt(token):
+    try:
+        return jwt.decode(token, options={"verify_signature": False})
+    except Exception:
+        return {}
+
+
+def _cliente_supabase():
+    from realtime import AsyncRealtimeClient
+
+    url = ler_config("SUPABASE_URL").replace("https://", "wss://").replace("http://", "ws://")
+    return AsyncRealtimeClient(f"{url}/realtime/v1", ler_config("SUPABASE_KEY"))
+
+
+class EscutaSupabase:
+    """
+    O cliente realtime é assíncrono e o Streamlit não: cada usuário ganha um
+    event loop numa thread daemon. O JWT do canal é trocado (set_auth) quando
+    um rerun traz um token novo e, sem rerun, pouco antes de expirar, com
+    `renovar_token()`. `parar()` (logout) fecha o socket e encerra a thread.
+    `criar_cliente` permite injetar um cliente falso nos testes.
+    """
+
+    def __init__(self, user_id, access_token, renovar_token=None, criar_cliente=None):
+        self.user_id = user_id
+        self.token = access_token
+        self.renovar_token = renovar_token
+        self.criar_cliente = criar_cliente or _cliente_supabase
+        self.loop = None
+        self.cliente = None
+        self._parar = None
+        self.thread = threading.Thread(target=self._rodar, daemon=True, name=f"realtime-{user_id[:8]}")
+
+    def iniciar(self):
+        self.thread.start()
+        return self
+
+    def _token_valido(self, token):
+        # O token precisa ser deste usuário: o canal é filtrado pelo RLS dele
+        return bool(token) and _ler_jwt(token).get("sub") in (None, self.user_id)
+
+    async def _aplicar_token(self, token):
+        if self._token_valido(token) and token != self.token:
+            self.token = token
+            await self.cliente.set_auth(token)
+
+    async def _renovar_periodicamente(self):
+        while True:
+            exp = _ler_jwt(self.token).get("exp") if self.token else None
+            espera = (exp - time.time() - MARGEM_RENOVACAO_TOKEN_SEG) if exp else INTERVALO_RENOVACAO_PADRAO_SEG
+            await asyncio.sleep(max(espera, 30))
+            if self.renovar_token is None:
+                continue
+            try:
+                token = await asyncio.get_running_loop().run_in_executor(None, self.renovar_token)
+                await self._aplicar_token(token)
+            except Exception as e:
+                print(f"Erro ao renovar token do realtime de {self.user_id}: {e}")
+
+    async def _escutar(self):
+        self.loop = asyncio.get_running_loop()
+        self._parar = asyncio.Event()
+        self.cliente = self.criar_cliente()
+        # connect() já deixa a leitura do socket rodando no loop (listen() é obsoleto e volta na hora)
+        await self.cliente.connect()
+        if self.token:
+            await self.cliente.set_auth(self.token)
+        canal = _registrar(self.cliente.channel(f"cache-{self.user_id}"), self.user_id)
+        await canal.subscribe()
+
+        # Só o logout (ou a renovação quebrar) encerra a escuta
+        tarefas = [asyncio.create_task(self._renovar_periodicamente()),
+                   asyncio.create_task(self._parar.wait())]
+        try:
+            await asyncio.wait(tarefas, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for tarefa in tarefas:
+                tarefa.cancel()
+            await self.cliente.close()
+
+    def _rodar(self):
+        try:
+            asyncio.run(self._escutar())
+        except Exception as e:
+            print(f"Realtime encerrado para {self.user_id}: {e}")
+        finally:
+            # Permite uma nova tentativa no próximo login/rerun
+            with _lock_canais:
+                if _canais.get(self.user_id) is self:
+                    _canais.pop(self.user_id, None)
+
+    def atualizar_token(self, token):
+        """Chamado a cada rerun: troca o JWT do canal se o da sessão mudou."""
+        if self.loop is not None and self._token_valido(token) and token != self.token:
+            asyncio.run_coroutine_threadsafe(self._aplicar_token(token), self.loop)
+
+    def parar(self):
+        if self.loop is not None and self._parar is not None:
+            self.loop.call_soon_threadsafe(self._parar.set)
+
+
+def iniciar_escuta_realtime(user_id, access_token=None, canal=None, renovar_token=None):
+    """
+    Assina as mudanças das tabelas do usuário (uma vez por processo).
+    `canal` permite injetar um CanalFalso; sem ele, só liga se SUPABASE_REALTIME
+    estiver ativo na configuração. Sem a escuta, o TTL do cache continua valendo.
+    `renovar_token` devolve o JWT atual da sessão, para renovar o canal antes de expirar.
+    """
+    uid = str(user_id)
+    with _lock_canais:
+        if uid in _canais:
+            existente = _canais[uid]
+            if isinstance(existente, EscutaSupabase):
+                existente.atualizar_token(access_token)
+            return existente
+
+        if canal is not None:
+            _canais[uid] = _registrar(canal, uid).subscribe()
+            return _canais[uid]
+
+        if not ler_config_bool("SUPABASE_REALTIME", False):
+            return None
+
+        _canais[uid] = EscutaSupabase(uid, access_token, renovar_token).iniciar()
+        return _canais[uid]
+
+
+def parar_escuta_realtime(user_id):
+    """Encerra a escuta do usuário (logout): cancela a inscrição e fecha o socket."""
+    with _lock_canais:
+        canal = _canais.pop(str(user_id), None)
+    if isinstance(canal, EscutaSupabase):
+        canal.parar()
+    elif canal is not None and hasattr(canal, "unsubscribe"):
+        canal.unsubscribe()
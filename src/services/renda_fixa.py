@@ -0,0 +1,249 @@
+import threading
+from datetime import date
+import numpy as np
+import pandas as pd
+import streamlit as st
+from src.services.market_data_service import buscar_historico_cdi_diario, buscar_historico_ipca_mensal
+from src.utils.calendario_b3 import dias_uteis
+
+# ==========================================
+# 1. CURVA DO CDI (FATORES ACUMULADOS)
+# ==========================================
+class CurvaCDI:
+    """
+    Série diária do CDI indexada pelo ordinal do dia útil (posição na série).
+    Para cada percentual do CDI guarda uma vez o log-fator acumulado:
+        acumulado[k] = soma(log(1 + taxa_i * pct)) para i < k
+    e o fator entre dois dias vira exp(acumulado[j] - acumulado[i]): O(1) por posição.
+    """
+
+    def __init__(self, datas, taxas):
+        ordem = np.argsort(np.asarray(datas, dtype="datetime64[D]"))
+        self.datas = np.asarray(datas, dtype="datetime64[D]")[ordem]
+        self.taxas = np.asarray(taxas, dtype=float)[ordem]
+        self._acumulados = {}
+        self._lock = threading.Lock()
+
+    @property
+    def ultima_data(self):
+        return self.datas[-1] if len(self.datas) else None
+
+    @classmethod
+    def do_dataframe(cls, df):
+        return cls(pd.to_datetime(df['data']).values, df['valor'].to_numpy(dtype=float))
+
+    def __len__(self):
+        return len(self.datas)
+
+    def ordinal(self, datas):
+        """Índice do primeiro dia útil da série em ou depois de cada data."""
+        return np.searchsorted(self.datas, np.asarray(datas, dtype="datetime64[D]"), side="left")
+
+    def acumulado(self, percentual):
+        with self._lock:
+            if percentual not in self._acumulados:
+                log_fatores = np.log1p(self.taxas * (percentual / 100.0))
+                self._acumulados[percentual] = np.concatenate(([0.0], np.cumsum(log_fatores)))
+            return self._acumulados[percentual]
+
+    def fatores(self, inicios, fins, percentuais):
+        """
+        Fator acumulado de cada posição, dos dias úteis em [inicio, fim).
+        `fins` escalar dá um fator por posição; um vetor de datas dá a matriz
+        (posição x data). Um acumulado por percentual distinto (na prática,
+        poucos: 100%, 110%...).
+        """
+        i = self.ordinal(inicios)[:, None]
+        j = np.maximum(i, self.ordinal(np.atleast_1d(np.asarray(fins, dtype="datetime64[D]")))[None, :])
+        percentuais = np.asarray(percentuais, dtype=float)
+        saida = np.ones(j.shape)
+        for pct in np.unique(percentuais):
+            mascara = percentuais == pct
+            acc = self.acumulado(float(pct))
+            saida[mascara] = np.exp(acc[j[mascara]] - acc[i[mascara]])
+        return saida[:, 0] if np.ndim(fins) == 0 else saida
+
+
+@st.cache_resource(ttl=86400, show_spinner=False)
+def _montar_curva_cdi():
+    df = buscar_historico_cdi_diario()
+    if df.empty:
+        # Levanta para não deixar uma curva vazia em cache por 24h
+        raise ValueError("Série do CDI indisponível")
+    return CurvaCDI.do_dataframe(df)
+
+
+def obter_curva_cdi():
+    """Curva compartilhada pelo processo (os acumulados por percentual também). None se o BCB falhar."""
+    try:
+        return _montar_curva_cdi()
+    except Exception as e:
+        print(f"Erro curva CDI: {e}")
+        return None
+
+
+# ==========================================
+# 2. NÚMERO-ÍNDICE DO IPCA
+# ==========================================
+class IndiceIPCA:
+    """
+    Número-índice do IPCA montado da variação mensal (Série 433):
+        niveis[k] = prod(1 + variacao_i) para i < k  (nível no 1º dia do mês k)
+    Dentro do mês o índice cresce pró-rata pelos dias úteis decorridos,
+    então o fator entre duas datas é nivel(fim) / nivel(inicio).
+    """
+
+    def __init__(self, meses, variacoes):
+        meses = np.asarray(meses, dtype="datetime64[M]")
+        ordem = np.argsort(meses)
+        meses = meses[ordem]
+        self.primeiro_mes = meses[0]
+        # Mês sem divulgação no meio da série conta como variação zero
+        self.variacoes = np.zeros(int((meses[-1] - meses[0]).astype(np.int64)) + 1)
+        self.variacoes[(meses - meses[0]).astype(np.int64)] = np.asarray(variacoes, dtype=float)[ordem]
+        self.niveis = np.concatenate(([1.0], np.cumprod(1 + self.variacoes)))
+
+    @classmethod
+    def do_dataframe(cls, df):
+        return cls(pd.to_datetime(df['data']).values, df['valor'].to_numpy(dtype=float))
+
+    def __len__(self):
+        return len(self.variacoes)
+
+    @property
+    def primeiro_dia(self):
+        return self.primeiro_mes.astype("datetime64[D]")
+
+    @property
+    def fim_publicado(self):
+        """1º dia do mês seguinte ao último IPCA divulgado."""
+        return (self.primeiro_mes + len(self.variacoes)).astype("datetime64[D]")
+
+    def nivel(self, datas):
+        d = np.asarray(datas, dtype="datetime64[D]")
+        d = np.minimum(np.maximum(d, self.primeiro_dia), self.fim_publicado)
+        k = (d.astype("datetime64[M]") - self.primeiro_mes).astype(np.int64)
+        inicio_mes = (self.primeiro_mes + k).astype("datetime64[D]")
+        fim_mes = (self.primeiro_mes + k + 1).astype("datetime64[D]")
+        fracao = dias_uteis(inicio_mes, d) / np.maximum(dias_uteis(inicio_mes, fim_mes), 1)
+        variacao = np.append(self.variacoes, 0.0)[k]
+        return self.niveis[k] * (1 + variacao) ** fracao
+
+    def fatores(self, inicios, fins):
+        """
+        Inflação acumulada de cada início até o fim, limitada ao período divulgado.
+        Mesmo formato de CurvaCDI.fatores: vetor para `fins` escalar, matriz para vetor.
+        """
+        inicios = np.asarray(inicios, dtype="datetime64[D]")[:, None]
+        fatores = self.nivel(np.atleast_1d(np.asarray(fins, dtype="datetime64[D]"))[None, :]) / self.nivel(inicios)
+        return fatores[:, 0] if np.ndim(fins) == 0 else fatores
+
+
+@st.cache_resource(ttl=86400, show_spinner=False)
+def _montar_indice_ipca():
+    df = buscar_historico_ipca_mensal()
+    if df.empty:
+        raise ValueError("Série do IPCA indisponível")
+    return IndiceIPCA.do_dataframe(df)
+
+
+def obter_indice_ipca():
+    """Índice compartilhado pelo processo. None se o BCB falhar."""
+    try:
+        return _montar_indice_ipca()
+    except Exception as e:
+        print(f"Erro índice IPCA: {e}")
+        return None
+
+
+# ==========================================
+# 3. VALOR PRESENTE DA CARTEIRA DE RENDA FIXA
+# ==========================================
+def valorar_renda_fixa(df, curva, indicadores_atuais, indice_ipca=None, hoje=None):
+    """
+    Valor presente de todas as linhas de uma vez (0.0 para o que não é Renda Fixa, categoria 3).
+    CDI/SELIC: fator acumulado da curva; os dias úteis depois do último dado
+    publicado (ou tudo, sem série) rendem a taxa atual.
+    PREFIXADO: juros compostos sobre os dias úteis do calendário B3/ANBIMA.
+    IPCA: inflação do número-índice entre o aporte e hoje; fora do período
+    divulgado, o IPCA 12 meses atual. A taxa real corre sobre dias úteis.
+    Aporte de hoje em diante, ou sem data válida, vale o que foi investido.
+    """
+    hoje_np = np.datetime64(hoje or date.today(), "D")
+    if len(df) == 0:
+        return np.zeros(0)
+
+    valores = valorar_renda_fixa_em_datas(df, [hoje_np], curva, indicadores_atuais, indice_ipca)[:, 0]
+    aporte = _datas_aporte(df)
+    futuro = np.isnat(aporte) | (aporte > hoje_np)
+    investido = pd.to_numeric(df['valor_investido'], errors='coerce').fillna(0).to_numpy(dtype=float)
+    return np.where(futuro & (df['id_categoria'] == 3).to_numpy(), investido, valores)
+
+
+def _datas_aporte(df):
+    aporte = pd.to_datetime(df['data'], errors='coerce')
+    if getattr(aporte.dt, 'tz', None) is not None:
+        aporte = aporte.dt.tz_localize(None)
+    return aporte.to_numpy(dtype="datetime64[D]")
+
+
+def valorar_renda_fixa_em_datas(df, datas, curva, indicadores_atuais, indice_ipca=None):
+    """
+    Matriz (linha x data) com o valor de cada aplicação em cada data, na mesma
+    regra de valorar_renda_fixa. Antes do aporte a linha vale 0; no dia do
+    aporte, o que foi investido. Linhas fora da categoria 3 valem 0.
+    """
+    datas = np.asarray(datas, dtype="datetime64[D]")
+    n, d = len(df), len(datas)
+    if n == 0 or d == 0:
+        return np.zeros((n, d))
+
+    valor = pd.to_numeric(df['valor_investido'], errors='coerce').fillna(0).to_numpy(dtype=float)
+    eh_fixa = (df['id_categoria'] == 3).to_numpy()
+    taxa_pct = pd.to_numeric(df['taxa'], errors='coerce').fillna(100.0).to_numpy(dtype=float)
+    indexador = df['indexador'].fillna('CDI').astype(str).to_numpy()
+
+    aporte = _datas_aporte(df)
+    sem_data = np.isnat(aporte)
+    # Linha sem data vale 0 em todas as datas; a data fictícia só evita NaT nos índices
+    aporte = np.where(sem_data, datas.max(), aporte)
+    A, T = aporte[:, None], datas[None, :]
+
+    resultado = np.broadcast_to(valor[:, None], (n, d)).copy()
+
+    # CDI / SELIC
+    cdi = np.isin(indexador, ['CDI', 'SELIC'])
+    if cdi.any():
+        inicio_estimado = A[cdi]
+        fator = np.ones((cdi.sum(), d))
+        if curva is not None and len(curva):
+            fator = curva.fatores(aporte[cdi], datas, taxa_pct[cdi])
+            # O BCB publica com atraso: depois do último dia da série, usa a taxa atual
+            inicio_estimado = np.maximum(A[cdi], curva.ultima_data + np.timedelta64(1, "D"))
+        du_estimados = dias_uteis(inicio_estimado, T)
+        taxa_aa = indicadores_atuais.get('CDI', 0.1115) * (taxa_pct[cdi][:, None] / 100.0)
+        resultado[cdi] = valor[cdi][:, None] * fator * (1 + taxa_aa) ** (du_estimados / 252.0)
+
+    # PREFIXADO
+    pre = indexador == 'PREFIXADO'
+    if pre.any():
+        du = dias_uteis(A[pre], T)
+        resultado[pre] = valor[pre][:, None] * (1 + taxa_pct[pre][:, None] / 100.0) ** (du / 252.0)
+
+    # IPCA + taxa fixa
+    ipca = indexador == 'IPCA'
+    if ipca.any():
+        fator = np.ones((ipca.sum(), d))
+        du_estimados = dias_uteis(A[ipca], T)
+        if indice_ipca is not None and len(indice_ipca):
+            fator = indice_ipca.fatores(aporte[ipca], datas)
+            # Sem índice divulgado: antes do início da série e depois do último mês
+            du_estimados = (dias_uteis(np.maximum(A[ipca], indice_ipca.fim_publicado), T)
+                            + dias_uteis(A[ipca], np.minimum(T, indice_ipca.primeiro_dia)))
+        ipca_aa = indicadores_atuais.get('IPCA', 0.045)
+        du = dias_uteis(A[ipca], T)
+        resultado[ipca] = (valor[ipca][:, None] * fator * (1 + ipca_aa) ** (du_estimados / 252.0)
+                           * (1 + taxa_pct[ipca][:, None] / 100.0) ** (du / 252.0))
+
+    possui = ~sem_data[:, None] & (A <= T) & eh_fixa[:, None]
+    return np.where(possui, resultado, 0.0)
@@ -0,0 +1,236 @@
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturoTimeout
+import httpx
+import requests
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from src.utils.configuracao import ler_config
+
+# ==========================================
+# CONFIGURAÇÃO
+# ==========================================
+# Quanto a tela espera por uma leitura antes de usar o último resultado bom
+TIMEOUT_LEITURA_SEG = float(ler_config("LEITURA_TIMEOUT_SEG", 3))
+# Sem resultado anterior não há o que mostrar: a primeira leitura espera bem mais
+TIMEOUT_PRIMEIRA_LEITURA_SEG = float(ler_config("LEITURA_PRIMEIRA_TIMEOUT_SEG", 30))
+# Últimos resultados bons guardados (os mais antigos saem primeiro) e por quanto tempo valem
+ULTIMOS_BONS_MAX = int(ler_config("LEITURA_ULTIMOS_BONS_MAX", 500))
+ULTIMOS_BONS_TTL_SEG = float(ler_config("LEITURA_ULTIMOS_BONS_TTL_SEG", 6 * 3600))
+# Falhas seguidas (erro ou timeout) que abrem o circuito
+FALHAS_PARA_ABRIR = int(ler_config("CIRCUITO_FALHAS", 3))
+# Tempo com o circuito aberto antes de deixar uma tentativa passar
+PAUSA_CIRCUITO_SEG = float(ler_config("CIRCUITO_PAUSA_SEG", 30))
+
+# Chave do st.session_state com as leituras que usaram dado antigo neste rerun
+CHAVE_DESATUALIZADOS = "_dados_desatualizados"
+
+
+class DadosIndisponiveis(Exception):
+    """Leitura falhou/estourou o tempo e não há resultado anterior para mostrar."""
+
+
+# Leituras em andamento continuam depois do timeout: é isso que faz o refresh em segundo plano
+MAX_THREADS_LEITURA = int(ler_config("LEITURA_MAX_THREADS", 8))
+_executor = ThreadPoolExecutor(max_workers=MAX_THREADS_LEITURA, thread_name_prefix="leitura")
+# Uma vaga por thread: leitura nunca espera em fila (fila cheia = pool ocupado, ver ler_com_fallback)
+_vagas = threading.BoundedSemaphore(MAX_THREADS_LEITURA)
+_ultimos_bons = OrderedDict()  # chave -> (valor, em), do menos ao mais recente
+_em_andamento = {}      # (chave, versao) -> Future
+_circuitos = {}         # nome -> {'falhas', 'aberto_em'}
+_lock = threading.Lock()
+
+
+# ==========================================
+# 1. CIRCUIT BREAKER
+# ==========================================
+def _circuito(nome):
+    return _circuitos.setdefault(nome, {'falhas': 0, 'aberto_em': None})
+
+
+def _pode_tentar(nome):
+    """Fechado: sempre. Aberto: só depois da pausa (meio-aberto, uma tentativa por vez)."""
+    with _lock:
+        c = _circuito(nome)
+        if c['aberto_em'] is None:
+            return True
+        if time.time() - c['aberto_em'] >= PAUSA_CIRCUITO_SEG:
+            c['aberto_em'] = time.time()  # a próxima tentativa espera outra pausa
+            return True
+        return False
+
+
+def _registrar_resultado(nome, sucesso):
+    with _lock:
+        c = _circuito(nome)
+        if sucesso:
+            c['falhas'], c['aberto_em'] = 0, None
+        else:
+            c['falhas'] += 1
+            if c['falhas'] >= FALHAS_PARA_ABRIR:
+                c['aberto_em'] = time.time()
+
+
+def _falha_de_transporte(erro):
+    """
+    Só rede e timeout indicam o Supabase fora do ar. Erro da aplicação
+    (4xx do PostgREST, .single() sem linha) é do pedido, não do serviço.
+    """
+    return isinstance(erro, (httpx.TransportError, requests.ConnectionError, requests.Timeout,
+                             ConnectionError, TimeoutError, FuturoTimeout))
+
+
+# ==========================================
+# 2. ÚLTIMOS RESULTADOS BONS
+# ==========================================
+def _guardar_bom(chave, valor):
+    with _lock:
+        _ultimos_bons[chave] = (valor, time.time())
+        _ultimos_bons.move_to_end(chave)
+        while len(_ultimos_bons) > ULTIMOS_BONS_MAX:
+            _ultimos_bons.popitem(last=False)
+
+
+def _ultimo_bom(chave):
+    with _lock:
+        anterior = _ultimos_bons.get(chave)
+        if anterior is None:
+            return None
+        if time.time() - anterior[1] > ULTIMOS_BONS_TTL_SEG:
+            del _ultimos_bons[chave]
+            return None
+        _ultimos_bons.move_to_end(chave)
+        return anterior
+
+
+# ==========================================
+# 3. LEITURA COM FALLBACK
+# ==========================================
+def _executar(carregar, circuito):
+    """Roda carregar() na própria thread, contando o resultado no circuito."""
+    try:
+        valor = carregar()
+    except Exception as e:
+        _registrar_resultado(circuito, not _falha_de_transporte(e))
+        raise
+    _registrar_resultado(circuito, True)
+    return valor
+
+
+def _iniciar_leitura(chave, versao, carregar, circuito, timeout):
+    """
+    Dispara carregar() no pool, ou reaproveita a leitura da mesma chave já em voo.
+    Uma leitura iniciada antes de uma gravação (outra versão) não é reaproveitada.
+    None se o pool estiver cheio.
+    """
+    with _lock:
+        futuro = _em_andamento.get((chave, versao))
+        if futuro is not None:
+            return futuro
+    if not _vagas.acquire(blocking=False):
+        return None
+
+    ctx = get_script_run_ctx(suppress_warning=True)
+    inicio = time.time()
+
+    def tarefa():
+        # A leitura pode usar st.session_state/caches: roda com o contexto da sessão
+        if ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+        return carregar()
+
+    def ao_terminar(f):
+        _vagas.release()
+        with _lock:
+            _em_andamento.pop((chave, versao), None)
+        erro = f.exception()
+        if erro is not None:
+            _registrar_resultado(circuito, not _falha_de_transporte(erro))
+            return
+        _guardar_bom(chave, f.result())
+        # Resposta que chegou depois do timeout já contou como falha: lenta não fecha o circuito
+        if time.time() - inicio <= timeout:
+            _registrar_resultado(circuito, True)
+
+    futuro = _executor.submit(tarefa)
+    with _lock:
+        _em_andamento[(chave, versao)] = futuro
+    futuro.add_done_callback(ao_terminar)
+    return futuro
+
+
+def _primeira_leitura(chave, versao, carregar, circuito):
+    """
+    Sem resultado anterior: espera a leitura em voo da mesma chave ou roda na
+    própria thread (sem fila no pool), com o timeout longo da primeira carga.
+    """
+    with _lock:
+        futuro = _em_andamento.get((chave, versao))
+    try:
+        if futuro is not None:
+            return futuro.result(timeout=TIMEOUT_PRIMEIRA_LEITURA_SEG)
+        valor = _executar(carregar, circuito)
+    except Exception as e:
+        raise DadosIndisponiveis(str(e)) from e
+    _guardar_bom(chave, valor)
+    return valor
+
+
+def _usar_ultimo_bom(chave, anterior):
+    _marcar_desatualizado(chave, anterior[1])
+    return anterior[0]
+
+
+def ler_com_fallback(chave, carregar, circuito="supabase", timeout=None, versao=None):
+    """
+    Stale-while-revalidate:
+    - responde em até `timeout` segundos com o resultado novo;
+    - se estourar ou falhar, devolve o último resultado bom (marcado como
+      desatualizado) e deixa a leitura terminar em segundo plano;
+    - com o circuito aberto ou o pool cheio, vai direto ao último resultado bom.
+    Sem resultado anterior a leitura é esperada (TIMEOUT_PRIMEIRA_LEITURA_SEG);
+    só levanta DadosIndisponiveis se ela falhar ou o circuito estiver aberto.
+    O circuito só conta falhas de rede e timeouts.
+    `versao` (de versao_tabelas) separa leituras em voo de antes e depois de uma gravação.
+    `carregar` deve levantar exceção em caso de erro.
+    """
+    anterior = _ultimo_bom(chave)
+    if not _pode_tentar(circuito):
+        if anterior is None:
+            raise DadosIndisponiveis(f"circuito {circuito} aberto")
+        return _usar_ultimo_bom(chave, anterior)
+
+    if anterior is None:
+        return _primeira_leitura(chave, versao, carregar, circuito)
+
+    timeout = TIMEOUT_LEITURA_SEG if timeout is None else timeout
+    futuro = _iniciar_leitura(chave, versao, carregar, circuito, timeout)
+    if futuro is None:
+        return _usar_ultimo_bom(chave, anterior)
+    try:
+        return futuro.result(timeout=timeout)
+    except FuturoTimeout:
+        _registrar_resultado(circuito, False)
+        return _usar_ultimo_bom(chave, anterior)
+    except Exception:
+        # Erros já foram contados no circuito por ao_terminar
+        return _usar_ultimo_bom(chave, anterior)
+
+
+# ==========================================
+# 4. AVISO NA TELA
+# ==========================================
+def _marcar_desatualizado(chave, em):
+    if get_script_run_ctx(suppress_warning=True) is None:
+        return
+    st.session_state.setdefault(CHAVE_DESATUALIZADOS, {})[chave] = em
+
+
+def limpar_marcas_desatualizadas():
+    st.session_state[CHAVE_DESATUALIZADOS] = {}
+
+
+def dados_desatualizados():
+    """{chave: timestamp do dado mostrado} das leituras que usaram cache neste rerun."""
+    return st.session_state.get(CHAVE_DESATUALIZADOS, {})
@@ -0,0 +1,152 @@
+import os
+import time
+import threading
+from datetime import date, timedelta
+import pandas as pd
+from src.services.instrumentacao import sessao_http
+from src.utils.configuracao import ler_config
+
+# ==========================================
+# CONFIGURAÇÃO
+# ==========================================
+PASTA_SERIES = ler_config("BCB_PASTA", os.path.join(".cache", "bcb"))
+URL_SGS = "https://api.bcb.gov.br/dados/serie/bcdata.sgs.{codigo}/dados"
+
+# Séries guardadas em disco (código SGS -> anos de histórico na primeira carga)
+SERIE_CDI = 12          # CDI diário, % a.d.
+SERIE_SELIC_META = 432  # Selic meta, % a.a.
+SERIE_IPCA_MENSAL = 433  # IPCA, variação % no mês
+SERIE_IPCA_12M = 13522  # IPCA acumulado em 12 meses, %
+HISTORICO_INICIAL_ANOS = {SERIE_CDI: 5, SERIE_SELIC_META: 5, SERIE_IPCA_MENSAL: 10, SERIE_IPCA_12M: 5}
+
+# O SGS limita consultas de séries diárias a janelas de 10 anos
+JANELA_MAX_DIAS = 3650
+# Depois de uma falha do BCB, quanto esperar antes de tentar de novo
+RETENTATIVA_SEG = float(ler_config("BCB_RETENTATIVA_SEG", 600))
+
+# Em memória, uma vez por processo: código -> {'df', 'verificada_em', 'falhou_em', 'atualizando'}
+_series = {}
+_locks = {codigo: threading.Lock() for codigo in HISTORICO_INICIAL_ANOS}
+
+
+# ==========================================
+# 1. ARQUIVO LOCAL
+# ==========================================
+def _arquivo(codigo):
+    return os.path.join(PASTA_SERIES, f"serie_{codigo}.parquet")
+
+
+def _ler_disco(codigo):
+    try:
+        df = pd.read_parquet(_arquivo(codigo))
+        df['data'] = pd.to_datetime(df['data']).dt.date
+        return df
+    except Exception:
+        return pd.DataFrame(columns=['data', 'valor'])
+
+
+def _gravar_disco(codigo, df):
+    """Grava num temporário e troca de uma vez: um processo nunca lê o arquivo pela metade."""
+    os.makedirs(PASTA_SERIES, exist_ok=True)
+    temporario = f"{_arquivo(codigo)}.{os.getpid()}.tmp"
+    df.to_parquet(temporario, index=False)
+    os.replace(temporario, _arquivo(codigo))
+
+
+# ==========================================
+# 2. DOWNLOAD DO DELTA
+# ==========================================
+def _baixar(codigo, inicio, fim):
+    """Linhas do SGS entre inicio e fim (inclusive). [] quando não há dado novo; levanta se o BCB falhar."""
+    linhas = []
+    while inicio <= fim:
+        fim_janela = min(fim, inicio + timedelta(days=JANELA_MAX_DIAS))
+        params = {"formato": "json", "dataInicial": inicio.strftime("%d/%m/%Y"),
+                  "dataFinal": fim_janela.strftime("%d/%m/%Y")}
+        r = sessao_http.get(URL_SGS.format(codigo=codigo), params=params,
+                            headers={'User-Agent': 'Mozilla/5.0'}, timeout=10)
+        # 404 = nenhum valor no período (fim de semana, mês ainda não divulgado)
+        if r.status_code != 404:
+            r.raise_for_status()
+            linhas.extend(r.json())
+        inicio = fim_janela + timedelta(days=1)
+
+    df = pd.DataFrame(linhas, columns=['data', 'valor'])
+    df['data'] = pd.to_datetime(df['data'], format='%d/%m/%Y').dt.date
+    df['valor'] = df['valor'].astype(str).str.replace(',', '.').astype(float)
+    return df
+
+
+def _atualizar(codigo, df):
+    hoje = date.today()
+    if df.empty:
+        inicio = hoje - timedelta(days=365 * HISTORICO_INICIAL_ANOS[codigo])
+    else:
+        inicio = max(df['data']) + timedelta(days=1)
+    if inicio > hoje:
+        return df
+
+    novas = _baixar(codigo, inicio, hoje)
+    if novas.empty:
+        return df
+    df = pd.concat([df, novas], ignore_index=True).drop_duplicates('data', keep='last') \
+        .sort_values('data', ignore_index=True)
+    _gravar_disco(codigo, df)
+    return df
+
+
+# ==========================================
+# 3. LEITURA
+# ==========================================
+def _tentar_atualizar(codigo, estado):
+    """
+    Atualiza `estado`; a falha fica registrada para o back-off. Só um
+    atualizador por série de cada vez (lock da série ou flag 'atualizando').
+    """
+    try:
+        estado['df'] = _atualizar(codigo, estado['df'])
+        estado['verificada_em'] = date.today()
+        estado['falhou_em'] = None
+    except Exception as e:
+        estado['falhou_em'] = time.time()
+        print(f"Erro ao atualizar série BCB {codigo}: {e}")
+
+
+def _atualizar_em_segundo_plano(codigo, estado):
+    # Sem o lock: quem lê a série enquanto isso recebe o DataFrame anterior
+    try:
+        _tentar_atualizar(codigo, estado)
+    finally:
+        estado['atualizando'] = False
+
+
+def serie_bcb(codigo):
+    """
+    DataFrame (data, valor) da série SGS, em % como o BCB publica.
+    Lê o disco uma vez por processo e, no máximo uma vez por dia, baixa só
+    os dias depois da última data guardada. Com histórico em disco a
+    atualização corre em segundo plano e a tela segue com o que já tem; só a
+    primeira carga (disco vazio) espera o BCB. Se o BCB falhar, a próxima
+    tentativa só acontece depois de RETENTATIVA_SEG.
+    """
+    with _locks[codigo]:
+        estado = _series.get(codigo)
+        if estado is None:
+            estado = _series[codigo] = {'df': _ler_disco(codigo), 'verificada_em': None,
+                                        'falhou_em': None, 'atualizando': False}
+
+        em_espera = estado['falhou_em'] is not None and time.time() - estado['falhou_em'] < RETENTATIVA_SEG
+        if estado['verificada_em'] != date.today() and not em_espera and not estado['atualizando']:
+            if estado['df'].empty:
+                _tentar_atualizar(codigo, estado)
+            else:
+                estado['atualizando'] = True
+                threading.Thread(target=_atualizar_em_segundo_plano, args=(codigo, estado),
+                                 daemon=True, name=f"bcb_{codigo}").start()
+
+        return estado['df'].copy()
+
+
+def ultimo_valor(codigo):
+    df = serie_bcb(codigo)
+    return float(df['valor'].iloc[-1]) if not df.empty else None
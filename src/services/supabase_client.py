@@ -1,19 +1,42 @@
 import streamlit as st
+import httpx
 from supabase import create_client, Client
-import os
-from dotenv import load_dotenv
-
-# Carrega variáveis de ambiente se estiver rodando localmente
-load_dotenv()
+from supabase.lib.client_options import SyncClientOptions
+from src.utils.configuracao import ler_config, ler_config_bool
+from src.services.instrumentacao import GANCHOS_HTTPX
 
 # Tenta pegar as chaves do .streamlit/secrets.toml OU do arquivo .env
-url = st.secrets.get("SUPABASE_URL") or os.getenv("SUPABASE_URL")
-key = st.secrets.get("SUPABASE_KEY") or os.getenv("SUPABASE_KEY")
+url = ler_config("SUPABASE_URL")
+key = ler_config("SUPABASE_KEY")
 
 # Verificação de segurança
 if not url or not key:
     st.error("🚨 Erro Crítico: Credenciais do Supabase não encontradas. Verifique se o arquivo .env ou secrets.toml está configurado corretamente.")
     st.stop()
 
+
+@st.cache_resource
+def obter_cliente_supabase() -> Client:
+    """
+    Fábrica ÚNICA do cliente Supabase (um por processo, compartilhado entre sessões).
+    O httpx.Client mantém as conexões abertas (keep-alive) e multiplexa as
+    requisições em HTTP/2, então os reruns não pagam um novo handshake TLS.
+    Limites configuráveis via secrets/.env.
+    """
+    limites = httpx.Limits(
+        max_connections=int(ler_config("SUPABASE_POOL_MAX_CONEXOES", 20)),
+        max_keepalive_connections=int(ler_config("SUPABASE_POOL_MAX_KEEPALIVE", 10)),
+        keepalive_expiry=float(ler_config("SUPABASE_POOL_KEEPALIVE_SEGUNDOS", 60)),
+    )
+    http_client = httpx.Client(
+        http2=ler_config_bool("SUPABASE_HTTP2", True),
+        limits=limites,
+        timeout=float(ler_config("SUPABASE_TIMEOUT_SEGUNDOS", 15)),
+        # Contagem/tempo/bytes de cada consulta por rerun (painel de debug e orçamento)
+        event_hooks=GANCHOS_HTTPX,
+    )
+    return create_client(url, key, options=SyncClientOptions(httpx_client=http_client))
+
+
 # Cria a conexão única que será usada pelo app todo
-supabase: Client = create_client(url, key)
\ No newline at end of file
+supabase: Client = obter_cliente_supabase()
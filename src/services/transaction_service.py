@@ -2,38 +2,30 @@ import streamlit as st
 import pandas as pd
 from datetime import date
 import calendar
+import uuid
 from src.services.supabase_client import supabase
+from src.services.contexto_dados import memorizar_na_sessao, invalidar_tabelas
+from src.services.catalogo_categorias import categorias_do_tipo, mapa_categorias
+from src.services.espelho_local import ler_linhas
+from src.services.resiliencia import ler_com_fallback
+from src.services.projecoes import colunas
 
 
 # --- SELETORES ---
 def listar_bancos_selecao(user_id):
     try:
-        resp = supabase.table("contas_bancarias").select("id, nome_banco").eq("id_usuario", user_id).execute()
-        return [{'id_bank': i['id'], 'nome_banco': i['nome_banco']} for i in resp.data] if resp.data else []
+        dados = memorizar_na_sessao(
+            ("bancos_selecao", str(user_id)), user_id, ("contas_bancarias",),
+            lambda: supabase.table("contas_bancarias").select("id, nome_banco").eq("id_usuario", user_id).execute().data
+        )
+        return [{'id_bank': i['id'], 'nome_banco': i['nome_banco']} for i in dados] if dados else []
     except:
         return []
 
 
 def listar_categorias_selecao(tipo_filtro=None):
-    try:
-        resp = supabase.table("categorias").select("*").order("id_categoria").execute()
-        todas = resp.data if resp.data else []
-        if not todas: return []
-        lista_filtrada = []
-        filtro = str(tipo_filtro).lower().strip() if tipo_filtro else None
-        for c in todas:
-            tipo_db = str(c.get('tipo', '')).strip().lower()
-            if filtro == 'receita':
-                if tipo_db in ['receita', 'investimento']: lista_filtrada.append(c)
-            elif filtro == 'despesa':
-                if tipo_db in ['despesa', 'investimento']: lista_filtrada.append(c)
-            elif filtro == 'investimento':
-                if tipo_db == 'investimento': lista_filtrada.append(c)
-            else:
-                lista_filtrada.append(c)
-        return sorted(lista_filtrada, key=lambda x: x['descricao'])
-    except:
-        return []
+    # Listas já filtradas e ordenadas no catálogo do processo
+    return categorias_do_tipo(tipo_filtro)
 
 
 # --- HELPERS ---
@@ -50,6 +42,7 @@ def confirmar_pagamento(id_transacao, data_real):
         supabase.table("transacoes_bancarias").update({
             "concluido": True, "data": str(data_real)
         }).eq("id_trans_bank", id_transacao).execute()
+        invalidar_tabelas("transacoes_bancarias")
         return True
     except:
         return False
@@ -61,21 +54,30 @@ def salvar_transacao(user_id, id_bank, id_categoria, tipo, data_ref, descricao,
     try:
         payload = {"id_usuario": user_id, "id_bank": id_bank, "id_categoria": id_categoria, "tipo": tipo,
                    "data": str(data_ref), "descricao": descricao, "valor": float(valor), "devedor": devedor,
-                   "concluido": True}
-        supabase.table("transacoes_bancarias").insert(payload).execute()
+                   "concluido": True, "id_grupo": None}
 
         if is_emprestimo and parcelas > 0:
+            # Entrada + cronograma de pagamentos num único INSERT (uma transação no Postgres)
+            id_grupo = str(uuid.uuid4())
+            payload["id_grupo"] = id_grupo
+            payloads = [payload]
+
             valor_recebido = float(valor)
             total_divida = valor_recebido * (1 + (taxa_juros / 100))
             valor_parcela = total_divida / int(parcelas)
             for i in range(parcelas):
                 data_pgto = add_months(data_ref, i + 1)
-                payload_parcela = {"id_usuario": user_id, "id_bank": id_bank, "id_categoria": id_categoria,
-                                   "tipo": "saida", "data": str(data_pgto),
-                                   "descricao": f"Pgto Empréstimo ({i + 1}/{parcelas}) - {descricao}",
-                                   "valor": valor_parcela, "devedor": devedor, "concluido": False}
-                supabase.table("transacoes_bancarias").insert(payload_parcela).execute()
+                payloads.append({"id_usuario": user_id, "id_bank": id_bank, "id_categoria": id_categoria,
+                                 "tipo": "saida", "data": str(data_pgto),
+                                 "descricao": f"Pgto Empréstimo ({i + 1}/{parcelas}) - {descricao}",
+                                 "valor": valor_parcela, "devedor": devedor, "concluido": False,
+                                 "id_grupo": id_grupo})
+            supabase.table("transacoes_bancarias").insert(payloads).execute()
+            invalidar_tabelas("transacoes_bancarias", user_id=user_id)
             return True, f"Empréstimo registrado."
+
+        supabase.table("transacoes_bancarias").insert(payload).execute()
+        invalidar_tabelas("transacoes_bancarias", user_id=user_id)
         return True, "Transação salva."
     except Exception as e:
         return False, str(e)
@@ -89,68 +91,194 @@ def salvar_investimento(user_id, id_bank, id_categoria, data, descricao, valor_i
                    "descricao": descricao, "valor_investido": float(valor_investido), "quantidade": float(quantidade),
                    "rentabilidade": float(rentabilidade) if rentabilidade else None}
         supabase.table("investimento").insert(payload).execute()
+        invalidar_tabelas("investimento", user_id=user_id)
         return True, "Sucesso"
     except Exception as e:
         return False, str(e)
 
 
 # --- LISTAGEM UNIFICADA (Dashboard/Extrato) ---
-def listar_transacoes_unificadas(user_id):
+TAMANHO_PAGINA_EXTRATO = 50
+
+# origem -> (tabela, coluna de id usada como desempate no keyset, projeção)
+FONTES_EXTRATO = {
+    'Conta': ("transacoes_bancarias", "id_trans_bank", "extrato_bancarias"),
+    'Cartão': ("transacoes_cartao_credito", "id_trans_cartao", "extrato_cartao"),
+    'Investimento': ("investimento", "id_invest", "extrato_investimento"),
+}
+
+
+def _buscar_pagina_fonte(origem, user_id, data_inicio, data_fim, limite, cursor):
+    """
+    Uma página de uma tabela, ordenada por (data, id) decrescente.
+    `cursor` é o (data, id) da última linha já exibida: a página seguinte
+    começa estritamente depois dele (keyset), sem OFFSET.
+    """
+    tabela, col_id, projecao = FONTES_EXTRATO[origem]
+    linhas = ler_linhas(user_id, tabela, colunas(projecao), data_inicio, data_fim, cursor=cursor, limite=limite)
+    if linhas is not None:
+        return linhas
+
+    query = supabase.table(tabela).select(colunas(projecao)).eq("id_usuario", user_id)
+    if data_inicio: query = query.gte("data", str(data_inicio))
+    if data_fim: query = query.lte("data", str(data_fim))
+    if cursor:
+        d, i = cursor
+        query = query.or_(f'data.lt."{d}",and(data.eq."{d}",{col_id}.lt.{i})')
+    resp = query.order("data", desc=True).order(col_id, desc=True).limit(limite).execute()
+    return resp.data if resp.data else []
+
+
+def _preparar_fonte(origem, linhas):
+    df = pd.DataFrame(linhas)
+    if df.empty: return df
+    df['origem'] = origem
+    if origem == 'Conta':
+        df['detalhe'] = 'Transação'
+        df['concluido'] = df['concluido'].fillna(True)
+    elif origem == 'Cartão':
+        df['tipo'] = 'saida'
+        df['valor'] = df['valor_total']
+        df['detalhe'] = df.apply(lambda x: f"{x.get('parcelas', 1)}x", axis=1)
+        df['concluido'] = True
+    else:
+        df = df.rename(columns={'valor_investido': 'valor'})
+        df['tipo'] = 'saida'
+        df['detalhe'] = 'Aporte'
+        df['concluido'] = True
+    return df
+
+
+def listar_transacoes_unificadas(user_id, data_inicio=None, data_fim=None, limite=TAMANHO_PAGINA_EXTRATO,
+                                 cursores=None, origens=tuple(FONTES_EXTRATO)):
+    """
+    Retorna (DataFrame, cursores_seguintes).
+    O período vai no filtro da query e cada origem é paginada por keyset em
+    (data, id); as páginas das origens são intercaladas por data.
+    `cursores_seguintes` é None quando o período já foi todo lido.
+    """
+    try:
+        mapa_cats = mapa_categorias()
+        cursores = dict(cursores or {})
+        frames = []
+        qtd_lida = {}
+
+        for origem in origens:
+            cursor = cursores.get(origem)
+            linhas = ler_com_fallback(
+                ("pagina_extrato", origem, str(user_id), str(data_inicio), str(data_fim), limite, cursor),
+                # origem/cursor fixados: a leitura pode terminar depois que o laço andou
+                lambda o=origem, c=cursor: _buscar_pagina_fonte(o, user_id, data_inicio, data_fim, limite, c)
+            )
+            qtd_lida[origem] = len(linhas)
+            df = _preparar_fonte(origem, linhas)
+            if not df.empty: frames.append(df)
+
+        if not frames:
+            return pd.DataFrame(), None
+
+        final = pd.concat(frames, ignore_index=True)
+        final['data_cursor'] = final['data'].astype(str)
+        final['data'] = pd.to_datetime(final['data'])
+        # Sort estável: dentro de cada origem a ordem (data, id) da query é preservada,
+        # então o que fica para a próxima página é sempre o final de cada fonte
+        final = final.sort_values('data', ascending=False, kind='mergesort').head(limite)
+
+        tem_mais = False
+        for origem in origens:
+            consumidas = final[final['origem'] == origem]
+            if not consumidas.empty:
+                col_id = FONTES_EXTRATO[origem][1]
+                ultima = consumidas.iloc[-1]
+                cursores[origem] = (ultima['data_cursor'], int(ultima[col_id]))
+            # Ainda há linhas se a página veio cheia ou se sobrou algo fora do merge
+            if qtd_lida[origem] == limite or len(consumidas) < qtd_lida[origem]:
+                tem_mais = True
+
+        final = final.drop(columns=['data_cursor'])
+
+        def get_cat_info(id_cat):
+            cat = mapa_cats.get(id_cat)
+            if not cat: return 'receipt_long', 'outros'
+            return cat['icon'], str(cat.get('tipo', '')).lower()
+
+        final[['icon_db', 'cat_tipo']] = final['id_categoria'].apply(lambda x: pd.Series(get_cat_info(x)))
+        final['concluido'] = final['concluido'].fillna(True)
+        return final, (cursores if tem_mais else None)
+    except Exception as e:
+        return pd.DataFrame(), None
+
+
+def resumir_mes_extrato(user_id, data_inicio, data_fim):
+    """
+    Totais dos cards do Extrato (Entradas, Saídas, Investido, A Pagar).
+    Lê só as colunas dos valores, então não depende de quantas páginas
+    da listagem já foram carregadas.
+    """
+    def carregar():
+        return _calcular_resumo_mes_extrato(user_id, data_inicio, data_fim)
+
     try:
-        resp_cats = supabase.table("categorias").select("id_categoria, icon, descricao, tipo").execute()
-        mapa_cats = {c['id_categoria']: c for c in resp_cats.data} if resp_cats.data else {}
-
-        r1 = supabase.table("transacoes_bancarias").select("*").eq("id_usuario", user_id).order("data",
-                                                                                                desc=True).limit(
-            1000).execute()
-        df1 = pd.DataFrame(r1.data)
-        if not df1.empty:
-            df1['origem'] = 'Conta';
-            df1['detalhe'] = 'Transação'
-            if 'concluido' not in df1.columns: df1['concluido'] = True
-
-        r2 = supabase.table("transacoes_cartao_credito").select("*").eq("id_usuario", user_id).order("data",
-                                                                                                     desc=True).limit(
-            1000).execute()
-        df2 = pd.DataFrame(r2.data)
-        if not df2.empty:
-            df2['tipo'] = 'saida';
-            df2['origem'] = 'Cartão';
-            df2['valor'] = df2['valor_total']
-            df2['detalhe'] = df2.apply(lambda x: f"{x.get('parcelas', 1)}x", axis=1)
-            df2['concluido'] = True
-
-        r3 = supabase.table("investimento").select("*").eq("id_usuario", user_id).order("data", desc=True).limit(
-            1000).execute()
-        df3 = pd.DataFrame(r3.data)
-        if not df3.empty:
-            df3 = df3.rename(columns={'valor_investido': 'valor'});
-            df3['tipo'] = 'saida';
-            df3['origem'] = 'Investimento';
-            df3['detalhe'] = 'Aporte'
-            df3['concluido'] = True
-
-        dfs = [d for d in [df1, df2, df3] if not d.empty]
-        if dfs:
-            final = pd.concat(dfs, ignore_index=True)
-            if 'data' in final.columns: final['data'] = pd.to_datetime(final['data'])
-
-            def get_cat_info(id_cat):
-                cat = mapa_cats.get(id_cat)
-                if not cat: return 'receipt_long', 'outros'
-                return cat['icon'], str(cat.get('tipo', '')).lower()
-
-            final[['icon_db', 'cat_tipo']] = final['id_categoria'].apply(lambda x: pd.Series(get_cat_info(x)))
-            final['concluido'] = final['concluido'].fillna(True)
-            return final.sort_values('data', ascending=False)
-        return pd.DataFrame()
+        return memorizar_na_sessao(("resumo_extrato", str(user_id), str(data_inicio), str(data_fim)), user_id,
+                                   ("transacoes_bancarias", "investimento"), carregar)
     except Exception as e:
-        return pd.DataFrame()
+        print(f"Erro resumo extrato: {e}")
+        return {"entradas": 0.0, "saidas": 0.0, "investido": 0.0, "a_pagar": 0.0}
+
+
+def _calcular_resumo_mes_extrato(user_id, data_inicio, data_fim):
+    resumo = {"entradas": 0.0, "saidas": 0.0, "investido": 0.0, "a_pagar": 0.0}
+    mapa_cats = mapa_categorias()
+
+    def is_cat_invest(id_cat):
+        return str(mapa_cats.get(id_cat, {}).get('tipo', '')).lower() == 'investimento'
+
+    # concluido nulo (linhas antigas) conta como concluído, como na listagem
+    bancarias = ler_linhas(user_id, "transacoes_bancarias", "valor, tipo, id_categoria, concluido",
+                           data_inicio, data_fim)
+    if bancarias is None:
+        bancarias = supabase.table("transacoes_bancarias").select("valor, tipo, id_categoria, concluido") \
+            .eq("id_usuario", user_id).or_("concluido.is.null,concluido.eq.true") \
+            .gte("data", str(data_inicio)).lte("data", str(data_fim)).execute().data
+    for t in (bancarias or []):
+        if t.get('concluido') is False: continue
+        val = float(t.get('valor') or 0)
+        if t.get('tipo') == 'entrada': resumo["entradas"] += val
+        if t.get('tipo') == 'saida': resumo["saidas"] += val
+        if is_cat_invest(t.get('id_categoria')): resumo["investido"] += val
+
+    # Aportes contam como saída e como investimento
+    aportes = ler_linhas(user_id, "investimento", "valor_investido", data_inicio, data_fim)
+    if aportes is None:
+        aportes = supabase.table("investimento").select("valor_investido") \
+            .eq("id_usuario", user_id).gte("data", str(data_inicio)).lte("data", str(data_fim)).execute().data
+    total_aportes = sum(float(t.get('valor_investido') or 0) for t in (aportes or []))
+    resumo["saidas"] += total_aportes
+    resumo["investido"] += total_aportes
+
+    # Pendências não dependem do mês selecionado
+    pendentes = ler_linhas(user_id, "transacoes_bancarias", "valor", filtros={"concluido": False})
+    if pendentes is None:
+        pendentes = supabase.table("transacoes_bancarias").select("valor") \
+            .eq("id_usuario", user_id).eq("concluido", False).execute().data
+    resumo["a_pagar"] = sum(float(t.get('valor') or 0) for t in (pendentes or []))
+    return resumo
 
 
 def excluir_item_generico(id_item, tabela, col_id):
     try:
         supabase.table(tabela).delete().eq(col_id, id_item).execute()
+        invalidar_tabelas(tabela)
+        return True
+    except:
+        return False
+
+
+def excluir_grupo(tabela, id_grupo):
+    """Exclui de uma vez todos os lançamentos de um parcelamento/empréstimo."""
+    try:
+        supabase.table(tabela).delete().eq("id_grupo", id_grupo).execute()
+        invalidar_tabelas(tabela)
         return True
     except:
-        return False
\ No newline at end of file
+        return False
@@ -0,0 +1,91 @@
+from datetime import date, timedelta
+import numpy as np
+
+# ==========================================
+# CALENDÁRIO DE DIAS ÚTEIS (B3 / ANBIMA)
+# ==========================================
+# Feriados nacionais usados pela ANBIMA na contagem de dias úteis (base 252).
+# O calendário é montado uma vez, no import, para o intervalo abaixo.
+ANO_INICIAL = 2000
+ANO_FINAL = 2070
+
+# (mês, dia) fixos; Consciência Negra (20/11) é feriado nacional desde 2024
+FERIADOS_FIXOS = ((1, 1), (4, 21), (5, 1), (9, 7), (10, 12), (11, 2), (11, 15), (12, 25))
+ANO_CONSCIENCIA_NEGRA = 2024
+
+
+def pascoa(ano):
+    """Domingo de Páscoa (algoritmo de Meeus/Jones/Butcher, calendário gregoriano)."""
+    a, b, c = ano % 19, ano // 100, ano % 100
+    d, e = b // 4, b % 4
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    mes = (h + l - 7 * m + 114) // 31
+    dia = (h + l - 7 * m + 114) % 31 + 1
+    return date(ano, mes, dia)
+
+
+def feriados_do_ano(ano):
+    domingo_pascoa = pascoa(ano)
+    feriados = {date(ano, m, d) for m, d in FERIADOS_FIXOS}
+    feriados |= {
+        domingo_pascoa - timedelta(days=48),  # Carnaval (segunda)
+        domingo_pascoa - timedelta(days=47),  # Carnaval (terça)
+        domingo_pascoa - timedelta(days=2),   # Sexta-feira Santa
+        domingo_pascoa + timedelta(days=60),  # Corpus Christi
+    }
+    if ano >= ANO_CONSCIENCIA_NEGRA:
+        feriados.add(date(ano, 11, 20))
+    return feriados
+
+
+def _montar():
+    inicio = np.datetime64(f"{ANO_INICIAL}-01-01", "D")
+    fim = np.datetime64(f"{ANO_FINAL + 1}-01-01", "D")
+    dias = np.arange(inicio, fim, dtype="datetime64[D]")
+
+    feriados = np.array(sorted(f for ano in range(ANO_INICIAL, ANO_FINAL + 1) for f in feriados_do_ano(ano)),
+                        dtype="datetime64[D]")
+    util = np.is_busday(dias, holidays=feriados)
+
+    # acumulado[k] = dias úteis em [inicio, inicio + k)
+    acumulado = np.concatenate(([0], np.cumsum(util)))
+    ordinais_uteis = np.flatnonzero(util)  # ordinais (desde `inicio`) dos dias úteis, ordenados
+    return inicio, util, acumulado, ordinais_uteis, feriados
+
+
+_INICIO, _UTIL, _ACUMULADO, ORDINAIS_UTEIS, FERIADOS = _montar()
+
+
+def _ordinal(datas):
+    """Dias desde 01/01/ANO_INICIAL, limitados ao intervalo do calendário."""
+    ordinal = (np.asarray(datas, dtype="datetime64[D]") - _INICIO).astype(np.int64)
+    return np.clip(ordinal, 0, len(_UTIL))
+
+
+# ==========================================
+# CONSULTAS (ESCALARES OU VETORES)
+# ==========================================
+def dias_uteis(inicios, fins):
+    """
+    Dias úteis em [inicio, fim): do aporte (inclusive) até hoje (exclusive),
+    a mesma janela usada nos fatores do CDI. Duas leituras de array por par.
+    Aceita datas, strings ISO ou arrays numpy; fim antes do início dá 0.
+    """
+    contagem = _ACUMULADO[_ordinal(fins)] - _ACUMULADO[_ordinal(inicios)]
+    return np.maximum(contagem, 0)
+
+
+def eh_dia_util(datas):
+    ordinal = _ordinal(datas)
+    return _UTIL[np.minimum(ordinal, len(_UTIL) - 1)]
+
+
+def proximo_dia_util(data_ref):
+    """O próprio dia se for útil; senão o dia útil seguinte."""
+    k = np.searchsorted(ORDINAIS_UTEIS, _ordinal(data_ref))
+    return (_INICIO + ORDINAIS_UTEIS[min(int(k), len(ORDINAIS_UTEIS) - 1)]).astype(object)
@@ -0,0 +1,31 @@
+import os
+import streamlit as st
+from dotenv import load_dotenv
+
+# Carrega variáveis de ambiente se estiver rodando localmente
+load_dotenv()
+
+
+def ler_config(chave, padrao=None):
+    """
+    Lê uma configuração do .streamlit/secrets.toml OU do ambiente (.env).
+    Retorna `padrao` se a chave não existir em nenhum dos dois.
+    """
+    try:
+        valor = st.secrets.get(chave)
+    except Exception:
+        # Sem secrets.toml o Streamlit levanta erro em vez de devolver None
+        valor = None
+
+    if valor is None or valor == "":
+        valor = os.getenv(chave)
+
+    return padrao if valor is None or valor == "" else valor
+
+
+def ler_config_bool(chave, padrao=False):
+    """Interpreta '1', 'true', 'sim', 'on' (qualquer caixa) como True."""
+    valor = ler_config(chave)
+    if valor is None:
+        return padrao
+    return str(valor).strip().lower() in ("1", "true", "sim", "yes", "on")
@@ -15,4 +15,19 @@ def formatar_brl(valor):
     # Inverte caracteres para o padrão BR: 1.234,56
     texto = texto.replace(",", "X").replace(".", ",").replace("X", ".")
 
-    return f"R$ {texto}"
\ No newline at end of file
+    return f"R$ {texto}"
+
+
+def limpar_valor_moeda(valor):
+    """Converte qualquer formato (float, int, str 'R$ 1.000,00') para float python"""
+    if valor is None:
+        return 0.0
+    if isinstance(valor, (int, float)):
+        return float(valor)
+    try:
+        # É string? Limpa caracteres de moeda
+        v_str = str(valor).strip()
+        v_str = v_str.replace('R$', '').replace(' ', '').replace('.', '').replace(',', '.')
+        return float(v_str)
+    except:
+        return 0.0
@@ -2,6 +2,8 @@ import streamlit as st
 from streamlit_option_menu import option_menu
 from src.services.supabase_client import supabase
 from src.services.cookie_service import limpar_cookie
+from src.services.realtime_listener import parar_escuta_realtime
+from src.services.instrumentacao import PAINEL_DEBUG, ORCAMENTO_CHAMADAS_RERUN, medicoes_do_rerun
 
 
 def renderizar_sidebar():
@@ -61,6 +63,30 @@ def renderizar_sidebar():
     return selected
 
 
+def renderizar_painel_debug():
+    """
+    Chamadas externas feitas neste rerun (DEBUG_INSTRUMENTACAO=true).
+    Chamado no FIM do main(), depois que a página já buscou tudo.
+    """
+    medicao = medicoes_do_rerun()
+    if not PAINEL_DEBUG or not medicao:
+        return
+
+    linhas = [
+        {"Serviço": servico, "Local": local, "Chamadas": m['chamadas'],
+         "KB": round(m['bytes'] / 1024, 1), "ms": round(m['segundos'] * 1000)}
+        for (servico, local), m in medicao['locais'].items()
+    ]
+    linhas.sort(key=lambda l: l["ms"], reverse=True)
+
+    with st.sidebar.expander(f"Debug: {medicao['total']} chamadas neste rerun", expanded=False):
+        if ORCAMENTO_CHAMADAS_RERUN and medicao['total'] > ORCAMENTO_CHAMADAS_RERUN:
+            st.warning(f"Acima do orçamento de {ORCAMENTO_CHAMADAS_RERUN} chamadas.")
+        st.caption(f"{sum(l['ms'] for l in linhas)} ms · {round(sum(l['KB'] for l in linhas), 1)} KB")
+        if linhas:
+            st.dataframe(linhas, hide_index=True, use_container_width=True)
+
+
 def fazer_logout():
     """Realiza o logout completo: Supabase, Cookies e Session State"""
 
@@ -70,7 +96,13 @@ def fazer_logout():
     except Exception as e:
         print(f"Erro ao limpar cookie: {e}")
 
-    # 2. Desloga do Supabase
+    # 2. Encerra a escuta realtime do usuário e desloga do Supabase
+    try:
+        if st.session_state.get("user") is not None:
+            parar_escuta_realtime(st.session_state.user.id)
+    except Exception as e:
+        print(f"Erro ao parar realtime: {e}")
+
     try:
         supabase.auth.sign_out()
     except Exception as e:
@@ -8,7 +8,8 @@ from src.services.credit_card_service import (
 )
 from src.services.transaction_service import (
     listar_categorias_selecao,
-    excluir_item_generico
+    excluir_item_generico,
+    excluir_grupo
 )
 # IMPORTAÇÃO DO FORMATADOR CENTRALIZADO
 from src.utils.formatters import formatar_brl
@@ -250,13 +251,31 @@ def render_lista_compras(itens):
             # Label vazia "" e apenas o ícone definido.
             if st.button("", key=f"del_cc_{item['id_trans_cartao']}", icon=":material/delete:",
                          help="Excluir Lançamento", type="secondary"):
-                if excluir_item_generico(item['id_trans_cartao'], "transacoes_cartao_credito", "id_trans_cartao"):
+                # Parcelas geradas juntas podem sair de uma vez
+                if item.get('id_grupo') and item['parcelas'] > 1:
+                    popup_excluir_parcelado(item)
+                elif excluir_item_generico(item['id_trans_cartao'], "transacoes_cartao_credito", "id_trans_cartao"):
                     st.rerun()
 
         st.markdown("<div style='height:1px; background-color:rgba(128,128,128,0.1); margin-bottom:12px;'></div>",
                     unsafe_allow_html=True)
 
 
+# --- POPUP: EXCLUIR COMPRA PARCELADA ---
+@st.dialog("Excluir Lançamento")
+def popup_excluir_parcelado(item):
+    st.markdown(f"### {item['descricao']}")
+    st.caption(f"Compra em {item['parcelas']}x. Excluir só esta parcela ou todas?")
+    c1, c2 = st.columns(2)
+    if c1.button("Só esta parcela", use_container_width=True):
+        if excluir_item_generico(item['id_trans_cartao'], "transacoes_cartao_credito", "id_trans_cartao"):
+            st.rerun()
+    if c2.button("Todas as parcelas", type="primary", use_container_width=True):
+        if excluir_grupo("transacoes_cartao_credito", item['id_grupo']):
+            st.toast("Parcelamento excluído!", icon="🗑️")
+            st.rerun()
+
+
 # --- TELA PRINCIPAL ---
 def renderizar_tela_cartao():
     carregar_css()
@@ -5,7 +5,7 @@ import textwrap
 import plotly.express as px
 import plotly.graph_objects as go
 from src.services.dashboard_service import (
-    buscar_perfil_usuario, buscar_resumo_financeiro, buscar_transacoes_graficos
+    buscar_perfil_usuario, buscar_resumo_financeiro, buscar_transacoes_graficos, buscar_gastos_por_categoria
 )
 from src.utils.formatters import formatar_brl
 
@@ -124,6 +124,7 @@ def renderizar_dashboard():
     perfil = buscar_perfil_usuario(uid)
     resumo = buscar_resumo_financeiro(uid)
     df = buscar_transacoes_graficos(uid)
+    df_cat = buscar_gastos_por_categoria(uid)
 
     # Saudação
     nome_usuario = perfil.get('nome')
@@ -157,7 +158,7 @@ def renderizar_dashboard():
     st.markdown("<br>", unsafe_allow_html=True)
 
     # Placeholder se não houver dados
-    if df.empty:
+    if df.empty and df_cat.empty:
         st.markdown(
             '<div class="chart-placeholder"><span class="material-symbols-rounded">bar_chart_off</span>Sem movimentações registradas neste período.</div>',
             unsafe_allow_html=True)
@@ -167,6 +168,7 @@ def renderizar_dashboard():
         with c1:
             st.caption("Evolução Patrimonial")
             # Agrupamento e Ordenação
+            if df.empty: df = pd.DataFrame(columns=['data', 'tipo', 'valor_grafico'])
             df_evo = df[df['tipo'].isin(['entrada', 'saida'])].groupby('data')['valor_grafico'].sum().reset_index()
             df_evo = df_evo.sort_values('data')
             df_evo['acumulado'] = df_evo['valor_grafico'].cumsum() + float(perfil.get('saldo_inicial', 0) or 0)
@@ -190,7 +192,7 @@ def renderizar_dashboard():
 
         with c2:
             st.caption("Gastos por Categoria")
-            df_g = df[df['tipo'].isin(['saida', 'cartao', 'debito'])].copy()
+            df_g = df_cat
             if not df_g.empty:
                 fig = px.pie(
                     df_g, values=df_g['valor'].abs(), names='categoria', hole=0.7,
@@ -2,7 +2,6 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 from datetime import date
-import yfinance as yf
 
 # Importação dos serviços
 from src.services.market_data_service import buscar_indicadores_economicos
@@ -10,10 +9,12 @@ from src.services.investment_service import (
     salvar_investimento,
     buscar_portfolio_real,
     buscar_evolucao_patrimonio,
-    buscar_sugestoes_yahoo
+    buscar_sugestoes_ativos
 )
 # Importação do formatador de moeda
 from src.utils.formatters import formatar_brl
+from src.services.contexto_dados import versao_tabelas
+from src.services.cambio_service import taxa_para_brl
 
 
 # ==========================================
@@ -221,7 +222,7 @@ def mostrar_popup_aporte():
         # Renda Variável
         termo_busca = st.text_input("Buscar Ativo (Nome ou Ticker)", placeholder="Ex: PETR4, BTC")
         if termo_busca:
-            opcoes = buscar_sugestoes_yahoo(termo_busca)
+            opcoes = buscar_sugestoes_ativos(termo_busca, st.session_state.user.id)
             if opcoes:
                 selecao = st.selectbox("Selecione o ativo correto:", opcoes)
                 nome_ativo = selecao.split(" | ")[0].strip()
@@ -282,15 +283,8 @@ def render_metrics_topo(df):
     total = df['Total Atual BRL'].sum() if not df.empty else 0.0
     lucro = df['Lucro/Prejuízo BRL'].sum() if not df.empty else 0.0
 
-    try:
-        usd_ticker = yf.Ticker("USDBRL=X")
-        hist = usd_ticker.history(period="1d")
-        if not hist.empty:
-            usd_val = hist['Close'].iloc[-1]
-        else:
-            usd_val = 5.80
-    except:
-        usd_val = 5.80
+    # Mesmo cache de câmbio do portfolio: não vai ao Yahoo de novo
+    usd_val = taxa_para_brl("USD")
 
     # Helper para renderizar card HTML com Ícone
     def kpi_html(label, valor, cor, icon_name):
@@ -410,7 +404,7 @@ def renderizar_investimentos():
         render_metrics_topo(df_inv)
 
         st.markdown("### :material/timeline: Evolução do Patrimônio")
-        df_tempo = buscar_evolucao_patrimonio(uid)
+        df_tempo = buscar_evolucao_patrimonio(uid, versao_tabelas(uid, ("investimento",)))
 
         if not df_tempo.empty:
             fig = px.area(df_tempo, x="Data", y="Patrimônio")
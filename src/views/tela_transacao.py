@@ -1,11 +1,13 @@
 import streamlit as st
 import pandas as pd
+import calendar
 from datetime import date
 from src.services.transaction_service import (
     salvar_transacao,
-    listar_transacoes_unificadas, excluir_item_generico, confirmar_pagamento,
-    listar_bancos_selecao, listar_categorias_selecao
+    listar_transacoes_unificadas, resumir_mes_extrato, excluir_item_generico, excluir_grupo, confirmar_pagamento,
+    listar_bancos_selecao, listar_categorias_selecao, FONTES_EXTRATO
 )
+from src.services.contexto_dados import versao_tabelas
 # IMPORTAÇÃO DO NOVO ASSET
 from src.utils.formatters import formatar_brl
 
@@ -21,6 +23,39 @@ MESES_ABREV = {
     7: "Jul", 8: "Ago", 9: "Set", 10: "Out", 11: "Nov", 12: "Dez"
 }
 
+# O Extrato não mostra lançamentos de cartão (eles têm tela própria)
+ORIGENS_EXTRATO = ('Conta', 'Investimento')
+
+
+# --- PAGINAÇÃO DO EXTRATO ---
+def periodo_do_mes(data_ref):
+    inicio = data_ref.replace(day=1)
+    fim = data_ref.replace(day=calendar.monthrange(data_ref.year, data_ref.month)[1])
+    return inicio, fim
+
+
+def carregar_extrato(user_id, data_ref, mais=False):
+    """
+    Guarda no session_state as páginas já exibidas do mês e o cursor da próxima.
+    Trocar de mês, ou qualquer gravação nas tabelas do Extrato (em qualquer tela),
+    recomeça do zero; `mais=True` busca só a página seguinte.
+    """
+    inicio, fim = periodo_do_mes(data_ref)
+    tabelas = tuple(FONTES_EXTRATO[o][0] for o in ORIGENS_EXTRATO)
+    chave = (str(user_id), str(inicio), versao_tabelas(user_id, tabelas))
+    estado = st.session_state.get("extrato_paginas")
+
+    if not estado or estado['chave'] != chave:
+        df, cursores = listar_transacoes_unificadas(user_id, inicio, fim, origens=ORIGENS_EXTRATO)
+        estado = {'chave': chave, 'df': df, 'cursores': cursores}
+    elif mais and estado['cursores']:
+        df, cursores = listar_transacoes_unificadas(user_id, inicio, fim, cursores=estado['cursores'],
+                                                    origens=ORIGENS_EXTRATO)
+        estado = {'chave': chave, 'df': pd.concat([estado['df'], df], ignore_index=True), 'cursores': cursores}
+
+    st.session_state.extrato_paginas = estado
+    return estado
+
 
 # --- CONFIGURAÇÕES VISUAIS & CSS (THEME AWARE) ---
 def carregar_estilos():
@@ -139,6 +174,20 @@ def popup_pagamento(item):
             st.rerun()
 
 
+@st.dialog("Excluir Lançamento")
+def popup_excluir_grupo(item):
+    st.markdown(f"### Excluir: {item['descricao']}")
+    st.caption("Este lançamento faz parte de um empréstimo. Excluir só ele ou todas as parcelas?")
+    c1, c2 = st.columns(2)
+    if c1.button("Só este", use_container_width=True):
+        if excluir_item_generico(item['id_trans_bank'], "transacoes_bancarias", "id_trans_bank"):
+            st.rerun()
+    if c2.button("Todas as parcelas", type="primary", use_container_width=True):
+        if excluir_grupo("transacoes_bancarias", item['id_grupo']):
+            st.toast("Empréstimo excluído!", icon="🗑️")
+            st.rerun()
+
+
 @st.dialog("Nova Transação")
 def popup_formulario(user_id):
     lista_bancos = listar_bancos_selecao(user_id)
@@ -221,128 +270,122 @@ def renderizar_nova_transacao():
         if st.button("Novo Lançamento", type="primary", use_container_width=True, icon=":material/add:"):
             popup_formulario(st.session_state.user.id)
 
-    # Dados
+    # Dados (apenas o mês selecionado, página a página)
     user_id = st.session_state.user.id
-    df_raw = listar_transacoes_unificadas(user_id)
-
-    if not df_raw.empty:
-        # Filtra Cartão
-        df = df_raw[df_raw['origem'] != 'Cartão'].copy()
+    ini_mes, fim_mes = periodo_do_mes(data_ref)
+    ano_sel = data_ref.year
 
-        # Filtros de Data
-        mes_sel = data_ref.month
-        ano_sel = data_ref.year
-        df_mes = df[(df['data'].dt.month == mes_sel) & (df['data'].dt.year == ano_sel)]
+    extrato = carregar_extrato(user_id, data_ref)
+    df_mes = extrato['df']
 
-        # --- LÓGICA DE KPI ---
-        df_mes_pago = df_mes[df_mes['concluido'] == True]
+    # --- LÓGICA DE KPI ---
+    totais = resumir_mes_extrato(user_id, ini_mes, fim_mes)
+    ent, sai, inv, pen = totais['entradas'], totais['saidas'], totais['investido'], totais['a_pagar']
 
-        is_invest = (df_mes_pago['cat_tipo'] == 'investimento') | (df_mes_pago['origem'] == 'Investimento')
+    st.markdown("<br>", unsafe_allow_html=True)
 
-        ent = df_mes_pago[df_mes_pago['tipo'] == 'entrada']['valor'].sum()
-        sai = df_mes_pago[df_mes_pago['tipo'] == 'saida']['valor'].sum()
-        inv = df_mes_pago[is_invest]['valor'].sum()
-        pen = df[df['concluido'] == False]['valor'].sum()
+    # --- CARDS KPI (Usando formatar_brl) ---
+    k1, k2, k3, k4 = st.columns(4)
+    mes_nome = MESES_PT[data_ref.month]
 
-        st.markdown("<br>", unsafe_allow_html=True)
+    with k1:
+        render_kpi_card("arrow_upward", "Entradas", formatar_brl(ent), f"Recebido em {mes_nome}", "#18CB96")
+    with k2:
+        render_kpi_card("arrow_downward", "Saídas", formatar_brl(sai), f"Pago em {mes_nome}", "#E91E63")
+    with k3:
+        render_kpi_card("trending_up", "Investido", formatar_brl(inv), f"Aportes em {mes_nome}", "#9C27B0")
+    with k4:
+        render_kpi_card("pending_actions", "A Pagar", formatar_brl(pen), "Total Pendente Geral", "#FFBD45")
 
-        # --- CARDS KPI (Usando formatar_brl) ---
-        k1, k2, k3, k4 = st.columns(4)
-        mes_nome = MESES_PT[data_ref.month]
+    st.markdown(f"<br><h4 style='opacity:0.7; margin-bottom:15px'>Histórico de {mes_nome}/{ano_sel}</h4>",
+                unsafe_allow_html=True)
 
-        with k1:
-            render_kpi_card("arrow_upward", "Entradas", formatar_brl(ent), f"Recebido em {mes_nome}", "#18CB96")
-        with k2:
-            render_kpi_card("arrow_downward", "Saídas", formatar_brl(sai), f"Pago em {mes_nome}", "#E91E63")
-        with k3:
-            render_kpi_card("trending_up", "Investido", formatar_brl(inv), f"Aportes em {mes_nome}", "#9C27B0")
-        with k4:
-            render_kpi_card("pending_actions", "A Pagar", formatar_brl(pen), "Total Pendente Geral", "#FFBD45")
-
-        st.markdown(f"<br><h4 style='opacity:0.7; margin-bottom:15px'>Histórico de {mes_nome}/{ano_sel}</h4>",
-                    unsafe_allow_html=True)
-
-        if df_mes.empty:
-            st.info(f"Nenhuma movimentação em conta/investimento encontrada em {mes_nome}/{ano_sel}.")
-        else:
-            for idx, row in df_mes.iterrows():
-                raw_id = row.get('id_trans_bank') if row['origem'] == 'Conta' else row.get('id_invest')
-                uid = str(raw_id) if pd.notna(raw_id) else f"temp_{idx}"
-
-                with st.container():
-                    c_icon, c_info, c_val, c_btn = st.columns([0.8, 5, 2, 1.2], vertical_alignment="center")
-
-                    # ÍCONE E COR
-                    icon_name = row.get('icon_db', 'receipt_long')
-                    if not row['concluido']:
-                        icon_color = "#FFBD45"
-                        icon_name = "schedule"
+    if df_mes.empty:
+        st.info(f"Nenhuma movimentação em conta/investimento encontrada em {mes_nome}/{ano_sel}.")
+    else:
+        for idx, row in df_mes.iterrows():
+            raw_id = row.get('id_trans_bank') if row['origem'] == 'Conta' else row.get('id_invest')
+            uid = str(raw_id) if pd.notna(raw_id) else f"temp_{idx}"
+
+            with st.container():
+                c_icon, c_info, c_val, c_btn = st.columns([0.8, 5, 2, 1.2], vertical_alignment="center")
+
+                # ÍCONE E COR
+                icon_name = row.get('icon_db', 'receipt_long')
+                if not row['concluido']:
+                    icon_color = "#FFBD45"
+                    icon_name = "schedule"
+                else:
+                    cat_t = row.get('cat_tipo', 'outros')
+                    if cat_t == 'investimento' or row['origem'] == 'Investimento':
+                        icon_color = "#9C27B0"
+                    elif row['tipo'] == 'entrada':
+                        icon_color = "#18CB96"
                     else:
-                        cat_t = row.get('cat_tipo', 'outros')
-                        if cat_t == 'investimento' or row['origem'] == 'Investimento':
-                            icon_color = "#9C27B0"
-                        elif row['tipo'] == 'entrada':
-                            icon_color = "#18CB96"
-                        else:
-                            icon_color = "#E91E63"
-
-                    with c_icon:
-                        st.markdown(
-                            f"<div class='icon-box'><span class='material-symbols-rounded' style='color:{icon_color}; font-size:22px'>{icon_name}</span></div>",
-                            unsafe_allow_html=True)
-
-                    with c_info:
-                        dia = row['data'].day
-                        mes_abrev = MESES_ABREV[row['data'].month]
-                        data_fmt = f"{dia:02d} {mes_abrev}"
+                        icon_color = "#E91E63"
 
-                        sub = f"{data_fmt} • {row['origem']}"
-                        if row.get('detalhe'): sub += f" • {row['detalhe']}"
+                with c_icon:
+                    st.markdown(
+                        f"<div class='icon-box'><span class='material-symbols-rounded' style='color:{icon_color}; font-size:22px'>{icon_name}</span></div>",
+                        unsafe_allow_html=True)
 
-                        st.markdown(
-                            f"<div><div class='tx-title'>{row['descricao']}</div><div class='tx-sub'>{sub}</div></div>",
-                            unsafe_allow_html=True)
+                with c_info:
+                    dia = row['data'].day
+                    mes_abrev = MESES_ABREV[row['data'].month]
+                    data_fmt = f"{dia:02d} {mes_abrev}"
 
-                    with c_val:
-                        if row['tipo'] == 'entrada':
-                            val_color = "#18CB96"
-                            sinal = "+"
-                        else:
-                            val_color = "#E91E63"
-                            sinal = "-"
+                    sub = f"{data_fmt} • {row['origem']}"
+                    if row.get('detalhe'): sub += f" • {row['detalhe']}"
 
-                        # USO DO FORMATADOR BRL
-                        # Aqui eu passo o valor para formatar, mas adiciono o sinal +/- manualmente
-                        valor_fmt = f"{sinal} {formatar_brl(row['valor'])}"
+                    st.markdown(
+                        f"<div><div class='tx-title'>{row['descricao']}</div><div class='tx-sub'>{sub}</div></div>",
+                        unsafe_allow_html=True)
 
-                        st_txt = "Pendente" if not row['concluido'] else "Pago"
-                        st_clr = "#FFBD45" if not row['concluido'] else "var(--text-color)"
-                        opacity = "1" if not row['concluido'] else "0.5"
-
-                        st.markdown(
-                            f"<div style='text-align:right'><div class='tx-val' style='color:{val_color}'>{valor_fmt}</div><div class='tx-status' style='color:{st_clr}; opacity:{opacity}'>{st_txt}</div></div>",
-                            unsafe_allow_html=True)
+                with c_val:
+                    if row['tipo'] == 'entrada':
+                        val_color = "#18CB96"
+                        sinal = "+"
+                    else:
+                        val_color = "#E91E63"
+                        sinal = "-"
 
-                    with c_btn:
-                        if row['origem'] == 'Conta' and not row['concluido']:
-                            if st.button("", key=f"p_{uid}", icon=":material/check_circle:", help="Baixar"):
-                                popup_pagamento(row)
-                        else:
-                            if st.button("", key=f"d_{uid}", icon=":material/delete:", help="Excluir",
-                                         type="secondary"):
-                                tbl = "transacoes_bancarias"
-                                col = "id_trans_bank"
-                                val_id = row.get('id_trans_bank')
+                    # USO DO FORMATADOR BRL
+                    # Aqui eu passo o valor para formatar, mas adiciono o sinal +/- manualmente
+                    valor_fmt = f"{sinal} {formatar_brl(row['valor'])}"
 
-                                if row['origem'] == 'Investimento':
-                                    tbl = "investimento"
-                                    col = "id_invest"
-                                    val_id = row.get('id_invest')
+                    st_txt = "Pendente" if not row['concluido'] else "Pago"
+                    st_clr = "#FFBD45" if not row['concluido'] else "var(--text-color)"
+                    opacity = "1" if not row['concluido'] else "0.5"
 
-                                if excluir_item_generico(val_id, tbl, col): st.rerun()
+                    st.markdown(
+                        f"<div style='text-align:right'><div class='tx-val' style='color:{val_color}'>{valor_fmt}</div><div class='tx-status' style='color:{st_clr}; opacity:{opacity}'>{st_txt}</div></div>",
+                        unsafe_allow_html=True)
 
-                    st.markdown("<div style='height:1px; background-color:rgba(128,128,128,0.1); margin:6px 0'></div>",
-                                unsafe_allow_html=True)
+                with c_btn:
+                    if row['origem'] == 'Conta' and not row['concluido']:
+                        if st.button("", key=f"p_{uid}", icon=":material/check_circle:", help="Baixar"):
+                            popup_pagamento(row)
+                    else:
+                        if st.button("", key=f"d_{uid}", icon=":material/delete:", help="Excluir",
+                                     type="secondary"):
+                            tbl = "transacoes_bancarias"
+                            col = "id_trans_bank"
+                            val_id = row.get('id_trans_bank')
+
+                            if row['origem'] == 'Investimento':
+                                tbl = "investimento"
+                                col = "id_invest"
+                                val_id = row.get('id_invest')
+
+                            if row['origem'] == 'Conta' and pd.notna(row.get('id_grupo')):
+                                popup_excluir_grupo(row)
+                            elif excluir_item_generico(val_id, tbl, col):
+                                st.rerun()
+
+                st.markdown("<div style='height:1px; background-color:rgba(128,128,128,0.1); margin:6px 0'></div>",
+                            unsafe_allow_html=True)
 
-    else:
-        st.info("Nenhuma movimentação registrada.")
\ No newline at end of file
+        if extrato['cursores']:
+            if st.button("Carregar mais", use_container_width=True, icon=":material/expand_more:"):
+                carregar_extrato(user_id, data_ref, mais=True)
+                st.rerun()
\ No newline at end of file
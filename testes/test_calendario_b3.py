@@ -0,0 +1,40 @@
+from datetime import date
+from src.utils.calendario_b3 import dias_uteis, eh_dia_util, feriados_do_ano, pascoa, proximo_dia_util
+
+
+def test_pascoa():
+    assert pascoa(2024) == date(2024, 3, 31)
+    assert pascoa(2025) == date(2025, 4, 20)
+
+
+def test_feriados_moveis_e_consciencia_negra():
+    feriados = feriados_do_ano(2024)
+    assert {date(2024, 2, 12), date(2024, 2, 13), date(2024, 3, 29), date(2024, 5, 30)} <= feriados
+    assert date(2024, 11, 20) in feriados
+    assert date(2023, 11, 20) not in feriados_do_ano(2023)
+
+
+def test_dias_uteis_do_ano_anbima():
+    assert dias_uteis(date(2023, 1, 1), date(2024, 1, 1)) == 249
+
+
+def test_dias_uteis_janela_fechada_no_inicio():
+    # Sexta a segunda: só a sexta conta
+    assert dias_uteis(date(2024, 10, 18), date(2024, 10, 21)) == 1
+    assert dias_uteis(date(2024, 10, 18), date(2024, 10, 18)) == 0
+    assert dias_uteis(date(2024, 10, 21), date(2024, 10, 18)) == 0
+
+
+def test_dias_uteis_vetorizado():
+    inicios = ["2024-01-01", "2024-10-18"]
+    fins = ["2024-02-01", "2024-10-21"]
+    assert list(dias_uteis(inicios, fins)) == [22, 1]
+
+
+def test_dia_util_e_proximo():
+    assert not eh_dia_util(date(2024, 12, 25))
+    assert not eh_dia_util(date(2024, 10, 19))
+    assert eh_dia_util(date(2024, 10, 18))
+    # 15/11/2024 é sexta e feriado: o próximo dia útil é a segunda
+    assert proximo_dia_util(date(2024, 11, 15)) == date(2024, 11, 18)
+    assert proximo_dia_util(date(2024, 11, 18)) == date(2024, 11, 18)
@@ -0,0 +1,20 @@
+import pytest
+from src.services.cambio_service import moeda_do_simbolo, simbolo_par, simbolos_cambio
+
+
+@pytest.mark.parametrize("simbolo,moeda", [
+    ("PETR4.SA", "BRL"),
+    ("BTC-USD", "USD"),
+    ("eth-eur", "EUR"),
+    ("AAPL", "USD"),
+    ("BRK-B", "USD"),
+    ("BF-B", "USD"),
+    ("TON11419-USD", "USD"),
+])
+def test_moeda_do_simbolo(simbolo, moeda):
+    assert moeda_do_simbolo(simbolo) == moeda
+
+
+def test_pares_de_cambio():
+    assert simbolo_par("usd") == "USDBRL=X"
+    assert simbolos_cambio(["USD", "BRL", "EUR", "USD", None]) == ["EURBRL=X", "USDBRL=X"]
@@ -0,0 +1,21 @@
+from src.services.decodificador_arrow import decodificar
+
+
+def test_dinheiro_em_texto():
+    df = decodificar("transacoes_bancarias", [
+        {"id_trans_bank": 1, "valor": "1500.50"},
+        {"id_trans_bank": 2, "valor": "R$ 1.500,50"},
+        {"id_trans_bank": 3, "valor": None},
+    ])
+    assert list(df["valor"]) == [1500.50, 1500.50, 0.0]
+
+
+def test_numero_em_texto_continua_numerico():
+    df = decodificar("investimento", [
+        {"id_invest": 1, "quantidade": "2", "taxa": 110},
+        {"id_invest": "2", "quantidade": 0.5, "taxa": "abc"},
+    ])
+    assert df["quantidade"].dtype == "float64"
+    assert df["quantidade"].sum() == 2.5
+    assert df["id_invest"].tolist() == [1, 2]
+    assert df["taxa"].isna().tolist() == [False, True]
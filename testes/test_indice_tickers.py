@@ -0,0 +1,46 @@
+from src.services.indice_tickers import IndiceTickers, buscar_sugestoes, _indice
+
+ENTRADAS = (
+    ("PETR4.SA", "Petrobras PN"), ("PETR3.SA", "Petrobras ON"), ("ITUB4.SA", "Itaú Unibanco PN"),
+    ("BTC-USD", "Bitcoin"), ("AAPL", "Apple"),
+)
+
+
+def test_simbolo_exato_vem_primeiro():
+    indice = IndiceTickers(ENTRADAS)
+    assert indice.buscar("petr4")[0] == "PETR4.SA"
+    assert indice.buscar("PETR") == ["PETR3.SA", "PETR4.SA"]
+
+
+def test_prefixo_de_palavra_do_nome_sem_acento():
+    indice = IndiceTickers(ENTRADAS)
+    assert indice.buscar("itau") == ["ITUB4.SA"]
+    assert indice.buscar("unib") == ["ITUB4.SA"]
+    assert indice.buscar("bitc") == ["BTC-USD"]
+
+
+def test_base_do_simbolo_sem_sufixo():
+    assert IndiceTickers(ENTRADAS).pontuar("BTC") == {"BTC-USD": 0}
+
+
+def test_parecido_quando_nao_ha_prefixo():
+    assert IndiceTickers(ENTRADAS).buscar("APPLF") == ["AAPL"]
+
+
+def test_limite_e_rotulo():
+    indice = IndiceTickers(ENTRADAS)
+    assert len(indice.buscar("P", limite=2)) == 2
+    assert indice.rotulo("PETR4.SA") == "PETR4.SA | Petrobras PN"
+
+
+def test_nome_chega_depois_do_simbolo():
+    indice = IndiceTickers([("XPTO3.SA", None)])
+    indice.adicionar("XPTO3.SA", "Xpto ON")
+    assert indice.rotulo("XPTO3.SA") == "XPTO3.SA | Xpto ON"
+    assert indice.buscar("xpto") == ["XPTO3.SA"]
+
+
+def test_simbolos_do_usuario_nao_entram_no_indice_compartilhado():
+    sugestoes = buscar_sugestoes("ZZZQ11", simbolos_usuario=["ZZZQ11.SA"])
+    assert sugestoes[0] == "ZZZQ11.SA | ZZZQ11.SA"
+    assert "ZZZQ11.SA" not in _indice.nomes
@@ -0,0 +1,92 @@
+import ast
+import os
+import pytest
+from src.services.projecoes import PROJECOES
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# projeções -> funções que leem as linhas delas: (arquivo, função, chaves que
+# não vêm do banco: criadas em outra função, indicadores, catálogo)
+CONSUMIDORES = {
+    ("dashboard_bancarias",): [
+        ("src/services/dashboard_service.py", "buscar_transacoes_graficos", ()),
+    ],
+    ("portfolio",): [
+        ("src/services/investment_service.py", "_calcular_portfolio_real", ()),
+        ("src/services/investment_service.py", "buscar_sugestoes_ativos", ()),
+        ("src/services/investment_service.py", "buscar_evolucao_patrimonio", ()),
+        ("src/services/patrimonio_historico.py", "valorar_carteira_em_datas", ()),
+        ("src/services/renda_fixa.py", "valorar_renda_fixa_em_datas", ("CDI", "IPCA")),
+        ("src/services/renda_fixa.py", "_datas_aporte", ()),
+    ],
+    ("extrato_bancarias", "extrato_cartao", "extrato_investimento"): [
+        ("src/services/transaction_service.py", "_preparar_fonte", ()),
+        ("src/services/transaction_service.py", "listar_transacoes_unificadas", ("origem", "icon")),
+    ],
+    ("fatura_itens", "cartoes"): [
+        ("src/services/credit_card_service.py", "_calcular_fatura_detalhada", ()),
+        ("src/views/tela_cartao_credito.py", "render_lista_compras", ()),
+    ],
+    ("catalogo_categorias",): [
+        ("src/services/catalogo_categorias.py", "_carregar_catalogo", ()),
+    ],
+    ("cartoes", "contas"): [
+        ("src/views/tela_configuracao.py", "renderizar_configuracoes", ()),
+    ],
+    ("cartoes", "catalogo_categorias"): [
+        ("src/views/tela_cartao_credito.py", "popup_nova_compra", ()),
+        ("src/views/tela_cartao_credito.py", "renderizar_tela_cartao", ("itens",)),
+    ],
+}
+
+
+def _funcao(arquivo, nome):
+    with open(os.path.join(RAIZ, arquivo), encoding="utf-8") as f:
+        arvore = ast.parse(f.read())
+    for no in ast.walk(arvore):
+        if isinstance(no, ast.FunctionDef) and no.name == nome:
+            return no
+    raise LookupError(f"{arquivo}: {nome} não existe mais")
+
+
+def _textos(no):
+    if isinstance(no, ast.Constant) and isinstance(no.value, str):
+        return [no.value]
+    if isinstance(no, (ast.List, ast.Tuple)):
+        return [t for e in no.elts for t in _textos(e)]
+    return []
+
+
+def colunas_lidas(no):
+    """
+    Chaves lidas como coluna (x['c'], x.get('c'), groupby/drop_duplicates/sort_values)
+    menos as criadas na própria função (x['c'] = ..., rename): o que sobra veio do banco.
+    """
+    lidas, criadas = set(), set()
+    for n in ast.walk(no):
+        if isinstance(n, ast.Subscript):
+            (criadas if isinstance(n.ctx, ast.Store) else lidas).update(_textos(n.slice))
+        elif isinstance(n, ast.Call) and isinstance(n.func, ast.Attribute):
+            if n.func.attr in ("get", "groupby", "drop_duplicates", "sort_values") and n.args:
+                lidas.update(_textos(n.args[0]))
+            for kw in n.keywords:
+                if kw.arg == "columns" and isinstance(kw.value, ast.Dict):
+                    criadas.update(t for v in kw.value.values for t in _textos(v))
+    return lidas - criadas
+
+
+def test_consumidores_cobrem_todas_as_projecoes():
+    cobertas = {p for projecoes in CONSUMIDORES for p in projecoes}
+    assert cobertas == set(PROJECOES)
+
+
+@pytest.mark.parametrize("projecoes,arquivo,funcao,de_outra_fonte", [
+    (projecoes, arquivo, funcao, outras)
+    for projecoes, funcoes in CONSUMIDORES.items()
+    for arquivo, funcao, outras in funcoes
+])
+def test_colunas_lidas_estao_na_projecao(projecoes, arquivo, funcao, de_outra_fonte):
+    permitidas = {c for p in projecoes for c in PROJECOES[p]} | set(de_outra_fonte)
+    faltando = colunas_lidas(_funcao(arquivo, funcao)) - permitidas
+
+    assert not faltando, f"{funcao} lê {sorted(faltando)}: acrescente em PROJECOES{list(projecoes)}"
@@ -0,0 +1,130 @@
+import time
+import uuid
+import threading
+import pytest
+from src.services import realtime_listener
+from src.services.contexto_dados import versao_tabelas
+from src.services.catalogo_categorias import ESCOPO_CATALOGO
+from src.services.realtime_listener import CanalFalso, EscutaSupabase, iniciar_escuta_realtime, parar_escuta_realtime
+
+
+@pytest.fixture
+def usuario():
+    uid = str(uuid.uuid4())
+    yield uid
+    parar_escuta_realtime(uid)
+
+
+def test_mudanca_invalida_so_a_tabela_do_usuario(usuario):
+    canal = iniciar_escuta_realtime(usuario, canal=CanalFalso())
+    antes = versao_tabelas(usuario, realtime_listener.TABELAS_REALTIME)
+
+    canal.emitir("investimento", "UPDATE", {"id_usuario": usuario})
+
+    depois = versao_tabelas(usuario, realtime_listener.TABELAS_REALTIME)
+    mudou = [t for t, a, d in zip(realtime_listener.TABELAS_REALTIME, antes, depois) if a != d]
+    assert mudou == ["investimento"]
+
+
+def test_canal_filtra_pelo_usuario(usuario):
+    canal = iniciar_escuta_realtime(usuario, canal=CanalFalso())
+    do_usuario = [(t, f) for t, f, _ in canal.callbacks if t != realtime_listener.TABELA_CATALOGO]
+
+    assert {t for t, _ in do_usuario} == set(realtime_listener.TABELAS_REALTIME)
+    assert all(f == f"id_usuario=eq.{usuario}" for _, f in do_usuario)
+
+
+def test_tabela_fora_da_lista_nao_invalida(usuario):
+    canal = iniciar_escuta_realtime(usuario, canal=CanalFalso())
+    canal.callbacks.append(("perfis", None, canal.callbacks[0][2]))
+    antes = versao_tabelas(usuario, realtime_listener.TABELAS_REALTIME)
+
+    canal.emitir("perfis")
+
+    assert versao_tabelas(usuario, realtime_listener.TABELAS_REALTIME) == antes
+
+
+def test_mudanca_nas_categorias_renova_o_catalogo(usuario):
+    canal = iniciar_escuta_realtime(usuario, canal=CanalFalso())
+    antes = versao_tabelas(ESCOPO_CATALOGO, ("categorias",))
+
+    canal.emitir("categorias", "UPDATE")
+
+    assert versao_tabelas(ESCOPO_CATALOGO, ("categorias",)) != antes
+
+
+def test_um_canal_por_usuario(usuario):
+    canal = iniciar_escuta_realtime(usuario, canal=CanalFalso())
+
+    assert iniciar_escuta_realtime(usuario, canal=CanalFalso()) is canal
+
+
+def test_logout_para_a_escuta(usuario):
+    canal = iniciar_escuta_realtime(usuario, canal=CanalFalso())
+    parar_escuta_realtime(usuario)
+    antes = versao_tabelas(usuario, ("investimento",))
+
+    canal.emitir("investimento")
+
+    assert not canal.inscrito
+    assert versao_tabelas(usuario, ("investimento",)) == antes
+    # Um novo login assina de novo
+    novo = iniciar_escuta_realtime(usuario, canal=CanalFalso())
+    assert novo is not canal and novo.inscrito
+
+
+# ==========================================
+# ESCUTA REAL COM CLIENTE FALSO
+# ==========================================
+class CanalAssincrono(CanalFalso):
+    async def subscribe(self, callback=None):
+        return CanalFalso.subscribe(self, callback)
+
+
+class ClienteFalso:
+    """Imita o AsyncRealtimeClient: connect() volta logo e a leitura segue em segundo plano."""
+
+    def __init__(self):
+        self.canal = CanalAssincrono()
+        self.tokens = []
+        self.fechado = threading.Event()
+
+    async def connect(self):
+        pass
+
+    async def set_auth(self, token):
+        self.tokens.append(token)
+
+    def channel(self, nome):
+        return self.canal
+
+    async def close(self):
+        self.fechado.set()
+
+
+def _esperar(condicao, limite=2.0):
+    fim = time.time() + limite
+    while not condicao() and time.time() < fim:
+        time.sleep(0.01)
+    return condicao()
+
+
+def test_escuta_real_continua_ate_o_logout(usuario):
+    cliente = ClienteFalso()
+    escuta = EscutaSupabase(usuario, "token-1", criar_cliente=lambda: cliente).iniciar()
+
+    assert _esperar(lambda: cliente.canal.inscrito)
+    time.sleep(0.2)
+    assert escuta.thread.is_alive() and not cliente.fechado.is_set()
+
+    antes = versao_tabelas(usuario, ("investimento",))
+    cliente.canal.emitir("investimento")
+    assert versao_tabelas(usuario, ("investimento",)) != antes
+
+    escuta.atualizar_token("token-2")
+    assert _esperar(lambda: cliente.tokens == ["token-1", "token-2"])
+
+    escuta.parar()
+    assert cliente.fechado.wait(2)
+    escuta.thread.join(2)
+    assert not escuta.thread.is_alive()
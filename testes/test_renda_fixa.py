@@ -0,0 +1,114 @@
+from datetime import date
+import numpy as np
+import pandas as pd
+import pytest
+from src.services.renda_fixa import CurvaCDI, IndiceIPCA, valorar_renda_fixa, valorar_renda_fixa_em_datas
+from src.utils.calendario_b3 import dias_uteis
+
+INDICADORES = {'CDI': 0.10, 'IPCA': 0.04}
+
+
+def _curva(taxa=0.0004):
+    # Dias úteis de janeiro de 2024 (01/01 é feriado)
+    dias = pd.bdate_range("2024-01-02", "2024-01-31").values
+    return CurvaCDI(dias, [taxa] * len(dias))
+
+
+# ==========================================
+# CURVA DO CDI
+# ==========================================
+def test_fator_cdi_compoe_os_dias_da_serie():
+    curva = _curva()
+    fator = curva.fatores(np.array(["2024-01-02"], dtype="datetime64[D]"), np.datetime64("2024-01-05"), [100])
+    assert fator.shape == (1,)
+    assert fator[0] == pytest.approx(1.0004 ** 3)
+
+
+def test_fator_cdi_percentual_e_matriz():
+    curva = _curva()
+    inicios = np.array(["2024-01-02", "2024-01-03"], dtype="datetime64[D]")
+    fins = np.array(["2024-01-04", "2024-01-05"], dtype="datetime64[D]")
+    fatores = curva.fatores(inicios, fins, [100, 50])
+    assert fatores.shape == (2, 2)
+    assert fatores[0] == pytest.approx([1.0004 ** 2, 1.0004 ** 3])
+    assert fatores[1] == pytest.approx([1.0002 ** 1, 1.0002 ** 2])
+
+
+def test_fator_cdi_fim_antes_do_inicio_vale_um():
+    fator = _curva().fatores(np.array(["2024-01-10"], dtype="datetime64[D]"), np.datetime64("2024-01-05"), [100])
+    assert fator[0] == pytest.approx(1.0)
+
+
+def test_curva_ordena_as_datas():
+    curva = CurvaCDI(np.array(["2024-01-03", "2024-01-02"], dtype="datetime64[D]"), [0.002, 0.001])
+    assert curva.ultima_data == np.datetime64("2024-01-03")
+    assert list(curva.taxas) == [0.001, 0.002]
+
+
+# ==========================================
+# NÚMERO-ÍNDICE DO IPCA
+# ==========================================
+def _indice():
+    return IndiceIPCA(np.array(["2024-01", "2024-02"], dtype="datetime64[M]"), [0.01, 0.02])
+
+
+def test_nivel_no_inicio_de_cada_mes():
+    indice = _indice()
+    niveis = indice.nivel(np.array(["2024-01-01", "2024-02-01", "2024-03-01"], dtype="datetime64[D]"))
+    assert niveis == pytest.approx([1.0, 1.01, 1.01 * 1.02])
+    assert indice.fim_publicado == np.datetime64("2024-03-01")
+
+
+def test_nivel_pro_rata_por_dias_uteis():
+    indice = _indice()
+    meio = np.datetime64("2024-01-16")
+    fracao = dias_uteis(date(2024, 1, 1), date(2024, 1, 16)) / dias_uteis(date(2024, 1, 1), date(2024, 2, 1))
+    assert indice.nivel(meio) == pytest.approx(1.01 ** fracao)
+
+
+def test_fator_ipca_limitado_ao_periodo_divulgado():
+    inicios = np.array(["2024-01-01"], dtype="datetime64[D]")
+    assert _indice().fatores(inicios, np.datetime64("2025-01-01"))[0] == pytest.approx(1.01 * 1.02)
+
+
+def test_mes_sem_divulgacao_conta_zero():
+    indice = IndiceIPCA(np.array(["2024-01", "2024-03"], dtype="datetime64[M]"), [0.01, 0.02])
+    assert list(indice.variacoes) == [0.01, 0.0, 0.02]
+
+
+# ==========================================
+# VALOR DA CARTEIRA
+# ==========================================
+def _carteira():
+    return pd.DataFrame({
+        'data': ["2024-01-02", "2024-01-02", "2024-01-02", "2024-01-10"],
+        'id_categoria': [3, 3, 1, 3],
+        'valor_investido': [1000.0, 1000.0, 500.0, 1000.0],
+        'taxa': [100.0, 10.0, None, 100.0],
+        'indexador': ['CDI', 'PREFIXADO', None, 'CDI'],
+    })
+
+
+def test_valor_em_datas():
+    datas = np.array(["2024-01-05", "2024-01-12"], dtype="datetime64[D]")
+    valores = valorar_renda_fixa_em_datas(_carteira(), datas, _curva(), INDICADORES)
+
+    assert valores[0] == pytest.approx([1000 * 1.0004 ** 3, 1000 * 1.0004 ** 8])
+    du = dias_uteis(date(2024, 1, 2), date(2024, 1, 12))
+    assert valores[1, 1] == pytest.approx(1000 * 1.10 ** (du / 252))
+    # Renda variável fica fora; antes do aporte a linha vale 0
+    assert list(valores[2]) == [0.0, 0.0]
+    assert valores[3, 0] == 0.0
+    assert valores[3, 1] == pytest.approx(1000 * 1.0004 ** 2)
+
+
+def test_sem_curva_usa_a_taxa_atual():
+    df = _carteira().iloc[:1]
+    valor = valorar_renda_fixa(df, None, INDICADORES, hoje=date(2024, 1, 12))
+    du = dias_uteis(date(2024, 1, 2), date(2024, 1, 12))
+    assert valor[0] == pytest.approx(1000 * 1.10 ** (du / 252))
+
+
+def test_aporte_futuro_vale_o_investido():
+    df = _carteira().iloc[3:]
+    assert valorar_renda_fixa(df, _curva(), INDICADORES, hoje=date(2024, 1, 5))[0] == 1000.0